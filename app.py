@@ -3,14 +3,44 @@
 """
 电商套件库存自动计算系统 (ICAS) - Streamlit Web版
 Inventory Calculation for Assembled Sets
+
+计算核心位于 icas 包，本文件只负责界面。
 """
 
-import streamlit as st
+import contextlib
+import io
+import uuid
+
 import pandas as pd
-import re
-from typing import Dict, Optional
-from dataclasses import dataclass
-from io import BytesIO
+import streamlit as st
+
+from icas import (
+    DEFAULT_ACTIVE_COLORS,
+    DEFAULT_BOM,
+    EXPORT_FORMATS,
+    SIMPLE_COLUMNS,
+    IncrementalCalculator,
+    InputCache,
+    LiveInventory,
+    PARSE_CACHE,
+    SnapshotStore,
+    aggregate_component_inventory,
+    export_bytes,
+    format_detail,
+    compare_skus,
+    load_bom,
+    load_warehouse_inventories,
+    plan_purchases,
+    run_scenarios,
+    scenario_grid,
+    summarize_scenarios,
+    to_excel_bytes,
+    with_detail,
+)
+from icas import diagnostics, jobs, loaders
+from icas.cache import file_digest
+from icas.store import ResultStore
+from icas.view import ResultView
 
 # =============================================================================
 # 页面配置
@@ -38,414 +68,301 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # =============================================================================
-# 数据结构定义
+# 数据加载（按文件内容缓存到磁盘，重启后仍有效）
 # =============================================================================
 
-@dataclass
-class ComponentSpec:
-    """零部件规格"""
-    type: str
-    size: str
-    color: str
-
+UPLOAD_TYPES = [suffix.lstrip('.') for suffix in loaders.TABLE_FORMATS]
 
-@dataclass
-class BOMItem:
-    """套件BOM"""
-    sheet_type: str
-    sheet_size: str
-    duvet_size: str
-    pillow_count: int
 
+@st.cache_resource
+def get_input_cache() -> InputCache:
+    input_cache = InputCache.from_env()
+    # 之前的进程解析过的商品名称（见 PARSE_CACHE），启动后第一次计算即可命中
+    input_cache.restore_parse_cache()
+    return input_cache
 
-# =============================================================================
-# 在售颜色配置
-# =============================================================================
-
-DEFAULT_ACTIVE_COLORS = [
-    '木青绿四季款',
-    '米白四季款',
-    '丁香紫四季款',
-    '雨雾蓝四季款',
-    '羊绒棕四季款',
-    '暮云粉四季款',
-    '繁星黄加暖款',
-    '暮光褐加暖款',
-    '松烟灰四季款',
-]
 
+@st.cache_resource
+def get_result_store() -> ResultStore:
+    """所有会话共享的计算结果（ICAS_RESULT_CACHE_MB / ICAS_RESULT_CACHE_TTL 控制上限和存活时间）"""
+    return ResultStore.from_env()
 
-# =============================================================================
-# BOM配置
-# =============================================================================
 
-BOM_CONFIG = {
-    "【床单款】1.5米床套件，搭配200x230cm被套": BOMItem("床单", "240*250", "200*230", 2),
-    "【床笠款】1.5米床套件，搭配200x230cm被套": BOMItem("床笠", "150*200", "200*230", 2),
-    "【床单款】1.5米床套件，搭配220x240cm被套": BOMItem("床单", "240*250", "220*240", 2),
-    "【床笠款】1.5米床套件，搭配220x240cm被套": BOMItem("床笠", "150*200", "220*240", 2),
-    "【床单款】1.8米床套件，搭配200x230cm被套": BOMItem("床单", "270*250", "200*230", 2),
-    "【床笠款】1.8米床套件，搭配200x230cm被套": BOMItem("床笠", "180*200", "200*230", 2),
-    "【床单款】1.8米床套件，搭配220x240cm被套": BOMItem("床单", "270*250", "220*240", 2),
-    "【床笠款】1.8米床套件，搭配220x240cm被套": BOMItem("床笠", "180*200", "220*240", 2),
-    "【床单款】2米床（200*200cm）套件，搭配220x240cm被套": BOMItem("床单", "270*250", "220*240", 2),
-    "【床笠款】2米床（200*200cm）套件，搭配220x240cm被套": BOMItem("床笠", "200*200", "220*240", 2),
-    "【床笠款】2.2米床（220*200cm）套件，搭配220x240cm被套": BOMItem("床笠", "220*200", "220*240", 2),
-}
+@st.cache_resource
+def get_history_store() -> SnapshotStore:
+    """历史快照库（ICAS_HISTORY_PATH 指定位置，默认 ~/.cache/icas/history.sqlite）"""
+    return SnapshotStore.from_env()
 
 
 # =============================================================================
-# 解析函数
+# 后台计算（刷新页面或重新连接后，按任务编号取回结果）
 # =============================================================================
 
-def parse_product_name(name: str) -> Optional[ComponentSpec]:
-    """从商品名称解析零部件规格"""
-    if not isinstance(name, str):
-        return None
-
-    name = name.strip()
-
-    exclude_keywords = ['浴巾', '蚕丝被', '洗衣液', '马克杯', '样布', '包装', '毛巾']
-    for kw in exclude_keywords:
-        if kw in name:
-            return None
-
-    if '枕套' in name:
-        match = re.search(r'枕套（[^）]+）-(.+)$', name)
-        if match:
-            color = match.group(1)
-            return ComponentSpec(type='枕套', size='标准', color=color)
-        return None
-
-    if name.startswith('床笠'):
-        match = re.search(r'床笠(\d+)\*(\d+)\*\d+[cm]*[-－](.+)$', name)
-        if match:
-            d1, d2 = int(match.group(1)), int(match.group(2))
-            color = match.group(3)
-            size = f"{d1}*{d2}"
-            return ComponentSpec(type='床笠', size=size, color=color)
-
-        match = re.search(r'床笠(\d+)\*(\d+)\*\d+cm；([^；]+)；([^；]+)', name)
-        if match:
-            d1, d2 = int(match.group(1)), int(match.group(2))
-            color_part = match.group(3)
-            style_part = match.group(4)
-            color = f"{color_part}{style_part}"
-            size = f"{d1}*{d2}"
-            return ComponentSpec(type='床笠', size=size, color=color)
-        return None
+@st.cache_resource
+def get_job_registry() -> jobs.JobRegistry:
+    return jobs.JobRegistry()
 
-    if name.startswith('床单'):
-        match = re.search(r'床单(\d+)\*(\d+)[cm]*[-－](.+)$', name)
-        if match:
-            d1, d2 = int(match.group(1)), int(match.group(2))
-            color = match.group(3)
-            size = f"{d1}*{d2}"
-            return ComponentSpec(type='床单', size=size, color=color)
-        return None
 
-    if name.startswith('被套'):
-        match = re.search(r'被套(\d+)\*(\d+)[-－](.+)$', name)
-        if match:
-            d1, d2 = int(match.group(1)), int(match.group(2))
-            color = match.group(3)
-            size = f"{d1}*{d2}"
-            return ComponentSpec(type='被套', size=size, color=color)
+def snapshot_upload(uploaded_file):
+    """上传文件的内存副本（保留文件名），供后台线程读取"""
+    if uploaded_file is None:
         return None
-
-    return None
-
-
-def parse_pillow_quantity(name: str) -> int:
-    """判断枕套数量"""
-    if '一对' in name:
-        return 2
-    elif '单只' in name:
-        return 1
-    return 1
-
-
-def normalize_sku_name(sku_name: str) -> str:
-    """标准化SKU名称"""
-    if not isinstance(sku_name, str):
-        return str(sku_name)
-    return sku_name.strip()
+    data = io.BytesIO(uploaded_file.getvalue())
+    data.name = uploaded_file.name
+    return data
+
+
+def load_calculator(job: jobs.Job, inventory_files, ratio_file, mapping_file, bom_file,
+                    input_cache: InputCache) -> dict:
+    """加载数据、聚合库存并建立计算器（相同文件直接读取磁盘缓存）
+
+    多个库存文件时每个文件视为一个仓库，并行读取后合并，保留各仓库明细。
+    """
+    job.report('load_inventory')
+    warehouses = None
+    if len(inventory_files) == 1:
+        component_inventory = input_cache.load_component_inventory(inventory_files[0])
+        live_inventory = LiveInventory(input_cache.load_inventory(inventory_files[0]), component_inventory)
+    else:
+        warehouses = load_warehouse_inventories(inventory_files, input_cache.load_inventory)
+        component_inventory = aggregate_component_inventory(warehouses.inventory)
+        live_inventory = LiveInventory(warehouses.inventory, component_inventory)
+    job.report('load_sales_ratio')
+    sales_ratio = input_cache.load_sales_ratio(ratio_file)
+    job.report('load_sku_mapping')
+    sku_mapping = input_cache.load_sku_mapping(mapping_file)
+    job.report('load_bom')
+    bom = load_bom(bom_file) if bom_file else None
+    input_cache.persist_parse_cache()
+    return {
+        'calculator': IncrementalCalculator(sku_mapping, sales_ratio, component_inventory, bom),
+        'live_inventory': live_inventory,
+        'warehouses': warehouses,
+    }
 
 
-def parse_ratio(value) -> float:
-    """解析销售比例"""
-    if isinstance(value, (int, float)):
-        return float(value)
-    if isinstance(value, str):
-        value = value.strip()
-        if value.endswith('%'):
-            return float(value[:-1]) / 100
-        return float(value)
-    return 0.0
+def run_calculation(job: jobs.Job, inventory_files, ratio_file, mapping_file, bom_file,
+                    active_colors, input_cache: InputCache, result_store: ResultStore, collecting: bool) -> dict:
+    """后台任务：加载数据、聚合库存并按颜色分批计算，各阶段之间报告进度
+
+    计算器按输入文件内容共享：其他会话已上传过同样的文件时直接复用（包括已算好的颜色）。
+    """
+    run_diagnostics = collect_diagnostics(collecting)
+    with activate(run_diagnostics):
+        key = ('calculator', tuple(file_digest(f) for f in inventory_files),
+               *(file_digest(f) if f is not None else None for f in (ratio_file, mapping_file, bom_file)))
+        shared = result_store.get_or_compute(key, lambda: load_calculator(
+            job, inventory_files, ratio_file, mapping_file, bom_file, input_cache
+        ))
+
+        # 计算：按颜色缓存理论可售数，之后调整安全系数或在售颜色无需重新点击计算
+        calculator = shared['calculator']
+        job.report('calculate', 0, len(active_colors))
+        calculator.theoretical(active_colors, progress=lambda done, total: job.report('calculate', done, total))
+        result_store.resize(key)
+    finish(run_diagnostics)
+    # 任务只记下结果在 ResultStore 中的键，结果本身受缓存的内存上限和存活时间约束；
+    # 单个结果超过整个缓存上限（未能放入）时才随任务保留
+    if key in result_store:
+        return {'result_key': key, 'diagnostics': run_diagnostics}
+    return {'shared': shared, 'diagnostics': run_diagnostics}
+
+
+JOB_STAGE_LABELS = {**diagnostics.STAGE_LABELS, 'pending': '等待开始', 'load_bom': '读取BOM配置'}
+
+
+@st.fragment(run_every=0.5)
+def show_job_progress(job: jobs.Job) -> None:
+    """计算进度（每0.5秒刷新本区域，不重跑整个页面）；任务结束后刷新整页显示结果"""
+    if job.finished:
+        st.rerun()
+    progress = job.progress
+    label = JOB_STAGE_LABELS.get(progress.stage, progress.stage)
+    if progress.total:
+        label += f"（{progress.done}/{progress.total} 种颜色）"
+    st.progress(progress.fraction, text=f"正在计算：{label}")
+    if job.cancel_requested:
+        st.caption("正在取消，当前步骤结束后停止…")
+    elif st.button("取消计算"):
+        job.cancel()
+
+
+def install_job_result(job: jobs.Job) -> None:
+    """把结束的任务结果放入本会话（每个任务只处理一次）"""
+    if st.session_state.get('installed_job') == job.id:
+        return
+    st.session_state['installed_job'] = job.id
+    if job.status == jobs.DONE:
+        shared = job.result.get('shared') or get_result_store().get(job.result['result_key'])
+        if shared is None:
+            st.warning("计算结果已超过缓存存活时间或被淘汰，请重新计算")
+            return
+        st.session_state.update(shared, diagnostics=job.result['diagnostics'])
+        st.session_state['calculator_id'] = uuid.uuid4().hex
+        st.session_state['applied_deltas'] = set()
+        st.success("✅ 计算完成！")
+    elif job.status == jobs.CANCELLED:
+        st.warning("计算已取消")
+    else:
+        st.error(f"计算出错: {str(job.error)}")
 
 
 # =============================================================================
-# 数据加载
+# 库存变动
 # =============================================================================
 
-@st.cache_data
-def load_inventory(file) -> pd.DataFrame:
-    """加载库存源文件"""
-    df = pd.read_excel(file)
-    required_cols = ['商品名称', '可用数']
-    for col in required_cols:
-        if col not in df.columns:
-            raise ValueError(f"库存文件缺少必需列: {col}")
-    df_grouped = df.groupby('商品名称')['可用数'].sum().reset_index()
-    df_grouped.columns = ['商品名称', '库存']
-    return df_grouped
-
-
-@st.cache_data
-def load_sales_ratio(file) -> Dict[str, float]:
-    """加载销售比例表"""
-    df = pd.read_excel(file, header=None)
-    ratio_dict = {}
-    for _, row in df.iterrows():
-        sku_name = normalize_sku_name(row[0])
-        ratio = parse_ratio(row[1])
-        ratio_dict[sku_name] = ratio
-    return ratio_dict
-
-
-@st.cache_data
-def load_sku_mapping(file) -> pd.DataFrame:
-    """加载SKU映射表"""
-    df = pd.read_excel(file)
-    df.columns = ['SKU_ID', '套件描述', '颜色']
-    df['套件描述'] = df['套件描述'].apply(normalize_sku_name)
-    return df
+def apply_deltas(delta_files) -> list:
+    """按上传顺序应用尚未应用过的变动文件，返回库存发生变化的颜色
+
+    计算器和商品库存可能与其他会话共享，先复制再修改，变动只影响本会话。
+    """
+    applied = st.session_state['applied_deltas']
+    pending = [f for f in delta_files if f.file_id not in applied]
+    if not pending:
+        return []
+    calculator = st.session_state['calculator'].copy()
+    live_inventory = st.session_state['live_inventory'].copy()
+    touched = []
+    for delta_file in pending:
+        touched += live_inventory.apply_delta(loaders.load_inventory_delta(delta_file))
+    touched = list(dict.fromkeys(touched))
+    calculator.update_component_inventory(live_inventory.component_inventory, touched)
+
+    st.session_state['calculator'] = calculator
+    st.session_state['live_inventory'] = live_inventory
+    applied.update(f.file_id for f in pending)
+    if touched:
+        # 结果已变化，下载文件需重新生成
+        st.session_state['calculator_id'] = uuid.uuid4().hex
+    return touched
 
 
 # =============================================================================
-# 库存聚合
+# 结果导出（按结果版本缓存）
 # =============================================================================
 
-def aggregate_component_inventory(df_inventory: pd.DataFrame) -> Dict:
-    """聚合零部件库存"""
-    inventory = {'床笠': {}, '床单': {}, '被套': {}, '枕套': {}}
-
-    for _, row in df_inventory.iterrows():
-        name = row['商品名称']
-        stock = int(row['库存']) if pd.notna(row['库存']) else 0
+@st.cache_data(max_entries=16, ttl=3600, show_spinner=False)
+def export_results(result_version, fmt: str, detailed: bool, _results: pd.DataFrame) -> bytes:
+    """生成下载文件；缓存键为结果版本和格式，_results 不参与哈希"""
+    df = with_detail(_results) if detailed else _results[SIMPLE_COLUMNS]
+    return export_bytes(df, fmt)
 
-        if stock <= 0:
-            continue
 
-        spec = parse_product_name(name)
-        if spec is None:
-            continue
+def download_data(result_version, fmt: str, detailed: bool, results: pd.DataFrame, collecting: bool):
+    """下载按钮的数据回调：点击时才生成文件，收集诊断时单独记录这次导出"""
+    def generate() -> bytes:
+        export_diagnostics = collect_diagnostics(collecting)
+        with activate(export_diagnostics):
+            data = export_results(result_version, fmt, detailed, results)
+        finish(export_diagnostics)
+        return data
+    return generate
 
-        comp_type = spec.type
-        color = spec.color
-        size = spec.size
 
-        # 枕套处理：一对=1套，单只需要2只=1套
-        if comp_type == '枕套':
-            if '一对' in name:
-                # 一对装：库存数就是可组装套数
-                stock = stock
-            else:
-                # 单只：2只=1套，向下取整
-                stock = stock // 2
-
-        if color not in inventory[comp_type]:
-            inventory[comp_type][color] = {}
+# =============================================================================
+# 结果浏览
+# =============================================================================
 
-        if size not in inventory[comp_type][color]:
-            inventory[comp_type][color][size] = 0
+# 详细结果表每页行数的可选值：表格只渲染当前页，浏览器端开销与结果规模无关
+PAGE_SIZES = [50, 100, 500, 1000]
 
-        inventory[comp_type][color][size] += stock
 
-    return inventory
+@st.cache_data(max_entries=4, ttl=3600, show_spinner=False)
+def warehouse_components(calculator_id, _warehouses) -> pd.DataFrame:
+    """各仓库的零部件库存（按仓库分别聚合），缓存键为计算器版本，_warehouses 不参与哈希"""
+    return _warehouses.component_breakdown()
 
 
 # =============================================================================
-# 核心算法
+# 诊断
 # =============================================================================
 
-def calculate_sku_inventory(
-    sku_mapping: pd.DataFrame,
-    sales_ratio: Dict[str, float],
-    component_inventory: Dict,
-    active_colors: list,
-    safety_factor: float = 0.3
-) -> pd.DataFrame:
-    """核心算法：计算SKU可售库存"""
-    results = []
-
-    for color in sku_mapping['颜色'].unique():
-        if color not in active_colors:
-            continue
-
-        color_skus = sku_mapping[sku_mapping['颜色'] == color]
-        sku_demands = []
-
-        for _, row in color_skus.iterrows():
-            sku_id = row['SKU_ID']
-            sku_desc = row['套件描述']
-
-            bom = BOM_CONFIG.get(sku_desc)
-            if bom is None:
-                continue
+# ICAS_DIAGNOSTICS_LOG=1 时每次计算都输出一行 JSON 诊断日志，供监控采集
+LOG_DIAGNOSTICS = diagnostics.log_enabled_from_env()
+if LOG_DIAGNOSTICS:
+    diagnostics.configure_json_logging()
 
-            ratio = sales_ratio.get(sku_desc, 0)
-
-            sku_demands.append({
-                'sku_id': sku_id,
-                'sku_desc': sku_desc,
-                'color': color,
-                'bom': bom,
-                'ratio': ratio
-            })
-
-        if not sku_demands:
-            continue
-
-        duvet_pools = {}
-        sheet_pools = {}
-        total_ratio = sum(d['ratio'] for d in sku_demands)
-
-        for demand in sku_demands:
-            bom = demand['bom']
-
-            duvet_key = bom.duvet_size
-            if duvet_key not in duvet_pools:
-                duvet_pools[duvet_key] = []
-            duvet_pools[duvet_key].append(demand)
-
-            sheet_key = (bom.sheet_type, bom.sheet_size)
-            if sheet_key not in sheet_pools:
-                sheet_pools[sheet_key] = []
-            sheet_pools[sheet_key].append(demand)
-
-        color_base = color
-
-        # 获取该颜色的枕套总库存（套数）
-        pillow_total = 0
-        if color_base in component_inventory.get('枕套', {}):
-            pillow_total = component_inventory['枕套'][color_base].get('标准', 0)
-
-        # 第一轮：计算每个SKU基于被套和床单/笠的理论可组装数
-        sku_theoretical = []
-        for demand in sku_demands:
-            bom = demand['bom']
-            ratio = demand['ratio']
-
-            if ratio == 0:
-                sku_theoretical.append({
-                    'demand': demand,
-                    'allocated_duvet': 0,
-                    'allocated_sheet': 0,
-                    'theoretical': 0,
-                    'duvet_stock': 0,
-                    'sheet_stock': 0,
-                    'duvet_pool_ratio': 0,
-                    'sheet_pool_ratio': 0,
-                    'is_zero_ratio': True
-                })
-                continue
 
-            # 被套分配
-            duvet_key = bom.duvet_size
-            duvet_pool_ratio = sum(d['ratio'] for d in duvet_pools[duvet_key])
-            duvet_stock = 0
-            if color_base in component_inventory.get('被套', {}):
-                duvet_stock = component_inventory['被套'][color_base].get(duvet_key, 0)
-            allocated_duvet = duvet_stock * (ratio / duvet_pool_ratio) if duvet_pool_ratio > 0 else 0
-
-            # 床单/笠分配
-            sheet_key = (bom.sheet_type, bom.sheet_size)
-            sheet_pool_ratio = sum(d['ratio'] for d in sheet_pools[sheet_key])
-            sheet_stock = 0
-            sheet_type = bom.sheet_type
-            sheet_size = bom.sheet_size
-            if color_base in component_inventory.get(sheet_type, {}):
-                sheet_stock = component_inventory[sheet_type][color_base].get(sheet_size, 0)
-            allocated_sheet = sheet_stock * (ratio / sheet_pool_ratio) if sheet_pool_ratio > 0 else 0
-
-            # 被套和床单/笠的短板（不含枕套）
-            theoretical = min(allocated_duvet, allocated_sheet)
-
-            sku_theoretical.append({
-                'demand': demand,
-                'allocated_duvet': allocated_duvet,
-                'allocated_sheet': allocated_sheet,
-                'theoretical': theoretical,
-                'duvet_stock': duvet_stock,
-                'sheet_stock': sheet_stock,
-                'duvet_pool_ratio': duvet_pool_ratio,
-                'sheet_pool_ratio': sheet_pool_ratio,
-                'is_zero_ratio': False
-            })
-
-        # 第二轮：检查枕套是否足够，如果不够则按比例缩减
-        total_theoretical = sum(s['theoretical'] for s in sku_theoretical)
-        pillow_sufficient = pillow_total >= total_theoretical
-        pillow_ratio = pillow_total / total_theoretical if total_theoretical > 0 else 1
-
-        # 生成最终结果
-        for sku_data in sku_theoretical:
-            demand = sku_data['demand']
-            bom = demand['bom']
-
-            if sku_data['is_zero_ratio']:
-                results.append({
-                    'SKU_ID': demand['sku_id'],
-                    '套件描述': demand['sku_desc'],
-                    '颜色': color,
-                    '可售库存': 0,
-                    '计算明细': '比例为0'
-                })
-                continue
+def collect_diagnostics(enabled: bool, run_id=None):
+    """启用时返回新的诊断记录，否则返回 None（计算核心不做任何统计）"""
+    return diagnostics.Diagnostics(run_id) if enabled else None
 
-            theoretical = sku_data['theoretical']
-            allocated_duvet = sku_data['allocated_duvet']
-            allocated_sheet = sku_data['allocated_sheet']
 
-            # 如果枕套不足，按比例缩减
-            if not pillow_sufficient:
-                theoretical = theoretical * pillow_ratio
+def activate(run_diagnostics):
+    return run_diagnostics.activate() if run_diagnostics else contextlib.nullcontext()
 
-            final_stock = int(theoretical * safety_factor)
 
-            sheet_type = bom.sheet_type
-            sheet_size = bom.sheet_size
-            duvet_key = bom.duvet_size
+def finish(run_diagnostics) -> None:
+    if run_diagnostics and LOG_DIAGNOSTICS:
+        run_diagnostics.log()
 
-            if pillow_sufficient:
-                detail = (f"被套{duvet_key}:{sku_data['duvet_stock']}*{demand['ratio']:.4f}/{sku_data['duvet_pool_ratio']:.4f}={allocated_duvet:.1f}, "
-                         f"{sheet_type}{sheet_size}:{sku_data['sheet_stock']}*{demand['ratio']:.4f}/{sku_data['sheet_pool_ratio']:.4f}={allocated_sheet:.1f}, "
-                         f"枕套充足({pillow_total}套), "
-                         f"短板:{theoretical:.1f}*{safety_factor}={final_stock}")
-            else:
-                detail = (f"被套{duvet_key}:{sku_data['duvet_stock']}*{demand['ratio']:.4f}/{sku_data['duvet_pool_ratio']:.4f}={allocated_duvet:.1f}, "
-                         f"{sheet_type}{sheet_size}:{sku_data['sheet_stock']}*{demand['ratio']:.4f}/{sku_data['sheet_pool_ratio']:.4f}={allocated_sheet:.1f}, "
-                         f"枕套不足({pillow_total}套<{total_theoretical:.0f}套需求,缩减{pillow_ratio:.2%}), "
-                         f"短板:{theoretical:.1f}*{safety_factor}={final_stock}")
 
-            results.append({
-                'SKU_ID': demand['sku_id'],
-                '套件描述': demand['sku_desc'],
-                '颜色': color,
-                '可售库存': final_stock,
-                '计算明细': detail
-            })
+RESULT_STORE_LABELS = {
+    'entries': '条目数',
+    'nbytes': '占用(MB)',
+    'max_bytes': '上限(MB)',
+    'hits': '命中',
+    'misses': '未命中',
+    'evictions': '超出上限淘汰',
+    'expirations': '过期淘汰',
+    'hit_rate': '命中率',
+}
 
-    return pd.DataFrame(results)
+PARSE_CACHE_LABELS = {
+    'entries': '名称数',
+    'max_entries': '上限',
+    'hits': '命中',
+    'misses': '未命中',
+    'evictions': '超出上限淘汰',
+    'unparsed': '无法解析的名称',
+    'hit_rate': '命中率',
+}
 
 
-def to_excel_bytes(df: pd.DataFrame) -> bytes:
-    """将DataFrame转换为Excel字节流"""
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False)
-    return output.getvalue()
+def show_diagnostics_panel(runs, store_stats=None, parse_cache=None) -> None:
+    """可折叠的诊断面板：各阶段耗时、内存变化与计数器，共享结果缓存和商品名称解析缓存的状态"""
+    with st.expander("🔧 诊断信息"):
+        for title, run_diagnostics in runs:
+            if run_diagnostics is None:
+                continue
+            st.write(f"**{title}**（{run_diagnostics.run_id}）")
+            stages = pd.DataFrame([
+                {
+                    '阶段': '\u3000' * stage['depth'] + diagnostics.STAGE_LABELS.get(stage['stage'], stage['stage']),
+                    '耗时(秒)': stage['seconds'],
+                    '内存变化(MB)': stage['memory_delta_mb'],
+                }
+                for stage in run_diagnostics.stages
+            ], columns=['阶段', '耗时(秒)', '内存变化(MB)'])
+            st.dataframe(stages, use_container_width=True, hide_index=True)
+            if run_diagnostics.counters:
+                counters = pd.DataFrame([
+                    {'计数': diagnostics.COUNTER_LABELS.get(name, name), '值': value}
+                    for name, value in run_diagnostics.counters.items()
+                ])
+                st.dataframe(counters, use_container_width=True, hide_index=True)
+        if store_stats:
+            st.write("**共享结果缓存**（所有会话）")
+            stats = {
+                key: round(value / 2**20, 1) if key in ('nbytes', 'max_bytes') else value
+                for key, value in store_stats.items()
+            }
+            st.dataframe(
+                pd.DataFrame([{RESULT_STORE_LABELS[key]: value for key, value in stats.items()}]),
+                use_container_width=True,
+                hide_index=True
+            )
+        if parse_cache is not None:
+            st.write("**商品名称解析缓存**（所有会话）")
+            st.dataframe(
+                pd.DataFrame([{PARSE_CACHE_LABELS[key]: value for key, value in parse_cache.stats().items()}]),
+                use_container_width=True,
+                hide_index=True
+            )
+            unparsed = parse_cache.unparsed_report()
+            if not unparsed.empty:
+                st.write("无法解析的商品名称（未被关键词排除，计算时被忽略）")
+                st.dataframe(unparsed, use_container_width=True, height=200, hide_index=True)
 
 
 # =============================================================================
@@ -454,7 +371,7 @@ def to_excel_bytes(df: pd.DataFrame) -> bytes:
 
 def main():
     st.title("📦 套件库存自动计算系统")
-    st.markdown("上传三个Excel文件，自动计算各SKU的可售库存")
+    st.markdown("上传三个Excel文件（也支持 CSV / Parquet / Feather），自动计算各SKU的可售库存")
 
     # 侧边栏 - 参数设置
     with st.sidebar:
@@ -481,6 +398,29 @@ def main():
             help="只计算选中颜色的库存"
         )
 
+        st.markdown("---")
+        st.subheader("BOM配置")
+        bom_file = st.file_uploader(
+            "自定义BOM（可选，不上传则使用内置BOM）",
+            type=UPLOAD_TYPES + ['yaml', 'yml'],
+            key='bom',
+            help="列：套件描述、床单类型、床单尺寸、被套尺寸、枕套数量"
+        )
+        st.download_button(
+            label="下载BOM模板",
+            data=lambda: to_excel_bytes(DEFAULT_BOM.to_frame()),
+            file_name="BOM模板.xlsx",
+            mime=EXPORT_FORMATS['xlsx']['mime']
+        )
+
+        st.markdown("---")
+        show_diagnostics = st.checkbox(
+            "显示诊断信息",
+            value=False,
+            help="记录各阶段耗时、内存变化以及排除/无法解析的行数等计数（关闭时不做统计）"
+        )
+    collecting = show_diagnostics or LOG_DIAGNOSTICS
+
     # 主区域 - 文件上传
     st.header("📁 上传数据文件")
 
@@ -488,9 +428,10 @@ def main():
 
     with col1:
         st.subheader("库存源文件")
-        inventory_file = st.file_uploader(
-            "包含商品名称、可用数等列",
-            type=['xlsx', 'xls'],
+        inventory_files = st.file_uploader(
+            "包含商品名称、可用数等列；多个仓库可各传一个文件",
+            type=UPLOAD_TYPES,
+            accept_multiple_files=True,
             key='inventory'
         )
 
@@ -498,7 +439,7 @@ def main():
         st.subheader("销售比例表")
         ratio_file = st.file_uploader(
             "套件名称与销售占比",
-            type=['xlsx', 'xls'],
+            type=UPLOAD_TYPES,
             key='ratio'
         )
 
@@ -506,13 +447,13 @@ def main():
         st.subheader("SKU映射表")
         mapping_file = st.file_uploader(
             "SKU ID、套件描述、颜色",
-            type=['xlsx', 'xls'],
+            type=UPLOAD_TYPES,
             key='mapping'
         )
 
     # 计算按钮
     if st.button("🚀 开始计算", type="primary", use_container_width=True):
-        if not all([inventory_file, ratio_file, mapping_file]):
+        if not all([inventory_files, ratio_file, mapping_file]):
             st.error("请先上传全部三个文件！")
             return
 
@@ -520,41 +461,72 @@ def main():
             st.error("请至少选择一种在售颜色！")
             return
 
-        with st.spinner("正在计算..."):
-            try:
-                # 加载数据
-                df_inventory = load_inventory(inventory_file)
-                sales_ratio = load_sales_ratio(ratio_file)
-                sku_mapping = load_sku_mapping(mapping_file)
-
-                # 聚合库存
-                component_inventory = aggregate_component_inventory(df_inventory)
-
-                # 计算
-                results = calculate_sku_inventory(
-                    sku_mapping,
-                    sales_ratio,
-                    component_inventory,
-                    active_colors,
-                    safety_factor
-                )
-
-                # 存储结果到session
-                st.session_state['results'] = results
-                st.session_state['component_inventory'] = component_inventory
-                st.session_state['active_colors'] = active_colors
-
-                st.success("✅ 计算完成！")
-
-            except Exception as e:
-                st.error(f"计算出错: {str(e)}")
-                return
+        # 重新计算时取消本会话尚未结束的上一次计算
+        previous = get_job_registry().get(st.session_state.get('job_id'))
+        if previous is not None and not previous.finished:
+            previous.cancel()
+
+        job = get_job_registry().submit(
+            run_calculation,
+            [snapshot_upload(f) for f in inventory_files],
+            snapshot_upload(ratio_file),
+            snapshot_upload(mapping_file),
+            snapshot_upload(bom_file),
+            list(active_colors),
+            get_input_cache(),
+            get_result_store(),
+            collecting,
+        )
+        st.session_state['job_id'] = job.id
+        st.query_params['job'] = job.id
+
+    # 后台任务：运行中显示进度；结束后取回结果（刷新页面后按链接中的任务编号取回）
+    job = get_job_registry().get(st.session_state.get('job_id') or st.query_params.get('job'))
+    if job is not None:
+        st.session_state['job_id'] = job.id
+        if job.finished:
+            install_job_result(job)
+        else:
+            show_job_progress(job)
+
+    # 显示结果（随侧边栏参数实时更新：安全系数只重新缩放，新增颜色只计算新增部分）
+    if 'calculator' in st.session_state:
+        calculator = st.session_state['calculator']
+        run_diagnostics = st.session_state.get('diagnostics')
+        view_diagnostics = collect_diagnostics(collecting, run_diagnostics.run_id if run_diagnostics else None)
+
+        # 库存变动：叠加到已加载的库存上，只重算涉及的颜色
+        with st.expander("🔄 应用库存变动"):
+            delta_files = st.file_uploader(
+                "库存变动文件（商品名称、变动数，正数入库、负数出库），可多选",
+                type=UPLOAD_TYPES,
+                accept_multiple_files=True,
+                key='delta'
+            )
+            if st.button("应用变动", disabled=not delta_files):
+                try:
+                    with activate(view_diagnostics):
+                        touched = apply_deltas(delta_files)
+                    calculator = st.session_state['calculator']
+                    st.success(f"✅ 已应用变动，重算了 {len(touched)} 种颜色")
+                except Exception as e:
+                    st.error(f"应用变动出错: {str(e)}")
+
+        # 结果及其索引按结果版本保存在会话中：只切换筛选、翻页、选行时不重新计算
+        result_version = (st.session_state['calculator_id'], tuple(active_colors), safety_factor)
+        cached_view = st.session_state.get('result_view')
+        if cached_view is None or cached_view[0] != result_version:
+            with activate(view_diagnostics):
+                view = ResultView(calculator.results(active_colors, safety_factor))
+            st.session_state['result_view'] = (result_version, view)
+        else:
+            view = cached_view[1]
+        finish(view_diagnostics)
+        results = view.results
+        component_inventory = calculator.component_inventory
 
-    # 显示结果
-    if 'results' in st.session_state:
-        results = st.session_state['results']
-        component_inventory = st.session_state['component_inventory']
-        active_colors = st.session_state['active_colors']
+        if not active_colors:
+            st.warning("请至少选择一种在售颜色！")
 
         st.markdown("---")
         st.header("📊 计算结果")
@@ -562,86 +534,265 @@ def main():
         # 统计概览
         col1, col2, col3, col4 = st.columns(4)
         with col1:
-            st.metric("总SKU数", len(results))
+            st.metric("总SKU数", view.metrics['skus'])
         with col2:
-            st.metric("有库存SKU", len(results[results['可售库存'] > 0]))
+            st.metric("有库存SKU", view.metrics['in_stock'])
         with col3:
-            st.metric("零库存SKU", len(results[results['可售库存'] == 0]))
+            st.metric("零库存SKU", view.metrics['out_of_stock'])
         with col4:
-            st.metric("总可售套数", int(results['可售库存'].sum()))
+            st.metric("总可售套数", view.metrics['total_stock'])
 
         # 按颜色统计
         st.subheader("按颜色统计")
-        color_stats = results.groupby('颜色')['可售库存'].agg(['count', 'sum'])
-        color_stats.columns = ['SKU数', '可售套数']
-        color_stats = color_stats.reset_index()
-        st.dataframe(color_stats, use_container_width=True)
+        st.dataframe(view.color_stats, use_container_width=True)
 
         # 详细结果
         st.subheader("详细结果")
 
-        # 筛选器
-        filter_col1, filter_col2 = st.columns(2)
+        # 筛选器与分页：只把当前页发送到浏览器
+        filter_col1, filter_col2, filter_col3, filter_col4 = st.columns(4)
         with filter_col1:
             selected_color = st.selectbox(
                 "按颜色筛选",
-                options=['全部'] + list(results['颜色'].unique())
+                options=['全部'] + view.colors
             )
         with filter_col2:
             show_zero = st.checkbox("显示零库存SKU", value=True)
-
-        # 过滤
-        display_df = results.copy()
-        if selected_color != '全部':
-            display_df = display_df[display_df['颜色'] == selected_color]
-        if not show_zero:
-            display_df = display_df[display_df['可售库存'] > 0]
-
-        st.dataframe(
-            display_df[['SKU_ID', '套件描述', '颜色', '可售库存']],
+        rows = view.rows(None if selected_color == '全部' else selected_color, not show_zero)
+        with filter_col3:
+            page_size = st.selectbox("每页行数", options=PAGE_SIZES, index=1)
+        page_count = view.page_count(len(rows), page_size)
+        with filter_col4:
+            page = st.number_input("页码", min_value=1, max_value=page_count, value=1, step=1)
+
+        page_df = view.page(rows, int(page), page_size)
+        selection = st.dataframe(
+            page_df[SIMPLE_COLUMNS],
             use_container_width=True,
-            height=400
+            height=400,
+            on_select='rerun',
+            selection_mode='single-row'
         )
-
-        # 下载按钮
+        st.caption(f"共 {len(rows)} 个SKU，第 {int(page)} / {page_count} 页")
+
+        # 选中一行时才渲染该SKU的计算明细
+        selected_rows = selection.selection.rows
+        if selected_rows:
+            row = page_df.iloc[selected_rows[0]]
+            st.caption(f"{row['SKU_ID']} 计算明细")
+            st.code(format_detail(row), language=None)
+        else:
+            st.caption("点击表格中的一行查看计算明细")
+
+        # 下载按钮：点击时才生成文件，同一结果、同一格式只生成一次
         st.subheader("📥 下载结果")
+        export_format = st.radio(
+            "文件格式",
+            options=list(EXPORT_FORMATS),
+            format_func=lambda fmt: EXPORT_FORMATS[fmt]['label'],
+            horizontal=True
+        )
+        suffix = EXPORT_FORMATS[export_format]['suffix']
+        mime = EXPORT_FORMATS[export_format]['mime']
         col1, col2 = st.columns(2)
 
         with col1:
-            simple_df = results[['SKU_ID', '套件描述', '颜色', '可售库存']]
             st.download_button(
                 label="下载简版结果",
-                data=to_excel_bytes(simple_df),
-                file_name="套件库存计算结果.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                data=download_data(result_version, export_format, False, results, collecting),
+                file_name=f"套件库存计算结果{suffix}",
+                mime=mime
             )
 
         with col2:
             st.download_button(
                 label="下载详细版（含计算明细）",
-                data=to_excel_bytes(results),
-                file_name="套件库存计算结果_详细.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                data=download_data(result_version, export_format, True, results, collecting),
+                file_name=f"套件库存计算结果_详细{suffix}",
+                mime=mime
             )
 
+        # 零部件影响查询：某个零部件（如被套220*240）缺货时直接受影响的SKU
+        with st.expander("🔍 零部件影响查询"):
+            query_col1, query_col2 = st.columns(2)
+            with query_col1:
+                component_key = st.selectbox(
+                    "零部件",
+                    options=calculator.bom.component_keys(),
+                    format_func=lambda key: f"{key[0]} {key[1]}"
+                )
+            with query_col2:
+                query_color = st.selectbox("颜色", options=['全部'] + list(active_colors), key='impact_color')
+            affected = calculator.bom.affected_skus(
+                results, [component_key], None if query_color == '全部' else [query_color]
+            )
+            st.write(f"用到该零部件的SKU：{len(affected)} 个（枕套不足时，同颜色其他SKU也会按比例缩减）")
+            st.dataframe(affected[SIMPLE_COLUMNS], use_container_width=True, hide_index=True)
+
+        # 情景模拟：多组安全系数 × 销售比例调整一次算完
+        with st.expander("🧪 情景模拟"):
+            safety_text = st.text_input(
+                "安全系数（逗号分隔）",
+                value=", ".join(dict.fromkeys(f"{sf:g}" for sf in (0.2, safety_factor, 0.5)))
+            )
+            st.caption("销售比例调整：套件描述包含关键词的SKU，销售比例乘以倍数；同名的多行合为一组调整")
+            adjustments_table = st.data_editor(
+                pd.DataFrame({'调整名称': ['1.8米+10%'], '关键词': ['1.8米'], '倍数': [1.1]}),
+                num_rows='dynamic',
+                use_container_width=True,
+                key='scenario_adjustments'
+            )
+            if st.button("运行情景模拟"):
+                try:
+                    safety_factors = [float(x) for x in safety_text.replace('，', ',').split(',') if x.strip()]
+                    adjustments = {}
+                    for name, keyword, multiplier in adjustments_table.dropna().itertuples(index=False):
+                        adjustments.setdefault(str(name), {})[str(keyword)] = float(multiplier)
+                    with activate(view_diagnostics):
+                        matrix = run_scenarios(
+                            calculator.sku_mapping,
+                            calculator.sales_ratio,
+                            calculator.component_inventory,
+                            active_colors,
+                            scenario_grid(safety_factors, adjustments),
+                            calculator.bom,
+                        )
+                    st.session_state['scenarios'] = (result_version[:2], matrix)
+                except Exception as e:
+                    st.error(f"情景模拟出错: {str(e)}")
+
+            # 重新计算、应用变动或改变在售颜色后，旧的模拟结果不再显示
+            scenario_version, matrix = st.session_state.get('scenarios', (None, None))
+            if matrix is not None and scenario_version == result_version[:2]:
+                summary = summarize_scenarios(matrix)
+                st.write(f"共 {len(matrix)} 个情景（较基准变化以第一个情景为基准）")
+                st.dataframe(summary, use_container_width=True, hide_index=True)
+                st.bar_chart(summary.set_index('情景')['可售总数'])
+
+                compared = st.multiselect(
+                    "对比情景",
+                    options=list(matrix.index),
+                    default=list(matrix.index[:3])
+                )
+                changed_only = st.checkbox("只显示可售库存有差异的SKU", value=True)
+                if compared:
+                    st.dataframe(
+                        compare_skus(matrix, compared, changed_only),
+                        use_container_width=True,
+                        height=400,
+                        hide_index=True
+                    )
+
+        # 补货计划：让每个在售SKU（按当前安全系数）都达到目标可售数，各零部件至少要补多少
+        with st.expander("🛒 补货计划"):
+            plan_target = st.number_input("目标可售数（每个SKU）", min_value=1, value=10, step=1)
+            st.caption("销售比例为0的SKU不参与计划；枕套按套数计")
+            if st.button("生成补货计划"):
+                try:
+                    with activate(view_diagnostics):
+                        plan = plan_purchases(
+                            calculator.sku_mapping,
+                            calculator.sales_ratio,
+                            calculator.component_inventory,
+                            active_colors,
+                            int(plan_target),
+                            safety_factor,
+                            calculator.bom,
+                        )
+                    st.session_state['purchase_plan'] = (result_version, int(plan_target), plan)
+                except Exception as e:
+                    st.error(f"补货计划出错: {str(e)}")
+
+            # 计算器、在售颜色或安全系数变化后，旧的计划不再显示
+            plan_version, planned_target, plan = st.session_state.get('purchase_plan', (None, None, None))
+            if plan is not None and plan_version == result_version:
+                purchases = plan[plan['需补货'] > 0]
+                st.write(f"目标 {planned_target} 套：{len(purchases)} 个零部件需补货，共 {int(purchases['需补货'].sum())} 件")
+                st.dataframe(purchases, use_container_width=True, height=400, hide_index=True)
+                st.download_button(
+                    label="下载补货计划",
+                    data=lambda: to_excel_bytes(purchases),
+                    file_name=f"补货计划_目标{planned_target}.xlsx",
+                    mime=EXPORT_FORMATS['xlsx']['mime']
+                )
+
         # 零部件库存概览
         with st.expander("查看零部件库存汇总"):
+            component_table = component_inventory.reset_index()
+            component_table = component_table[component_table['颜色'].isin(active_colors)]
             for comp_type in ['床笠', '床单', '被套', '枕套']:
                 st.write(f"**{comp_type}**")
-                comp_data = []
-                for color in active_colors:
-                    if color in component_inventory.get(comp_type, {}):
-                        for size, stock in component_inventory[comp_type][color].items():
-                            comp_data.append({
-                                '颜色': color,
-                                '尺寸': size,
-                                '库存': stock
-                            })
-                if comp_data:
-                    st.dataframe(pd.DataFrame(comp_data), use_container_width=True)
+                comp_data = component_table[component_table['类型'] == comp_type]
+                if not comp_data.empty:
+                    st.dataframe(comp_data[['颜色', '尺寸', '库存']], use_container_width=True)
                 else:
                     st.write("无数据")
 
+        # 分仓库明细：上传了多个库存文件时，查看各仓库的库存合计和零部件库存
+        warehouses = st.session_state.get('warehouses')
+        if warehouses is not None:
+            with st.expander(f"🏬 分仓库库存（{len(warehouses.warehouses)} 个仓库）"):
+                st.dataframe(warehouses.totals(), use_container_width=True, hide_index=True)
+                breakdown = warehouse_components(st.session_state['calculator_id'], warehouses)
+                comp_type = st.selectbox("零部件类型", options=['床笠', '床单', '被套', '枕套'], key='warehouse_type')
+                keep = (
+                    (breakdown.index.get_level_values('类型') == comp_type)
+                    & breakdown.index.get_level_values('颜色').isin(active_colors)
+                )
+                st.dataframe(breakdown[keep].droplevel('类型'), use_container_width=True)
+                st.caption("合计为全部仓库合并后的库存；单只枕套在各仓库内分别折算为套数；库存变动不计入本表")
+
+        # 历史快照：保存当前结果，比较任意两次快照，查看单个SKU的可售库存走势
+        with st.expander("🕘 历史快照"):
+            history = get_history_store()
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                snapshot_label = st.text_input("快照标签", placeholder="如：早班、补货后", key='snapshot_label')
+            with col2:
+                st.write("")
+                if st.button("保存当前结果", use_container_width=True):
+                    run_id = history.record(results, component_inventory, label=snapshot_label)
+                    st.success(f"✅ 已保存为批次 {run_id}")
+
+            runs = history.runs(limit=200)
+            if runs.empty:
+                st.info("还没有快照；命令行和监视目录加上 --history 参数后，每次计算会自动记录")
+            else:
+                st.dataframe(runs, use_container_width=True, height=200, hide_index=True)
+                run_names = {
+                    row['批次']: f"批次 {row['批次']} · {row['时间']:%m-%d %H:%M} {row['标签'] or ''}"
+                    for _, row in runs.iterrows()
+                }
+                if len(runs) >= 2:
+                    col1, col2, col3 = st.columns(3)
+                    with col1:
+                        old_run = st.selectbox("旧批次", options=list(run_names), index=1,
+                                               format_func=run_names.get, key='diff_old')
+                    with col2:
+                        new_run = st.selectbox("新批次", options=list(run_names), index=0,
+                                               format_func=run_names.get, key='diff_new')
+                    with col3:
+                        diff_color = st.selectbox("颜色", options=['全部'] + view.colors, key='diff_color')
+                    changes = history.diff(old_run, new_run, color=None if diff_color == '全部' else diff_color)
+                    st.write(f"可售库存有变化的SKU：{len(changes)} 个，合计变化 {int(changes['变化'].sum()):+d} 套")
+                    st.dataframe(changes, use_container_width=True, height=300, hide_index=True)
+
+                history_sku = st.text_input("查看单个SKU的历史", placeholder="SKU_ID", key='history_sku')
+                if history_sku:
+                    sku_history = history.sku_history(history_sku.strip())
+                    if sku_history.empty:
+                        st.warning("快照中没有该SKU")
+                    else:
+                        st.line_chart(sku_history.set_index('时间')['可售库存'])
+
+        # 诊断面板：点击计算时的加载与计算、本次刷新的重算（导出只写日志）
+        if show_diagnostics:
+            show_diagnostics_panel(
+                [('计算', run_diagnostics), ('本次刷新', view_diagnostics)],
+                get_result_store().stats(),
+                PARSE_CACHE,
+            )
+
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""
+性能基准：合成数据生成与分阶段计时
+
+运行方式（在仓库根目录）：
+    python -m benchmarks.run --sizes 1k 10k 100k
+"""
@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""
+分阶段基准：load_inventory → aggregate_component_inventory → calculate_sku_inventory → to_excel_bytes
+
+每个规模先计时（取多次中的最短时间），再在 tracemalloc 下单独跑一遍记录各阶段峰值内存，
+最后用可售库存的摘要与基线比对：摘要不同说明计算结果变了，以非零状态退出。
+
+示例：
+    python -m benchmarks.run                          # 默认规模 1k 10k 100k，与基线比较
+    python -m benchmarks.run --sizes 1m --repeat 1
+    python -m benchmarks.run --update-baseline        # 重写基线
+"""
+
+import argparse
+import gc
+import hashlib
+import json
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+from icas import (
+    PARSE_CACHE,
+    SIMPLE_COLUMNS,
+    aggregate_component_inventory,
+    calculate_sku_inventory,
+    calculate_sku_inventory_vectorized,
+    load_inventory,
+    load_sales_ratio,
+    load_sku_mapping,
+    to_excel_bytes,
+    with_detail,
+)
+
+from .synthetic import generate_inputs, write_inputs
+
+
+# =============================================================================
+# 配置
+# =============================================================================
+
+# 规模名 → (库存行数, SKU数)
+SIZES = {
+    '1k': (1_000, 100),
+    '10k': (10_000, 1_000),
+    '100k': (100_000, 10_000),
+    '1m': (1_000_000, 50_000),
+}
+DEFAULT_SIZES = ['1k', '10k', '100k']
+
+SEED = 20240501
+SAFETY_FACTOR = 0.3
+STAGES = ['load_inventory', 'aggregate_component_inventory', 'calculate_sku_inventory', 'to_excel_bytes']
+
+BASELINE_PATH = Path(__file__).with_name('baseline.json')
+DEFAULT_DATA_DIR = Path(tempfile.gettempdir()) / 'icas-bench'
+
+# 参考实现逐行计算，只在较小规模上对照
+ORACLE_MAX_SKUS = 10_000
+
+
+# =============================================================================
+# 计时与内存
+# =============================================================================
+
+def result_digest(results: pd.DataFrame) -> str:
+    """SKU_ID 与可售库存的摘要，行序或任一可售库存变化都会改变摘要"""
+    h = hashlib.blake2b(digest_size=16)
+    h.update('\n'.join(results['SKU_ID'].astype(str)).encode('utf-8'))
+    h.update(results['可售库存'].to_numpy(dtype='int64').tobytes())
+    return h.hexdigest()
+
+
+def _stage_functions(paths: Dict[str, Path], context: dict) -> List[Callable[[], None]]:
+    """各阶段的函数，前一阶段的输出通过 context 传给后一阶段"""
+    def load():
+        context['inventory'] = load_inventory(paths['inventory'])
+
+    def aggregate():
+        context['component_inventory'] = aggregate_component_inventory(context['inventory'])
+
+    def calculate():
+        context['results'] = calculate_sku_inventory_vectorized(
+            context['sku_mapping'], context['sales_ratio'], context['component_inventory'],
+            context['active_colors'], SAFETY_FACTOR,
+        )
+
+    def export():
+        context['excel'] = to_excel_bytes(context['results'][SIMPLE_COLUMNS])
+
+    return [load, aggregate, calculate, export]
+
+
+def time_stages(paths: Dict[str, Path], context: dict, repeat: int) -> Dict[str, float]:
+    """各阶段取 repeat 次中的最短耗时（秒）"""
+    timings = {stage: float('inf') for stage in STAGES}
+    for _ in range(repeat):
+        # 每轮都从空的商品名称解析缓存开始，与首次运行（及基线）可比
+        PARSE_CACHE.clear()
+        for stage, func in zip(STAGES, _stage_functions(paths, context)):
+            gc.collect()
+            start = time.perf_counter()
+            func()
+            timings[stage] = min(timings[stage], time.perf_counter() - start)
+    return timings
+
+
+def measure_peak_memory(paths: Dict[str, Path], context: dict) -> Dict[str, float]:
+    """各阶段执行期间 Python/NumPy 分配的峰值内存（MB，不含 Arrow 等原生分配器）"""
+    peaks = {}
+    PARSE_CACHE.clear()
+    tracemalloc.start()
+    try:
+        for stage, func in zip(STAGES, _stage_functions(paths, context)):
+            gc.collect()
+            tracemalloc.reset_peak()
+            baseline, _ = tracemalloc.get_traced_memory()
+            func()
+            _, peak = tracemalloc.get_traced_memory()
+            peaks[stage] = (peak - baseline) / 2**20
+    finally:
+        tracemalloc.stop()
+    return peaks
+
+
+# =============================================================================
+# 单个规模
+# =============================================================================
+
+def prepare_inputs(size: str, data_dir: Path, fmt: str) -> Dict[str, Path]:
+    """生成（或复用已生成的）输入文件"""
+    inventory_rows, sku_count = SIZES[size]
+    directory = data_dir / f"{size}-{SEED}-{fmt}"
+    marker = directory / 'complete'
+    if marker.exists():
+        paths = {
+            name: directory / f"{name}.{fmt}"
+            for name in ('inventory', 'sales_ratio', 'sku_mapping')
+        }
+    else:
+        inputs = generate_inputs(inventory_rows, sku_count, seed=SEED)
+        paths = write_inputs(inputs, directory, fmt)
+        (directory / 'active_colors.json').write_text(
+            json.dumps(inputs.active_colors, ensure_ascii=False), encoding='utf-8'
+        )
+        marker.touch()
+    paths['active_colors'] = directory / 'active_colors.json'
+    return paths
+
+
+def run_size(size: str, data_dir: Path, fmt: str, repeat: int, check_oracle: bool) -> dict:
+    paths = prepare_inputs(size, data_dir, fmt)
+    context = {
+        'sales_ratio': load_sales_ratio(paths['sales_ratio']),
+        'sku_mapping': load_sku_mapping(paths['sku_mapping']),
+        'active_colors': json.loads(paths['active_colors'].read_text(encoding='utf-8')),
+    }
+
+    timings = time_stages(paths, context, repeat)
+    peaks = measure_peak_memory(paths, context)
+    results = context['results']
+
+    record = {
+        'inventory_rows': SIZES[size][0],
+        'sku_count': SIZES[size][1],
+        'result_digest': result_digest(results),
+        'total_stock': int(results['可售库存'].sum()),
+        'seconds': {stage: round(timings[stage], 4) for stage in STAGES},
+        'peak_mb': {stage: round(peaks[stage], 1) for stage in STAGES},
+    }
+
+    if check_oracle and SIZES[size][1] <= ORACLE_MAX_SKUS:
+        reference = calculate_sku_inventory(
+            context['sku_mapping'], context['sales_ratio'], context['component_inventory'],
+            context['active_colors'], SAFETY_FACTOR,
+        )
+        record['matches_reference'] = bool(reference.equals(with_detail(results)))
+    return record
+
+
+# =============================================================================
+# 基线比较与报告
+# =============================================================================
+
+def load_baseline(path: Path) -> dict:
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding='utf-8'))
+
+
+def environment() -> dict:
+    return {
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'system': platform.system(),
+    }
+
+
+def report(size: str, record: dict, baseline: Optional[dict]) -> List[str]:
+    """打印一个规模的结果，返回发现的问题"""
+    problems = []
+    print(f"\n== {size}: {record['inventory_rows']:,} 行库存, {record['sku_count']:,} 个SKU ==")
+    print(f"{'阶段':<32}{'耗时(s)':>10}{'基线(s)':>10}{'倍数':>8}{'峰值(MB)':>10}")
+    for stage in STAGES:
+        seconds = record['seconds'][stage]
+        base = (baseline or {}).get('seconds', {}).get(stage)
+        ratio = f"{seconds / base:.2f}x" if base else '-'
+        base_text = f"{base:.4f}" if base is not None else '-'
+        print(f"{stage:<32}{seconds:>10.4f}{base_text:>10}{ratio:>8}{record['peak_mb'][stage]:>10.1f}")
+
+    print(f"可售库存合计 {record['total_stock']:,}，摘要 {record['result_digest']}")
+    if baseline and baseline.get('result_digest') != record['result_digest']:
+        problems.append(f"{size}: 可售库存与基线不一致（基线摘要 {baseline.get('result_digest')}）")
+    if record.get('matches_reference') is False:
+        problems.append(f"{size}: 结果与参考实现 calculate_sku_inventory 不一致")
+    return problems
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.run', description='ICAS 分阶段性能基准')
+    parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=DEFAULT_SIZES,
+                        help='要运行的规模（默认: %(default)s）')
+    parser.add_argument('--repeat', type=int, default=3, help='每个阶段重复次数，取最短时间（默认: %(default)s）')
+    parser.add_argument('--format', choices=['xlsx', 'csv', 'parquet'], default='xlsx',
+                        help='输入文件格式（默认: %(default)s）')
+    parser.add_argument('--data-dir', default=str(DEFAULT_DATA_DIR),
+                        help='生成的输入文件存放目录，已生成的直接复用（默认: %(default)s）')
+    parser.add_argument('--baseline', default=str(BASELINE_PATH), help='基线文件（默认: %(default)s）')
+    parser.add_argument('--update-baseline', action='store_true', help='用本次结果重写基线中对应的规模')
+    parser.add_argument('--check-oracle', action='store_true',
+                        help=f'在不超过 {ORACLE_MAX_SKUS:,} 个SKU的规模上与参考实现逐列对照')
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    baseline_path = Path(args.baseline)
+    baseline = load_baseline(baseline_path)
+    baseline_sizes = baseline.get('sizes', {}) if baseline.get('format') == args.format else {}
+
+    problems = []
+    records = {}
+    for size in args.sizes:
+        record = run_size(size, Path(args.data_dir), args.format, max(1, args.repeat), args.check_oracle)
+        records[size] = record
+        problems += report(size, record, baseline_sizes.get(size))
+
+    if args.update_baseline:
+        sizes = {**baseline_sizes, **records}
+        baseline = {
+            'format': args.format,
+            'seed': SEED,
+            'environment': environment(),
+            'sizes': {size: sizes[size] for size in SIZES if size in sizes},
+        }
+        baseline_path.write_text(json.dumps(baseline, ensure_ascii=False, indent=2) + '\n', encoding='utf-8')
+        print(f"\n基线已更新: {baseline_path}")
+
+    if problems:
+        print('\n' + '\n'.join(problems), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+合成测试数据：按真实的商品名称格式和 BOM_CONFIG 套件生成库存、销售比例与SKU映射
+
+同样的参数和随机种子总是生成完全相同的数据，基准结果可以跨次比较。
+"""
+
+import math
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from icas.config import BOM_CONFIG, DEFAULT_ACTIVE_COLORS
+from icas.parsing import EXCLUDE_KEYWORDS
+
+
+# =============================================================================
+# 生成规则
+# =============================================================================
+
+# 各零部件在库存表中的尺寸，与 BOM_CONFIG 中用到的尺寸一致
+FITTED_SHEET_SIZES = ['150*200', '180*200', '200*200', '220*200']
+FLAT_SHEET_SIZES = ['240*250', '270*250']
+DUVET_SIZES = ['200*230', '220*240']
+
+# 每种颜色的标准零部件行数：床笠4 + 床单2 + 被套2 + 枕套（一对/单只）2
+COMPONENT_ROWS_PER_COLOR = len(FITTED_SHEET_SIZES) + len(FLAT_SHEET_SIZES) + len(DUVET_SIZES) + 2
+
+COLOR_TONES = ['雾霾蓝', '燕麦色', '奶咖', '豆沙红', '橄榄绿', '珍珠白', '石墨灰', '蜜桃粉']
+COLOR_STYLES = ['四季款', '加暖款']
+
+# 库存表中被排除的商品、无法解析的商品所占比例
+EXCLUDED_SHARE = 0.05
+UNPARSED_SHARE = 0.02
+# SKU映射中不在 BOM_CONFIG 里的套件、停售颜色所占比例
+UNKNOWN_KIT_SHARE = 0.02
+INACTIVE_COLOR_SHARE = 0.2
+
+
+@dataclass
+class SyntheticInputs:
+    inventory: pd.DataFrame      # 库存源表：商品名称、可用数及其他无关列
+    sales_ratio: pd.DataFrame    # 销售比例表：无表头，套件名称、比例
+    sku_mapping: pd.DataFrame    # SKU映射表：SKU_ID、套件描述、颜色
+    active_colors: List[str]
+
+
+def _color_names(n_colors: int) -> List[str]:
+    """前几种用真实的在售颜色，其余按 色调+编号+款式 生成"""
+    colors = DEFAULT_ACTIVE_COLORS[:n_colors]
+    for i in range(n_colors - len(colors)):
+        tone = COLOR_TONES[i % len(COLOR_TONES)]
+        style = COLOR_STYLES[(i // len(COLOR_TONES)) % len(COLOR_STYLES)]
+        colors.append(f"{tone}{i:05d}{style}")
+    return colors
+
+
+def _split_style(color: str):
+    for style in COLOR_STYLES:
+        if color.endswith(style):
+            return color[:-len(style)], style
+    return color, ''
+
+
+def _component_names(color: str, rng: np.random.Generator) -> List[str]:
+    """一种颜色的全部零部件商品名称，混用库存表中出现过的几种写法"""
+    names = []
+    for size in FITTED_SHEET_SIZES:
+        color_part, style = _split_style(color)
+        if style and rng.random() < 0.3:
+            names.append(f"床笠{size}*35cm；{color_part}；{style}")
+        else:
+            names.append(f"床笠{size}*35-{color}")
+    for size in FLAT_SHEET_SIZES:
+        names.append(f"床单{size}{'cm' if rng.random() < 0.3 else ''}-{color}")
+    for size in DUVET_SIZES:
+        names.append(f"被套{size}-{color}")
+    names.append(f"枕套（一对）-{color}")
+    names.append(f"枕套（单只）-{color}")
+    return names
+
+
+def generate_inputs(inventory_rows: int, sku_count: int, seed: int = 0) -> SyntheticInputs:
+    """生成约 inventory_rows 行库存、sku_count 个SKU的输入数据
+
+    颜色数按每种颜色覆盖全部 BOM 套件估算；标准零部件行之外的库存行由
+    同名商品的多仓库记录、被排除的商品和无法解析的商品填充。
+    """
+    rng = np.random.default_rng(seed)
+    kits = list(BOM_CONFIG)
+
+    n_colors = max(1, min(
+        math.ceil(sku_count / len(kits)),
+        inventory_rows // (COMPONENT_ROWS_PER_COLOR + 2),
+    ))
+    colors = _color_names(n_colors)
+
+    # 库存表
+    names = [name for color in colors for name in _component_names(color, rng)]
+    remaining = max(0, inventory_rows - len(names))
+    n_excluded = int(remaining * EXCLUDED_SHARE)
+    n_unparsed = int(remaining * UNPARSED_SHARE)
+    n_duplicates = remaining - n_excluded - n_unparsed
+
+    excluded = [
+        f"{EXCLUDE_KEYWORDS[i % len(EXCLUDE_KEYWORDS)]}-{colors[i % n_colors]}"
+        for i in range(n_excluded)
+    ]
+    unparsed = [f"抱枕{40 + i % 20}*{40 + i % 20}-{colors[i % n_colors]}" for i in range(n_unparsed)]
+    duplicates = [names[i] for i in rng.integers(0, len(names), n_duplicates)]
+
+    all_names = np.array(names + duplicates + excluded + unparsed, dtype=object)
+    all_names = all_names[rng.permutation(len(all_names))]
+    inventory = pd.DataFrame({
+        '商品编码': [f"P{i:08d}" for i in range(len(all_names))],
+        '商品名称': all_names,
+        '仓库': rng.choice(['华东仓', '华南仓', '华北仓'], len(all_names)),
+        '可用数': rng.integers(0, 200, len(all_names)),
+    })
+
+    # 销售比例表：部分套件比例为0，部分写成百分数字符串
+    ratios = rng.random(len(kits))
+    ratios[rng.random(len(kits)) < 0.1] = 0
+    ratios = ratios / ratios.sum()
+    ratio_values = [
+        f"{r * 100:.2f}%" if i % 3 == 0 else round(float(r), 4)
+        for i, r in enumerate(ratios)
+    ]
+    sales_ratio = pd.DataFrame({0: kits, 1: ratio_values})
+
+    # SKU映射表：颜色 × 套件，少量未知套件
+    kit_choices = [kits[i % len(kits)] for i in range(sku_count)]
+    unknown = rng.random(sku_count) < UNKNOWN_KIT_SHARE
+    sku_mapping = pd.DataFrame({
+        'SKU_ID': [f"SKU{i:07d}" for i in range(sku_count)],
+        '套件描述': np.where(unknown, '【枕套单品】48x74cm枕套一对', kit_choices),
+        '颜色': [colors[(i // len(kits)) % n_colors] for i in range(sku_count)],
+    })
+
+    active_colors = [c for c in colors if rng.random() >= INACTIVE_COLOR_SHARE]
+    return SyntheticInputs(inventory, sales_ratio, sku_mapping, active_colors)
+
+
+# =============================================================================
+# 写出文件
+# =============================================================================
+
+def write_inputs(inputs: SyntheticInputs, directory: Path, fmt: str = 'xlsx') -> Dict[str, Path]:
+    """把输入写成 fmt 格式的三个文件，返回各文件路径"""
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = {
+        'inventory': directory / f"inventory.{fmt}",
+        'sales_ratio': directory / f"sales_ratio.{fmt}",
+        'sku_mapping': directory / f"sku_mapping.{fmt}",
+    }
+    tables = [
+        (inputs.inventory, paths['inventory'], True),
+        (inputs.sales_ratio, paths['sales_ratio'], False),
+        (inputs.sku_mapping, paths['sku_mapping'], True),
+    ]
+    for df, path, header in tables:
+        if fmt == 'csv':
+            df.to_csv(path, index=False, header=header, encoding='utf-8-sig')
+        elif fmt == 'parquet':
+            # Parquet 没有"无表头"，列名按位置读取；比例列混有百分数字符串，统一存为文本
+            df = df if header else df.astype(str)
+            df.rename(columns=str).to_parquet(path, index=False)
+        else:
+            df.to_excel(path, index=False, header=header)
+    return paths
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+电商套件库存自动计算系统 (ICAS) - 计算核心
+Inventory Calculation for Assembled Sets
+
+不依赖 Streamlit，可供批处理任务和其他服务直接导入；Web 界面见 app.py。
+"""
+
+from .models import BOMItem, ComponentSpec
+from .config import BOM_CONFIG, DEFAULT_ACTIVE_COLORS, build_bom_frame
+from .parsing import (
+    PARSE_CACHE,
+    ParseCache,
+    normalize_sku_name,
+    parse_pillow_quantity,
+    parse_product_name,
+    parse_product_names,
+    parse_ratio,
+)
+from .loaders import load_inventory, load_inventory_delta, load_sales_ratio, load_sku_mapping
+from .aggregation import COMPONENT_INDEX, aggregate_component_inventory
+from .bom import DEFAULT_BOM, BOMCatalog, load_bom
+from .engine import (
+    DETAIL_COLUMNS,
+    RESULT_COLUMNS,
+    THEORETICAL_COLUMNS,
+    TRACE_COLUMNS,
+    apply_safety_factor,
+    calculate_sku_inventory,
+    calculate_sku_inventory_vectorized,
+    calculate_theoretical_inventory,
+    format_detail,
+    render_detail,
+    with_detail,
+)
+from .export import (
+    EXPORT_FORMATS,
+    SIMPLE_COLUMNS,
+    export_bytes,
+    to_csv_bytes,
+    to_excel_bytes,
+    to_parquet_bytes,
+)
+from .cache import InputCache, file_digest
+from .incremental import IncrementalCalculator
+from .delta import LiveInventory
+from .parallel import calculate_sku_inventory_parallel, calculate_theoretical_parallel
+from .scenarios import Scenario, compare_skus, run_scenarios, scenario_grid, summarize_scenarios
+from .warehouses import WarehouseInventory, load_warehouse_inventories
+from .planner import PLAN_COLUMNS, apply_purchase_plan, plan_purchases
+from .history import SnapshotStore
+
+__all__ = [
+    'BOMItem',
+    'ComponentSpec',
+    'BOM_CONFIG',
+    'DEFAULT_ACTIVE_COLORS',
+    'build_bom_frame',
+    'normalize_sku_name',
+    'parse_pillow_quantity',
+    'parse_product_name',
+    'parse_product_names',
+    'parse_ratio',
+    'PARSE_CACHE',
+    'ParseCache',
+    'load_inventory',
+    'load_inventory_delta',
+    'load_sales_ratio',
+    'load_sku_mapping',
+    'COMPONENT_INDEX',
+    'aggregate_component_inventory',
+    'DEFAULT_BOM',
+    'BOMCatalog',
+    'load_bom',
+    'DETAIL_COLUMNS',
+    'RESULT_COLUMNS',
+    'THEORETICAL_COLUMNS',
+    'TRACE_COLUMNS',
+    'apply_safety_factor',
+    'calculate_sku_inventory',
+    'calculate_sku_inventory_vectorized',
+    'calculate_theoretical_inventory',
+    'format_detail',
+    'render_detail',
+    'with_detail',
+    'EXPORT_FORMATS',
+    'SIMPLE_COLUMNS',
+    'export_bytes',
+    'to_csv_bytes',
+    'to_excel_bytes',
+    'to_parquet_bytes',
+    'InputCache',
+    'file_digest',
+    'IncrementalCalculator',
+    'LiveInventory',
+    'calculate_sku_inventory_parallel',
+    'calculate_theoretical_parallel',
+    'Scenario',
+    'compare_skus',
+    'run_scenarios',
+    'scenario_grid',
+    'summarize_scenarios',
+    'WarehouseInventory',
+    'load_warehouse_inventories',
+    'PLAN_COLUMNS',
+    'apply_purchase_plan',
+    'plan_purchases',
+    'SnapshotStore',
+]
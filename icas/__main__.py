@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+"""python -m icas 入口"""
+
+import sys
+
+from .cli import main
+
+sys.exit(main())
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+库存聚合：商品库存 → (类型, 颜色, 尺寸) 零部件库存
+"""
+
+import pandas as pd
+
+from . import diagnostics
+from .parsing import EXCLUDE_PATTERN, parse_product_names
+
+
+# =============================================================================
+# 库存聚合
+# =============================================================================
+
+COMPONENT_INDEX = ['类型', '颜色', '尺寸']
+
+
+def _count_unmatched(names: pd.Series, parsed: pd.DataFrame) -> None:
+    """诊断计数：按关键词排除的行数、其余无法解析的行数"""
+    names = names.astype(object)
+    is_text = names.map(lambda name: isinstance(name, str)).astype(bool)
+    excluded = is_text & names.where(is_text, '').str.contains(EXCLUDE_PATTERN, na=False)
+    diagnostics.count('rows_excluded', int(excluded.sum()))
+    diagnostics.count('unparsed_names', int((parsed['type'].isna() & ~excluded).sum()))
+
+
+@diagnostics.timed('aggregate')
+def aggregate_component_inventory(df_inventory: pd.DataFrame) -> pd.Series:
+    """聚合零部件库存
+
+    返回以 (类型, 颜色, 尺寸) 为 MultiIndex 的库存 Series，枕套已折算为套数。
+    """
+    with diagnostics.stage('parse_names'):
+        parsed = parse_product_names(df_inventory['商品名称'])
+    if diagnostics.enabled():
+        _count_unmatched(df_inventory['商品名称'], parsed)
+
+    stock = df_inventory['库存'].fillna(0).astype('int64')
+
+    keep = (stock > 0) & parsed['type'].notna()
+    parsed = parsed[keep]
+    stock = stock[keep]
+
+    # 枕套处理：一对=1套（库存数就是可组装套数），单只需要2只=1套，向下取整
+    names = df_inventory.loc[keep, '商品名称'].astype(object)
+    single_pillow = (parsed['type'] == '枕套') & ~names.str.contains('一对', regex=False)
+    stock = stock.where(~single_pillow, stock // 2)
+
+    components = pd.DataFrame({
+        '类型': parsed['type'],
+        '颜色': parsed['color'],
+        '尺寸': parsed['size'],
+        '库存': stock,
+    })
+    if components.empty:
+        index = pd.MultiIndex.from_arrays([[], [], []], names=COMPONENT_INDEX)
+        return pd.Series([], index=index, dtype='int64', name='库存')
+    # 类型/颜色/尺寸为 category，分组按整数编码进行；observed=True 只保留实际出现的组合
+    return components.groupby(COMPONENT_INDEX, sort=False, observed=True)['库存'].sum()
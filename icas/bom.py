@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+BOM目录：从表格或 YAML 加载套件BOM，校验后编译为正向索引和反向索引
+
+- 正向：套件描述 → BOMItem
+- 反向：(零部件类型, 尺寸) → 用到该零部件的套件描述
+
+两者都是字典，单次查询为 O(1)，与BOM行数无关。
+"""
+
+import importlib.util
+import numbers
+import re
+from dataclasses import fields
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+import pandas as pd
+
+from .config import BOM_CONFIG, build_bom_frame
+from .loaders import read_table
+from .models import BOMItem
+from .parsing import normalize_sku_name
+
+
+# =============================================================================
+# 字段与校验规则
+# =============================================================================
+
+# 文件中的列名 → BOMItem 字段；YAML 中也可直接使用字段名
+BOM_COLUMNS = {
+    '床单类型': 'sheet_type',
+    '床单尺寸': 'sheet_size',
+    '被套尺寸': 'duvet_size',
+    '枕套数量': 'pillow_count',
+}
+DESCRIPTION_COLUMN = '套件描述'
+
+SHEET_TYPES = ('床单', '床笠')
+SIZE_PATTERN = re.compile(r'^\d+\*\d+$')
+
+# 枕套在零部件库存中统一为 (枕套, 标准)
+PILLOW_COMPONENT = ('枕套', '标准')
+
+YAML_SUFFIXES = ('.yaml', '.yml')
+HAS_YAML = importlib.util.find_spec('yaml') is not None
+
+ComponentKey = Tuple[str, str]
+
+
+def _validate_item(description: str, item: BOMItem) -> List[str]:
+    errors = []
+    if item.sheet_type not in SHEET_TYPES:
+        errors.append(f"{description}: 床单类型应为 {'/'.join(SHEET_TYPES)}，实际为 {item.sheet_type!r}")
+    for label, size in (('床单尺寸', item.sheet_size), ('被套尺寸', item.duvet_size)):
+        if not isinstance(size, str) or not SIZE_PATTERN.match(size):
+            errors.append(f"{description}: {label}应为 宽*长 格式（如 220*240），实际为 {size!r}")
+    if not isinstance(item.pillow_count, int) or item.pillow_count < 0:
+        errors.append(f"{description}: 枕套数量应为非负整数，实际为 {item.pillow_count!r}")
+    return errors
+
+
+# =============================================================================
+# BOM目录
+# =============================================================================
+
+class BOMCatalog:
+    """校验过的套件BOM及其索引"""
+
+    def __init__(self, items: Mapping[str, BOMItem]):
+        errors = []
+        for description, item in items.items():
+            if not isinstance(description, str) or not description.strip():
+                errors.append(f"套件描述不能为空: {description!r}")
+                continue
+            errors += _validate_item(description, item)
+        if errors:
+            raise ValueError("BOM配置有误:\n" + '\n'.join(errors))
+
+        self.items: Dict[str, BOMItem] = dict(items)
+        reverse: Dict[ComponentKey, List[str]] = {}
+        for description in self.items:
+            for key in self.components(description):
+                reverse.setdefault(key, []).append(description)
+        self._reverse = {key: tuple(descriptions) for key, descriptions in reverse.items()}
+        self._frame: Optional[pd.DataFrame] = None
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __contains__(self, description) -> bool:
+        return description in self.items
+
+    def get(self, description: str) -> Optional[BOMItem]:
+        """正向查询：套件描述 → BOM"""
+        return self.items.get(description)
+
+    def components(self, description: str) -> List[ComponentKey]:
+        """套件用到的零部件 (类型, 尺寸)"""
+        item = self.items[description]
+        keys = [(item.sheet_type, item.sheet_size), ('被套', item.duvet_size)]
+        if item.pillow_count > 0:
+            keys.append(PILLOW_COMPONENT)
+        return keys
+
+    def skus_using(self, comp_type: str, size: str) -> Tuple[str, ...]:
+        """反向查询：(零部件类型, 尺寸) → 用到它的套件描述"""
+        return self._reverse.get((comp_type, size), ())
+
+    def component_keys(self) -> List[ComponentKey]:
+        """BOM中出现过的全部零部件 (类型, 尺寸)"""
+        return list(self._reverse)
+
+    def affected_skus(
+        self,
+        sku_mapping: pd.DataFrame,
+        components: Iterable[ComponentKey],
+        colors: Optional[Iterable[str]] = None,
+    ) -> pd.DataFrame:
+        """某些零部件（可限定颜色）变化时直接受影响的SKU
+
+        例如 被套220*240 售罄：affected_skus(mapping, [('被套', '220*240')], ['米白四季款'])。
+        注意同一颜色的枕套不足时按颜色整体缩减，颜色内其他SKU的可售数也可能随之变化。
+        """
+        descriptions = {d for key in components for d in self.skus_using(*key)}
+        mask = sku_mapping['套件描述'].isin(descriptions)
+        if colors is not None:
+            mask &= sku_mapping['颜色'].isin(list(colors))
+        return sku_mapping[mask]
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        """以套件描述为索引的BOM表，供向量化计算关联（只构建一次）"""
+        if self._frame is None:
+            self._frame = build_bom_frame(self.items)
+        return self._frame
+
+    def to_frame(self) -> pd.DataFrame:
+        """导出为与 load_bom 相同格式的表，可作为BOM文件模板"""
+        rows = [
+            {DESCRIPTION_COLUMN: description, **{column: getattr(item, name) for column, name in BOM_COLUMNS.items()}}
+            for description, item in self.items.items()
+        ]
+        return pd.DataFrame(rows, columns=[DESCRIPTION_COLUMN, *BOM_COLUMNS])
+
+
+DEFAULT_BOM = BOMCatalog(BOM_CONFIG)
+
+
+# =============================================================================
+# 加载
+# =============================================================================
+
+def _item_from_record(description: str, record: Mapping, errors: List[str]) -> Optional[BOMItem]:
+    values = {}
+    for column, name in BOM_COLUMNS.items():
+        value = record.get(column, record.get(name))
+        if value is None or (isinstance(value, float) and pd.isna(value)):
+            errors.append(f"{description}: 缺少{column}")
+            return None
+        values[name] = value
+
+    values['sheet_type'] = str(values['sheet_type']).strip()
+    values['sheet_size'] = str(values['sheet_size']).strip()
+    values['duvet_size'] = str(values['duvet_size']).strip()
+    count = values['pillow_count']
+    if isinstance(count, numbers.Integral) and not isinstance(count, bool):
+        count = int(count)
+    elif isinstance(count, float) and count.is_integer():
+        count = int(count)
+    elif isinstance(count, str) and count.strip().isdigit():
+        count = int(count.strip())
+    values['pillow_count'] = count
+    return BOMItem(**{f.name: values[f.name] for f in fields(BOMItem)})
+
+
+def _records_to_catalog(records: Iterable[Tuple[object, Mapping]]) -> BOMCatalog:
+    items: Dict[str, BOMItem] = {}
+    errors: List[str] = []
+    for raw_description, record in records:
+        if raw_description is None or (isinstance(raw_description, float) and pd.isna(raw_description)):
+            errors.append("存在套件描述为空的行")
+            continue
+        description = normalize_sku_name(raw_description)
+        item = _item_from_record(description, record, errors)
+        if item is None:
+            continue
+        errors += _validate_item(description, item)
+        if description in items and items[description] != item:
+            errors.append(f"{description}: 重复定义且内容不一致")
+            continue
+        items[description] = item
+    if errors:
+        raise ValueError("BOM配置有误:\n" + '\n'.join(errors))
+    if not items:
+        raise ValueError("BOM配置为空")
+    return BOMCatalog(items)
+
+
+def _load_yaml(file) -> BOMCatalog:
+    if not HAS_YAML:
+        raise ValueError("读取 YAML 格式的BOM需要安装 PyYAML（pip install pyyaml）")
+    import yaml
+
+    if hasattr(file, 'read'):
+        data = yaml.safe_load(file)
+    else:
+        with open(file, encoding='utf-8') as f:
+            data = yaml.safe_load(f)
+
+    # 支持两种写法：{套件描述: {字段: 值}} 或 [{套件描述: ..., 字段: 值}, ...]
+    if isinstance(data, Mapping):
+        records = data.items()
+    elif isinstance(data, list) and all(isinstance(r, Mapping) for r in data):
+        records = ((r.get(DESCRIPTION_COLUMN), r) for r in data)
+    else:
+        raise ValueError("YAML 格式的BOM应为 套件描述→字段 的映射，或含套件描述字段的列表")
+    return _records_to_catalog(records)
+
+
+def load_bom(file) -> BOMCatalog:
+    """加载BOM文件（Excel / CSV / Parquet / Feather 或 YAML）并校验
+
+    表格文件需要 套件描述、床单类型、床单尺寸、被套尺寸、枕套数量 五列。
+    """
+    name = str(file) if isinstance(file, (str, Path)) else getattr(file, 'name', '') or ''
+    if Path(name).suffix.lower() in YAML_SUFFIXES:
+        return _load_yaml(file)
+
+    required = [DESCRIPTION_COLUMN, *BOM_COLUMNS]
+    df = read_table(file, columns=required)
+    missing = [c for c in required if c not in df.columns]
+    if missing:
+        raise ValueError(f"BOM文件缺少必需列: {', '.join(missing)}")
+    return _records_to_catalog(
+        (row[DESCRIPTION_COLUMN], row) for row in df.to_dict('records')
+    )
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+输入缓存：按文件内容哈希把解析结果持久化到磁盘（Parquet），进程重启后仍然有效
+"""
+
+import hashlib
+import os
+import tempfile
+import time
+from os import PathLike
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import pandas as pd
+
+from . import diagnostics
+from .aggregation import aggregate_component_inventory
+from .loaders import load_inventory, load_sales_ratio, load_sku_mapping
+from .parsing import PARSE_CACHE, ParseCache
+
+
+# =============================================================================
+# 缓存配置
+# =============================================================================
+
+# 解析逻辑或存储格式变化时递增，旧缓存自然失效
+CACHE_VERSION = 2
+
+DEFAULT_CACHE_DIR = Path.home() / '.cache' / 'icas'
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(file) -> str:
+    """计算文件内容哈希；支持路径、字节串和文件对象（读取后复位）"""
+    h = hashlib.blake2b(digest_size=20)
+    h.update(f'icas-v{CACHE_VERSION}'.encode())
+    if isinstance(file, (bytes, bytearray, memoryview)):
+        h.update(file)
+    elif isinstance(file, (str, PathLike)):
+        with open(file, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                h.update(chunk)
+    elif hasattr(file, 'getbuffer'):
+        h.update(file.getbuffer())
+    else:
+        file.seek(0)
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+            h.update(chunk)
+        file.seek(0)
+    return h.hexdigest()
+
+
+# =============================================================================
+# 磁盘缓存
+# =============================================================================
+
+class InputCache:
+    """内容寻址的输入缓存
+
+    键为 (数据类型, 文件内容哈希)，值为规范化后的 DataFrame，以 Parquet 存储。
+    命中时刷新文件修改时间，总大小超过 max_bytes 时按最久未使用淘汰。
+    pyarrow 不可用或某个结果无法写成 Parquet 时直接返回计算结果，不影响功能。
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._persisted_misses: Optional[int] = None
+
+    @classmethod
+    def from_env(cls) -> 'InputCache':
+        """从环境变量 ICAS_CACHE_DIR / ICAS_CACHE_MAX_MB 创建"""
+        directory = os.environ.get('ICAS_CACHE_DIR', DEFAULT_CACHE_DIR)
+        max_mb = os.environ.get('ICAS_CACHE_MAX_MB')
+        max_bytes = int(float(max_mb) * 1024 * 1024) if max_mb else DEFAULT_MAX_BYTES
+        return cls(directory, max_bytes)
+
+    def _path(self, kind: str, digest: str) -> Path:
+        return self.directory / f'{kind}-{digest}.parquet'
+
+    def _read(self, path: Path) -> Optional[pd.DataFrame]:
+        try:
+            df = pd.read_parquet(path)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # 损坏或无法读取的缓存文件直接丢弃
+            path.unlink(missing_ok=True)
+            return None
+        now = time.time()
+        try:
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+        return df
+
+    def _write(self, path: Path, df: pd.DataFrame) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        os.close(fd)
+        try:
+            df.to_parquet(tmp)
+            os.replace(tmp, path)
+        except Exception:
+            Path(tmp).unlink(missing_ok=True)
+            return
+        self.evict()
+
+    def _cached(
+        self,
+        kind: str,
+        digest: str,
+        compute: Callable[[], pd.DataFrame],
+    ) -> pd.DataFrame:
+        path = self._path(kind, digest)
+        df = self._read(path)
+        if df is None:
+            diagnostics.count('input_cache_misses')
+            df = compute()
+            self._write(path, df)
+        else:
+            diagnostics.count('input_cache_hits')
+        return df
+
+    def evict(self) -> None:
+        """总大小超过上限时，按最久未使用删除缓存文件"""
+        entries = []
+        for path in self.directory.glob('*.parquet'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+    def clear(self) -> None:
+        for path in self.directory.glob('*.parquet'):
+            path.unlink(missing_ok=True)
+
+    # -------------------------------------------------------------------------
+    # 商品名称解析缓存
+    # -------------------------------------------------------------------------
+
+    def _parse_cache_path(self) -> Path:
+        return self.directory / f'names-v{CACHE_VERSION}.parquet'
+
+    def restore_parse_cache(self, cache: ParseCache = PARSE_CACHE) -> bool:
+        """把磁盘上保存的商品名称解析结果合并到 cache（进程启动时调用一次）"""
+        restored = cache.load(self._parse_cache_path())
+        self._persisted_misses = cache.misses
+        return restored
+
+    def persist_parse_cache(self, cache: ParseCache = PARSE_CACHE) -> None:
+        """把 cache 中新解析的名称写回磁盘，供之后启动的进程使用；自上次写入后没有新名称时跳过
+
+        写入前先合并磁盘上的版本，多个进程交替写入时不会丢掉对方解析过的名称。
+        """
+        if cache.misses == self._persisted_misses:
+            return
+        path = self._parse_cache_path()
+        try:
+            cache.load(path)
+            cache.save(path)
+        except Exception:
+            return
+        self._persisted_misses = cache.misses
+        self.evict()
+
+    # -------------------------------------------------------------------------
+    # 各类输入
+    # -------------------------------------------------------------------------
+
+    def load_inventory(self, file, digest: Optional[str] = None) -> pd.DataFrame:
+        """带缓存的 load_inventory"""
+        digest = digest or file_digest(file)
+        return self._cached('inventory', digest, lambda: load_inventory(file))
+
+    def load_component_inventory(self, file) -> pd.Series:
+        """库存源文件 → 聚合后的零部件库存，命中时无需再读取和解析原文件"""
+        digest = file_digest(file)
+        df = self._cached(
+            'components',
+            digest,
+            lambda: aggregate_component_inventory(self.load_inventory(file, digest)).to_frame(),
+        )
+        return df['库存']
+
+    def load_sales_ratio(self, file) -> Dict[str, float]:
+        """带缓存的 load_sales_ratio"""
+        df = self._cached(
+            'ratio',
+            file_digest(file),
+            lambda: pd.DataFrame(list(load_sales_ratio(file).items()), columns=['套件描述', '比例']),
+        )
+        return dict(zip(df['套件描述'], df['比例']))
+
+    def load_sku_mapping(self, file) -> pd.DataFrame:
+        """带缓存的 load_sku_mapping"""
+        return self._cached('mapping', file_digest(file), lambda: load_sku_mapping(file))
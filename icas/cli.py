@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+命令行批处理入口（不加载 Streamlit）
+
+示例：
+    python -m icas -i 库存目录/ -r 销售比例.xlsx -m SKU映射.xlsx -o 结果.xlsx \
+        --safety-factor 0.3 --colors 木青绿四季款 米白四季款
+"""
+
+import argparse
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+import pandas as pd
+
+from . import diagnostics
+from .aggregation import aggregate_component_inventory
+from .bom import load_bom
+from .cache import InputCache
+from .history import SnapshotStore
+from .config import DEFAULT_ACTIVE_COLORS
+from .engine import with_detail
+from .export import EXPORT_FORMATS, SIMPLE_COLUMNS, export_bytes
+from .delta import LiveInventory
+from .loaders import (
+    TABLE_FORMATS,
+    load_inventory,
+    load_inventory_delta,
+    load_sales_ratio,
+    load_sku_mapping,
+)
+from .parallel import EXECUTORS, calculate_sku_inventory_parallel
+from .parsing import PARSE_CACHE
+from .warehouses import load_warehouse_inventories
+
+
+def expand_input_paths(path: str) -> List[Path]:
+    """文件原样返回；目录展开为其中可读取的表格文件（按文件名排序）"""
+    p = Path(path)
+    if p.is_dir():
+        files = sorted(
+            f for f in p.iterdir()
+            if f.suffix.lower() in TABLE_FORMATS and not f.name.startswith('~$')
+        )
+        if not files:
+            raise ValueError(f"目录中没有可读取的文件: {path}")
+        return files
+    if not p.exists():
+        raise ValueError(f"文件不存在: {path}")
+    return [p]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='python -m icas',
+        description='套件库存自动计算（批处理）',
+    )
+    parser.add_argument('-i', '--inventory', required=True,
+                        help='库存源文件或目录；目录中每个文件视为一个仓库，并行读取后合并')
+    parser.add_argument('-r', '--ratio', required=True, help='销售比例表文件或目录')
+    parser.add_argument('-m', '--mapping', required=True, help='SKU映射表文件或目录')
+    parser.add_argument('-b', '--bom', default=None,
+                        help='BOM配置文件（Excel/CSV/YAML：套件描述、床单类型、床单尺寸、被套尺寸、枕套数量），默认使用内置BOM')
+    parser.add_argument('-d', '--delta', default=None,
+                        help='库存变动文件或目录（商品名称、变动数），按文件名顺序叠加到库存上')
+    parser.add_argument('-o', '--output', default='套件库存计算结果.xlsx',
+                        help='结果文件，按后缀写出 .xlsx、.csv 或 .parquet（默认: %(default)s）')
+    parser.add_argument('--safety-factor', type=float, default=0.3,
+                        help='安全库存系数（默认: %(default)s）')
+    parser.add_argument('--colors', nargs='+', default=None,
+                        help='在售颜色，默认使用内置在售颜色列表')
+    parser.add_argument('--detail', action='store_true', help='输出计算明细列')
+    parser.add_argument('--cache-dir', default=None,
+                        help='输入缓存目录；指定后按文件内容缓存解析结果，重复输入直接复用')
+    parser.add_argument('--diagnostics', action='store_true',
+                        help='结束后向标准错误输出一行 JSON 诊断（各阶段耗时、内存变化、计数器）')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='按颜色分片并行计算的并行数，0 表示使用全部CPU核（默认: %(default)s，即串行）')
+    parser.add_argument('--chunk-size', type=int, default=None,
+                        help='每个分片的颜色数，默认按并行数自动划分')
+    parser.add_argument('--executor', choices=EXECUTORS, default='auto',
+                        help='并行方式：进程池、线程池或串行，auto 按数据量选择（默认: %(default)s）')
+    parser.add_argument('--read-workers', type=int, default=0,
+                        help='并行读取多个库存文件的并行数，0 表示使用全部CPU核（默认: %(default)s）')
+    parser.add_argument('--by-warehouse', default=None,
+                        help='多个库存文件时，另写出 商品 × 仓库 的库存明细（按后缀写出 .xlsx、.csv 或 .parquet）')
+    parser.add_argument('--history', default=None,
+                        help='把本次结果和零部件库存追加到历史快照库（SQLite 文件）')
+    parser.add_argument('--label', default='', help='历史快照的标签')
+    parser.add_argument('--unparsed-report', default=None,
+                        help='写出无法解析的商品名称及出现次数（按后缀写出 .xlsx、.csv 或 .parquet）')
+    return parser
+
+
+def write_results(results: pd.DataFrame, output: Path) -> None:
+    """按后缀写出结果文件（.xlsx / .csv / .parquet，其他后缀按 Excel 写出）"""
+    suffix = output.suffix.lower()
+    fmt = next((f for f, spec in EXPORT_FORMATS.items() if spec['suffix'] == suffix), 'xlsx')
+    output.write_bytes(export_bytes(results, fmt))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if not (args.diagnostics or diagnostics.log_enabled_from_env()):
+        return run(args)
+
+    # 诊断：各阶段耗时、内存变化与计数器，结束后以一行 JSON 写到标准错误
+    diagnostics.configure_json_logging()
+    run_diagnostics = diagnostics.Diagnostics()
+    with run_diagnostics.activate():
+        code = run(args)
+    run_diagnostics.log()
+    return code
+
+
+def run(args: argparse.Namespace) -> int:
+    if not 0 < args.safety_factor <= 1:
+        print("安全库存系数需在 (0, 1] 范围内", file=sys.stderr)
+        return 2
+
+    active_colors = args.colors or DEFAULT_ACTIVE_COLORS
+
+    try:
+        bom = load_bom(args.bom) if args.bom else None
+        inventory_files = expand_input_paths(args.inventory)
+        ratio_files = expand_input_paths(args.ratio)
+        mapping_files = expand_input_paths(args.mapping)
+
+        cache = InputCache(args.cache_dir) if args.cache_dir else None
+        if cache:
+            cache.restore_parse_cache()
+        read_inventory = cache.load_inventory if cache else load_inventory
+        read_sales_ratio = cache.load_sales_ratio if cache else load_sales_ratio
+        read_sku_mapping = cache.load_sku_mapping if cache else load_sku_mapping
+
+        df_inventory = None
+        if cache and len(inventory_files) == 1:
+            component_inventory = cache.load_component_inventory(inventory_files[0])
+        else:
+            # 每个文件（仓库）在工作进程中读取并汇总，这里只合并各仓库的汇总结果
+            warehouses = load_warehouse_inventories(
+                inventory_files, read_inventory, workers=args.read_workers or None
+            )
+            df_inventory = warehouses.inventory
+            component_inventory = aggregate_component_inventory(df_inventory)
+            if args.by_warehouse:
+                write_results(warehouses.product_breakdown().reset_index(), Path(args.by_warehouse))
+
+        # 库存变动按文件名顺序依次应用，只重新聚合涉及的颜色
+        if args.delta:
+            if df_inventory is None:
+                df_inventory = read_inventory(inventory_files[0])
+            live = LiveInventory(df_inventory, component_inventory)
+            for f in expand_input_paths(args.delta):
+                live.apply_delta(load_inventory_delta(f))
+            component_inventory = live.component_inventory
+
+        sales_ratio = {}
+        for f in ratio_files:
+            sales_ratio.update(read_sales_ratio(f))
+
+        sku_mapping = pd.concat([read_sku_mapping(f) for f in mapping_files], ignore_index=True)
+
+        results = calculate_sku_inventory_parallel(
+            sku_mapping,
+            sales_ratio,
+            component_inventory,
+            active_colors,
+            args.safety_factor,
+            workers=args.workers or None,
+            chunk_size=args.chunk_size,
+            executor=args.executor,
+            bom=bom,
+        )
+    except ValueError as e:
+        print(f"计算出错: {e}", file=sys.stderr)
+        return 1
+    if cache:
+        cache.persist_parse_cache()
+
+    if args.history:
+        run_id = SnapshotStore(args.history).record(
+            results, component_inventory, label=args.label, source=str(args.inventory)
+        )
+        print(f"已记录历史快照：批次 {run_id} → {args.history}")
+
+    results = with_detail(results) if args.detail else results[SIMPLE_COLUMNS]
+
+    output = Path(args.output)
+    write_results(results, output)
+
+    print(f"计算完成：{len(results)} 个SKU，"
+          f"{int((results['可售库存'] > 0).sum())} 个有库存，"
+          f"总可售 {int(results['可售库存'].sum())} 套 → {output}")
+    if args.unparsed_report:
+        unparsed = PARSE_CACHE.unparsed_report()
+        write_results(unparsed, Path(args.unparsed_report))
+        print(f"无法解析的商品名称 {len(unparsed)} 个 → {args.unparsed_report}")
+    return 0
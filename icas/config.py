@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+在售颜色与BOM配置
+"""
+
+from dataclasses import asdict, fields
+from typing import Dict
+
+import pandas as pd
+
+from .models import BOMItem
+
+
+# =============================================================================
+# 在售颜色配置
+# =============================================================================
+
+DEFAULT_ACTIVE_COLORS = [
+    '木青绿四季款',
+    '米白四季款',
+    '丁香紫四季款',
+    '雨雾蓝四季款',
+    '羊绒棕四季款',
+    '暮云粉四季款',
+    '繁星黄加暖款',
+    '暮光褐加暖款',
+    '松烟灰四季款',
+]
+
+
+# =============================================================================
+# BOM配置
+# =============================================================================
+
+BOM_CONFIG = {
+    "【床单款】1.5米床套件，搭配200x230cm被套": BOMItem("床单", "240*250", "200*230", 2),
+    "【床笠款】1.5米床套件，搭配200x230cm被套": BOMItem("床笠", "150*200", "200*230", 2),
+    "【床单款】1.5米床套件，搭配220x240cm被套": BOMItem("床单", "240*250", "220*240", 2),
+    "【床笠款】1.5米床套件，搭配220x240cm被套": BOMItem("床笠", "150*200", "220*240", 2),
+    "【床单款】1.8米床套件，搭配200x230cm被套": BOMItem("床单", "270*250", "200*230", 2),
+    "【床笠款】1.8米床套件，搭配200x230cm被套": BOMItem("床笠", "180*200", "200*230", 2),
+    "【床单款】1.8米床套件，搭配220x240cm被套": BOMItem("床单", "270*250", "220*240", 2),
+    "【床笠款】1.8米床套件，搭配220x240cm被套": BOMItem("床笠", "180*200", "220*240", 2),
+    "【床单款】2米床（200*200cm）套件，搭配220x240cm被套": BOMItem("床单", "270*250", "220*240", 2),
+    "【床笠款】2米床（200*200cm）套件，搭配220x240cm被套": BOMItem("床笠", "200*200", "220*240", 2),
+    "【床笠款】2.2米床（220*200cm）套件，搭配220x240cm被套": BOMItem("床笠", "220*200", "220*240", 2),
+}
+
+
+def build_bom_frame(bom_config: Dict[str, BOMItem] = BOM_CONFIG) -> pd.DataFrame:
+    """将BOM配置展开为以套件描述为索引的表，供向量化计算关联"""
+    return pd.DataFrame(
+        [asdict(item) for item in bom_config.values()],
+        index=pd.Index(list(bom_config), name='套件描述'),
+        columns=[f.name for f in fields(BOMItem)],
+    )
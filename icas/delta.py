@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+库存变动：把变动文件（商品名称, ±数量）应用到已加载的库存上，只重新聚合受影响的颜色
+
+聚合不是线性的（单只枕套按商品向下取整、库存不为正的商品不计入），因此变动先累加到
+商品级库存，再只对变动涉及颜色的全部商品重新聚合。结果与用合并后的完整快照
+重新 load_inventory + aggregate_component_inventory 一致。
+"""
+
+import copy
+from typing import List, Optional
+
+import pandas as pd
+
+from . import diagnostics
+from .aggregation import COMPONENT_INDEX, aggregate_component_inventory
+from .parsing import parse_product_names
+
+
+# =============================================================================
+# 商品级库存
+# =============================================================================
+
+class LiveInventory:
+    """商品级库存快照及其零部件库存，支持增量应用库存变动
+
+    df_inventory 为 load_inventory 的结果；已有聚合结果（如输入缓存命中）时
+    可直接传入 component_inventory，商品颜色在第一次应用变动时才解析。
+    """
+
+    def __init__(self, df_inventory: pd.DataFrame, component_inventory: Optional[pd.Series] = None):
+        self._stock = (
+            df_inventory.groupby('商品名称', sort=False)['库存'].sum()
+            .fillna(0).astype('int64')
+        )
+        self._colors: Optional[pd.Series] = None
+        if component_inventory is None:
+            component_inventory = aggregate_component_inventory(df_inventory)
+        self.component_inventory = component_inventory
+
+    def copy(self) -> 'LiveInventory':
+        """独立副本，之后应用的变动互不影响"""
+        other = copy.copy(self)
+        other._stock = self._stock.copy()
+        return other
+
+    @property
+    def snapshot(self) -> pd.DataFrame:
+        """当前商品级库存，与 load_inventory 的返回格式相同"""
+        return pd.DataFrame({'商品名称': self._stock.index, '库存': self._stock.to_numpy()})
+
+    def _parse_colors(self, names: pd.Index) -> pd.Series:
+        return pd.Series(parse_product_names(pd.Series(names))['color'].array, index=names)
+
+    def _product_colors(self) -> pd.Series:
+        if self._colors is None:
+            with diagnostics.stage('parse_names'):
+                self._colors = self._parse_colors(self._stock.index)
+        return self._colors
+
+    @diagnostics.timed('apply_delta')
+    def apply_delta(self, delta: pd.DataFrame) -> List[str]:
+        """应用一批库存变动（商品名称、库存两列，库存为变动数），返回受影响的颜色"""
+        changes = (
+            delta.groupby('商品名称', sort=False)['库存'].sum()
+            .fillna(0).astype('int64')
+        )
+        changes = changes[changes != 0]
+        if changes.empty:
+            return []
+
+        colors = self._product_colors()
+        existing = changes.index.isin(self._stock.index)
+        updated = changes[existing]
+        self._stock.loc[updated.index] += updated
+
+        added = changes[~existing]
+        if not added.empty:
+            self._stock = pd.concat([self._stock, added])
+            self._colors = colors = pd.concat([colors, self._parse_colors(added.index)])
+
+        touched = list(pd.unique(colors.loc[changes.index].dropna()))
+        if not touched:
+            return []
+
+        # 受影响颜色的全部商品重新聚合，替换零部件库存中这些颜色的部分
+        products = self._stock[colors.isin(touched).to_numpy()]
+        recomputed = aggregate_component_inventory(
+            pd.DataFrame({'商品名称': products.index, '库存': products.to_numpy()})
+        )
+        inventory = self.component_inventory
+        untouched = inventory[~inventory.index.get_level_values('颜色').isin(touched)]
+        combined = pd.concat([untouched, recomputed]) if not untouched.empty else recomputed
+        combined.index.names = COMPONENT_INDEX
+        self.component_inventory = combined.rename('库存')
+
+        diagnostics.count('delta_colors_touched', len(touched))
+        return touched
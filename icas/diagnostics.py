@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+运行诊断：各阶段耗时与内存变化、热点计数器，可输出为结构化 JSON 日志
+
+未启用时 stage() 返回共享的空上下文、count() 直接返回，计数所需的额外统计
+也由 enabled() 守卫不做计算，对计算本身几乎没有开销。
+
+    diagnostics = Diagnostics()
+    with diagnostics.activate():
+        ...                        # 计算核心内部的 stage() / count() 都记到这里
+    diagnostics.log()              # 写一条 JSON 日志
+"""
+
+import contextlib
+import functools
+import importlib.util
+import json
+import logging
+import os
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional
+
+
+# =============================================================================
+# 配置
+# =============================================================================
+
+logger = logging.getLogger('icas.diagnostics')
+
+# 阶段名 → 界面显示名
+STAGE_LABELS = {
+    'load_inventory': '读取库存文件',
+    'load_warehouses': '读取多仓库库存',
+    'parse_names': '解析商品名称',
+    'aggregate': '聚合零部件库存',
+    'load_sales_ratio': '读取销售比例',
+    'load_sku_mapping': '读取SKU映射',
+    'calculate': '分配计算',
+    'apply_safety_factor': '乘安全系数',
+    'export': '导出文件',
+    'load_inventory_delta': '读取库存变动',
+    'apply_delta': '应用库存变动',
+    'scenarios': '情景模拟',
+    'plan_purchases': '补货计划',
+}
+
+# 计数器名 → 界面显示名
+COUNTER_LABELS = {
+    'rows_read': '读取行数',
+    'rows_excluded': '按关键词排除的行数',
+    'unparsed_names': '无法解析的商品名称',
+    'skus_missing_bom': '缺少BOM配置而跳过的SKU',
+    'input_cache_hits': '输入缓存命中',
+    'input_cache_misses': '输入缓存未命中',
+    'parse_cache_hits': '商品名称解析缓存命中',
+    'parse_cache_misses': '商品名称解析缓存未命中',
+    'delta_rows_read': '库存变动行数',
+    'delta_colors_touched': '库存变动涉及的颜色',
+    'scenario_ratio_sets': '情景模拟中不同的比例调整数',
+    'result_cache_hits': '结果缓存命中',
+    'result_cache_misses': '结果缓存未命中',
+    'warehouses_read': '读取的仓库库存文件数',
+    'plan_unreachable_skus': '销售比例为0、无法达到目标的SKU',
+}
+
+HAS_PSUTIL = importlib.util.find_spec('psutil') is not None
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def _current_rss() -> Optional[int]:
+    """当前进程常驻内存（字节）；无法获取时返回 None"""
+    if HAS_PSUTIL:
+        import psutil
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+# =============================================================================
+# 诊断记录
+# =============================================================================
+
+class Diagnostics:
+    """一次运行的阶段耗时、内存变化和计数器"""
+
+    def __init__(self, run_id: Optional[str] = None):
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.stages: List[Dict] = []
+        self.counters: Counter = Counter()
+        self._depth = 0
+
+    @contextlib.contextmanager
+    def activate(self) -> Iterator['Diagnostics']:
+        """在此范围内把计算核心中的 stage() / count() 记到本对象"""
+        token = _ACTIVE.set(self)
+        try:
+            yield self
+        finally:
+            _ACTIVE.reset(token)
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        # 开始时登记，stages 按开始顺序排列，嵌套阶段紧跟在外层之后
+        entry = {'stage': name, 'depth': self._depth, 'seconds': None, 'memory_delta_mb': None}
+        self.stages.append(entry)
+        rss_before = _current_rss()
+        start = time.perf_counter()
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            entry['seconds'] = round(time.perf_counter() - start, 6)
+            rss_after = _current_rss()
+            if rss_before is not None and rss_after is not None:
+                entry['memory_delta_mb'] = round((rss_after - rss_before) / 2**20, 2)
+
+    def count(self, name: str, value: int = 1) -> None:
+        self.counters[name] += int(value)
+
+    def to_dict(self) -> dict:
+        rss = _current_rss()
+        return {
+            'event': 'icas.run',
+            'run_id': self.run_id,
+            'timestamp': time.time(),
+            'stages': self.stages,
+            'counters': dict(self.counters),
+            'rss_mb': round(rss / 2**20, 1) if rss is not None else None,
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), ensure_ascii=False)
+
+    def log(self, level: int = logging.INFO) -> None:
+        """以一行 JSON 写入 icas.diagnostics 日志"""
+        logger.log(level, self.to_json())
+
+
+_ACTIVE: ContextVar[Optional[Diagnostics]] = ContextVar('icas_diagnostics', default=None)
+_NULL_STAGE = contextlib.nullcontext()
+
+
+# =============================================================================
+# 计算核心使用的钩子
+# =============================================================================
+
+def enabled() -> bool:
+    """当前是否在收集诊断；用于守卫只为计数而做的额外统计"""
+    return _ACTIVE.get() is not None
+
+
+def stage(name: str):
+    """记录一个阶段；未启用时返回共享的空上下文"""
+    diagnostics = _ACTIVE.get()
+    if diagnostics is None:
+        return _NULL_STAGE
+    return diagnostics.stage(name)
+
+
+def timed(name: str) -> Callable:
+    """装饰器：把函数的每次调用记为一个阶段"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name: str, value: int = 1) -> None:
+    diagnostics = _ACTIVE.get()
+    if diagnostics is not None:
+        diagnostics.count(name, value)
+
+
+def configure_json_logging(stream=None) -> None:
+    """给 icas.diagnostics 日志加一个只输出消息本身（即 JSON）的处理器，重复调用不会重复添加"""
+    if any(getattr(handler, '_icas_json', False) for handler in logger.handlers):
+        return
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    handler._icas_json = True
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def log_enabled_from_env() -> bool:
+    """环境变量 ICAS_DIAGNOSTICS_LOG=1 时始终输出 JSON 诊断日志"""
+    return os.environ.get('ICAS_DIAGNOSTICS_LOG', '').strip().lower() in ('1', 'true', 'yes', 'on')
@@ -0,0 +1,488 @@
+# -*- coding: utf-8 -*-
+"""
+核心算法：按销售比例分配共享零部件，计算SKU可售库存
+"""
+
+import sys
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from . import diagnostics
+from .bom import DEFAULT_BOM, BOMCatalog
+
+
+# =============================================================================
+# 核心算法
+# =============================================================================
+
+def calculate_sku_inventory(
+    sku_mapping: pd.DataFrame,
+    sales_ratio: Dict[str, float],
+    component_inventory: pd.Series,
+    active_colors: list,
+    safety_factor: float = 0.3,
+    bom: Optional[BOMCatalog] = None
+) -> pd.DataFrame:
+    """核心算法：计算SKU可售库存（bom 默认为内置的 BOM_CONFIG）"""
+    catalog = bom if bom is not None else DEFAULT_BOM
+    results = []
+
+    for color in sku_mapping['颜色'].unique():
+        if color not in active_colors:
+            continue
+
+        color_skus = sku_mapping[sku_mapping['颜色'] == color]
+        sku_demands = []
+
+        for _, row in color_skus.iterrows():
+            sku_id = row['SKU_ID']
+            sku_desc = row['套件描述']
+
+            bom = catalog.get(sku_desc)
+            if bom is None:
+                continue
+
+            ratio = sales_ratio.get(sku_desc, 0)
+
+            sku_demands.append({
+                'sku_id': sku_id,
+                'sku_desc': sku_desc,
+                'color': color,
+                'bom': bom,
+                'ratio': ratio
+            })
+
+        if not sku_demands:
+            continue
+
+        duvet_pools = {}
+        sheet_pools = {}
+
+        for demand in sku_demands:
+            bom = demand['bom']
+
+            duvet_key = bom.duvet_size
+            if duvet_key not in duvet_pools:
+                duvet_pools[duvet_key] = []
+            duvet_pools[duvet_key].append(demand)
+
+            sheet_key = (bom.sheet_type, bom.sheet_size)
+            if sheet_key not in sheet_pools:
+                sheet_pools[sheet_key] = []
+            sheet_pools[sheet_key].append(demand)
+
+        color_base = color
+
+        # 获取该颜色的枕套总库存（套数）
+        # 库存取成 Python int：numpy 标量参与 sum() 时不做补偿求和，结果会与原实现差在末位
+        pillow_total = int(component_inventory.get(('枕套', color_base, '标准'), 0))
+
+        # 第一轮：计算每个SKU基于被套和床单/笠的理论可组装数
+        sku_theoretical = []
+        for demand in sku_demands:
+            bom = demand['bom']
+            ratio = demand['ratio']
+
+            if ratio == 0:
+                sku_theoretical.append({
+                    'demand': demand,
+                    'allocated_duvet': 0,
+                    'allocated_sheet': 0,
+                    'theoretical': 0,
+                    'duvet_stock': 0,
+                    'sheet_stock': 0,
+                    'duvet_pool_ratio': 0,
+                    'sheet_pool_ratio': 0,
+                    'is_zero_ratio': True
+                })
+                continue
+
+            # 被套分配
+            duvet_key = bom.duvet_size
+            duvet_pool_ratio = sum(d['ratio'] for d in duvet_pools[duvet_key])
+            duvet_stock = int(component_inventory.get(('被套', color_base, duvet_key), 0))
+            allocated_duvet = duvet_stock * (ratio / duvet_pool_ratio) if duvet_pool_ratio > 0 else 0
+
+            # 床单/笠分配
+            sheet_key = (bom.sheet_type, bom.sheet_size)
+            sheet_pool_ratio = sum(d['ratio'] for d in sheet_pools[sheet_key])
+            sheet_type = bom.sheet_type
+            sheet_size = bom.sheet_size
+            sheet_stock = int(component_inventory.get((sheet_type, color_base, sheet_size), 0))
+            allocated_sheet = sheet_stock * (ratio / sheet_pool_ratio) if sheet_pool_ratio > 0 else 0
+
+            # 被套和床单/笠的短板（不含枕套）
+            theoretical = min(allocated_duvet, allocated_sheet)
+
+            sku_theoretical.append({
+                'demand': demand,
+                'allocated_duvet': allocated_duvet,
+                'allocated_sheet': allocated_sheet,
+                'theoretical': theoretical,
+                'duvet_stock': duvet_stock,
+                'sheet_stock': sheet_stock,
+                'duvet_pool_ratio': duvet_pool_ratio,
+                'sheet_pool_ratio': sheet_pool_ratio,
+                'is_zero_ratio': False
+            })
+
+        # 第二轮：检查枕套是否足够，如果不够则按比例缩减
+        total_theoretical = sum(s['theoretical'] for s in sku_theoretical)
+        pillow_sufficient = pillow_total >= total_theoretical
+        pillow_ratio = pillow_total / total_theoretical if total_theoretical > 0 else 1
+
+        # 生成最终结果
+        for sku_data in sku_theoretical:
+            demand = sku_data['demand']
+            bom = demand['bom']
+
+            if sku_data['is_zero_ratio']:
+                results.append({
+                    'SKU_ID': demand['sku_id'],
+                    '套件描述': demand['sku_desc'],
+                    '颜色': color,
+                    '可售库存': 0,
+                    '计算明细': '比例为0'
+                })
+                continue
+
+            theoretical = sku_data['theoretical']
+            allocated_duvet = sku_data['allocated_duvet']
+            allocated_sheet = sku_data['allocated_sheet']
+
+            # 如果枕套不足，按比例缩减
+            if not pillow_sufficient:
+                theoretical = theoretical * pillow_ratio
+
+            final_stock = int(theoretical * safety_factor)
+
+            sheet_type = bom.sheet_type
+            sheet_size = bom.sheet_size
+            duvet_key = bom.duvet_size
+
+            if pillow_sufficient:
+                detail = (f"被套{duvet_key}:{sku_data['duvet_stock']}*{demand['ratio']:.4f}/{sku_data['duvet_pool_ratio']:.4f}={allocated_duvet:.1f}, "
+                         f"{sheet_type}{sheet_size}:{sku_data['sheet_stock']}*{demand['ratio']:.4f}/{sku_data['sheet_pool_ratio']:.4f}={allocated_sheet:.1f}, "
+                         f"枕套充足({pillow_total}套), "
+                         f"短板:{theoretical:.1f}*{safety_factor}={final_stock}")
+            else:
+                detail = (f"被套{duvet_key}:{sku_data['duvet_stock']}*{demand['ratio']:.4f}/{sku_data['duvet_pool_ratio']:.4f}={allocated_duvet:.1f}, "
+                         f"{sheet_type}{sheet_size}:{sku_data['sheet_stock']}*{demand['ratio']:.4f}/{sku_data['sheet_pool_ratio']:.4f}={allocated_sheet:.1f}, "
+                         f"枕套不足({pillow_total}套<{total_theoretical:.0f}套需求,缩减{pillow_ratio:.2%}), "
+                         f"短板:{theoretical:.1f}*{safety_factor}={final_stock}")
+
+            results.append({
+                'SKU_ID': demand['sku_id'],
+                '套件描述': demand['sku_desc'],
+                '颜色': color,
+                '可售库存': final_stock,
+                '计算明细': detail
+            })
+
+    return pd.DataFrame(results)
+
+
+# 计算明细用到的中间量，按明细文本中的出现顺序排列
+TRACE_COLUMNS = [
+    '被套尺寸', '被套库存', '比例', '被套池比例', '被套分配',
+    '床单/笠类型', '床单/笠尺寸', '床单/笠库存', '床单/笠池比例', '床单/笠分配',
+    '枕套库存', '枕套充足', '颜色理论总数', '枕套缩减比例', '理论可售',
+]
+THEORETICAL_COLUMNS = [
+    'SKU_ID', '套件描述', '颜色', '比例',
+    '被套尺寸', '被套库存', '被套池比例', '被套分配',
+    '床单/笠类型', '床单/笠尺寸', '床单/笠库存', '床单/笠池比例', '床单/笠分配',
+    '枕套库存', '颜色理论总数', '枕套充足', '枕套缩减比例', '理论可售',
+]
+# 最终结果：理论计算的数值列 + 安全系数 + 可售库存
+RESULT_COLUMNS = ['SKU_ID', '套件描述', '颜色', '可售库存'] + THEORETICAL_COLUMNS[3:] + ['安全系数']
+# 详细版结果（含渲染后的计算明细文本），与参考实现的输出列一致
+DETAIL_COLUMNS = ['SKU_ID', '套件描述', '颜色', '可售库存', '计算明细']
+
+# Python 3.12 起内置 sum() 对浮点数做补偿求和
+NEUMAIER_SUM = sys.version_info >= (3, 12)
+
+
+def _lookup_stock(component_inventory: pd.Series, comp_types, colors, sizes) -> np.ndarray:
+    """按 (类型, 颜色, 尺寸) 批量读取零部件库存，缺失记为0"""
+    keys = pd.MultiIndex.from_arrays([comp_types, colors, sizes])
+    return component_inventory.reindex(keys).fillna(0).astype('int64').to_numpy()
+
+
+def _group_index(keys: list) -> Tuple[np.ndarray, np.ndarray, int]:
+    """按 keys 分组（保持首次出现顺序），返回每行的组号、组内位置和组数"""
+    grouped = pd.Series(0, index=keys[0].index).groupby(keys, sort=False, observed=True)
+    return grouped.ngroup().to_numpy(), grouped.cumcount().to_numpy(), grouped.ngroups
+
+
+def _sequential_sum(data: np.ndarray, groups: Tuple[np.ndarray, np.ndarray, int]) -> np.ndarray:
+    """分组求和并广播回每一行，逐位复现内置 sum() 的顺序累加
+
+    参考实现用 sum() 逐个累加比例和理论可售数，pandas 的分组求和采用补偿算法，
+    末位可能不同。这里按组内位置逐列推进，所有组同时累加；Python 3.12 起 sum()
+    对浮点数使用 Neumaier 补偿求和，这里同样区分处理。
+    data 可以是二维（行 × 情景），各列分别求和。
+    """
+    group_ids, positions, ngroups = groups
+    total = np.zeros((ngroups,) + data.shape[1:])
+    compensation = np.zeros_like(total)
+    with np.errstate(invalid='ignore'):
+        for position in range(positions.max() + 1 if len(data) else 0):
+            rows = positions == position
+            ids, x = group_ids[rows], data[rows]
+            current = total[ids]
+            t = current + x
+            if NEUMAIER_SUM:
+                compensation[ids] += np.where(np.abs(current) >= np.abs(x), (current - t) + x, (x - t) + current)
+            total[ids] = t
+        if NEUMAIER_SUM:
+            adjust = (compensation != 0) & np.isfinite(compensation)
+            total[adjust] += compensation[adjust]
+    return total[group_ids]
+
+
+class Allocation:
+    """分配计算中与销售比例无关的部分：关联BOM后的SKU、零部件库存和共享池分组
+
+    同一组输入可用不同的比例向量（或 行 × 情景 的比例矩阵）多次调用 allocate。
+    """
+
+    def __init__(self, skus: pd.DataFrame, component_inventory: pd.Series):
+        self.skus = skus
+        color = skus['颜色']
+        n = len(skus)
+        self.duvet_stock = _lookup_stock(component_inventory, ['被套'] * n, color, skus['duvet_size'])
+        self.sheet_stock = _lookup_stock(component_inventory, skus['sheet_type'], color, skus['sheet_size'])
+        self.pillow_total = _lookup_stock(component_inventory, ['枕套'] * n, color, ['标准'] * n)
+        # 共享池分组：(组号, 组内位置, 组数)，见 _group_index
+        self.duvet_pools = _group_index([color, skus['duvet_size']])
+        self.sheet_pools = _group_index([color, skus['sheet_type'], skus['sheet_size']])
+        self.color_groups = _group_index([color])
+
+    def __len__(self) -> int:
+        return len(self.skus)
+
+    def ratios(self, sales_ratio: Dict[str, float]) -> np.ndarray:
+        """各SKU的销售比例，未配置的记为0"""
+        # 按不同的套件描述查一次比例，再按编码展开
+        codes, descriptions = pd.factorize(self.skus['套件描述'])
+        values = np.array([sales_ratio.get(d, 0) for d in descriptions], dtype=float)
+        return values[codes]
+
+    def allocate(self, ratio_values: np.ndarray) -> Dict[str, np.ndarray]:
+        """按比例分配并做枕套缩减；ratio_values 为一维（每行一个比例）或二维（行 × 情景）"""
+        stocks = [self.duvet_stock, self.sheet_stock, self.pillow_total]
+        if ratio_values.ndim == 2:
+            stocks = [stock[:, None] for stock in stocks]
+        duvet_stock, sheet_stock, pillow_total = stocks
+
+        duvet_pool_ratio = _sequential_sum(ratio_values, self.duvet_pools)
+        sheet_pool_ratio = _sequential_sum(ratio_values, self.sheet_pools)
+        is_zero_ratio = ratio_values == 0
+
+        # 第一轮：按比例分配被套和床单/笠，取短板（不含枕套）
+        with np.errstate(divide='ignore', invalid='ignore'):
+            allocated_duvet = np.where(duvet_pool_ratio > 0, duvet_stock * (ratio_values / duvet_pool_ratio), 0.0)
+            allocated_sheet = np.where(sheet_pool_ratio > 0, sheet_stock * (ratio_values / sheet_pool_ratio), 0.0)
+        allocated_duvet[is_zero_ratio] = 0.0
+        allocated_sheet[is_zero_ratio] = 0.0
+        theoretical = np.minimum(allocated_duvet, allocated_sheet)
+
+        # 第二轮：枕套不足时，按颜色整体缩减
+        total_theoretical = _sequential_sum(theoretical, self.color_groups)
+        pillow_sufficient = pillow_total >= total_theoretical
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pillow_ratio = np.where(total_theoretical > 0, pillow_total / total_theoretical, 1.0)
+        theoretical = np.where(pillow_sufficient, theoretical, theoretical * pillow_ratio)
+
+        return {
+            '被套池比例': duvet_pool_ratio,
+            '被套分配': allocated_duvet,
+            '床单/笠池比例': sheet_pool_ratio,
+            '床单/笠分配': allocated_sheet,
+            '颜色理论总数': total_theoretical,
+            '枕套充足': pillow_sufficient,
+            '枕套缩减比例': pillow_ratio,
+            '理论可售': theoretical,
+        }
+
+
+def prepare_allocation(
+    sku_mapping: pd.DataFrame,
+    component_inventory: pd.Series,
+    active_colors: list,
+    bom: Optional[BOMCatalog] = None,
+) -> Allocation:
+    """筛选在售SKU、关联BOM并读取零部件库存，行序与参考实现一致"""
+    # 颜色按其在映射表中首次出现的顺序输出，与参考实现一致
+    color_order = pd.Series(pd.factorize(sku_mapping['颜色'])[0], index=sku_mapping.index)
+
+    bom = bom if bom is not None else DEFAULT_BOM
+    skus = sku_mapping[sku_mapping['颜色'].isin(active_colors)]
+    if diagnostics.enabled():
+        diagnostics.count('skus_missing_bom', int((~skus['套件描述'].isin(bom.items)).sum()))
+    skus = _join_bom(skus.assign(_color_order=color_order), bom.frame)
+    skus = skus.sort_values('_color_order', kind='stable').reset_index(drop=True)
+    return Allocation(skus, component_inventory)
+
+
+def _join_bom(skus: pd.DataFrame, bom_frame: pd.DataFrame) -> pd.DataFrame:
+    """按套件描述内连接BOM（保持SKU行序），BOM的文本列以 category 编码展开
+
+    只对不同的套件描述查一次BOM，映射表原有列（包括 category 列）保持不变。
+    类别取自整张BOM表，按颜色分片计算时各分片的类别一致，可直接拼接。
+    """
+    codes, descriptions = pd.factorize(skus['套件描述'])
+    bom_rows = bom_frame.index.get_indexer(descriptions)
+    keep = codes >= 0
+    keep[keep] = bom_rows[codes[keep]] >= 0
+    selected = bom_rows[codes[keep]]
+
+    skus = skus[keep].copy()
+    for column in bom_frame.columns:
+        values = bom_frame[column]
+        if pd.api.types.is_numeric_dtype(values):
+            skus[column] = values.to_numpy()[selected]
+        else:
+            value_codes, labels = pd.factorize(values)
+            skus[column] = pd.Categorical.from_codes(value_codes[selected], categories=labels)
+    return skus
+
+
+@diagnostics.timed('calculate')
+def calculate_theoretical_inventory(
+    sku_mapping: pd.DataFrame,
+    sales_ratio: Dict[str, float],
+    component_inventory: pd.Series,
+    active_colors: list,
+    bom: Optional[BOMCatalog] = None,
+) -> pd.DataFrame:
+    """向量化计算各SKU乘安全系数之前的理论可售数（已含枕套缩减）
+
+    SKU映射先关联BOM与销售比例，所有颜色的共享池比例和按组一次求出，
+    分配与枕套缩减均为整列运算。每种颜色的结果只取决于输入文件和该颜色本身，
+    与安全系数和其他颜色无关，可按颜色缓存复用。
+    """
+    allocation = prepare_allocation(sku_mapping, component_inventory, active_colors, bom)
+    if not len(allocation):
+        return pd.DataFrame(columns=THEORETICAL_COLUMNS)
+
+    skus = allocation.skus
+    ratio_values = allocation.ratios(sales_ratio)
+    allocated = allocation.allocate(ratio_values)
+
+    return pd.DataFrame({
+        'SKU_ID': skus['SKU_ID'],
+        '套件描述': skus['套件描述'],
+        '颜色': skus['颜色'],
+        '比例': ratio_values,
+        '被套尺寸': skus['duvet_size'],
+        '被套库存': allocation.duvet_stock,
+        '被套池比例': allocated['被套池比例'],
+        '被套分配': allocated['被套分配'],
+        '床单/笠类型': skus['sheet_type'],
+        '床单/笠尺寸': skus['sheet_size'],
+        '床单/笠库存': allocation.sheet_stock,
+        '床单/笠池比例': allocated['床单/笠池比例'],
+        '床单/笠分配': allocated['床单/笠分配'],
+        '枕套库存': allocation.pillow_total,
+        '颜色理论总数': allocated['颜色理论总数'],
+        '枕套充足': allocated['枕套充足'],
+        '枕套缩减比例': allocated['枕套缩减比例'],
+        '理论可售': allocated['理论可售'],
+    })
+
+
+@diagnostics.timed('apply_safety_factor')
+def apply_safety_factor(theoretical: pd.DataFrame, safety_factor: float) -> pd.DataFrame:
+    """理论可售数 × 安全系数 → 最终结果
+
+    结果保留计算过程的数值列（库存、池比例、分配、枕套缩减比例、理论可售），
+    计算明细文本不在此生成，需要时用 render_detail / with_detail 渲染。
+    """
+    if theoretical.empty:
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+
+    is_zero_ratio = (theoretical['比例'] == 0).to_numpy()
+    final_stock = np.trunc(theoretical['理论可售'].to_numpy() * safety_factor).astype('int64')
+    final_stock[is_zero_ratio] = 0
+
+    results = theoretical[THEORETICAL_COLUMNS].assign(可售库存=final_stock, 安全系数=float(safety_factor))
+    return results[RESULT_COLUMNS]
+
+
+# =============================================================================
+# 计算明细（按需渲染）
+# =============================================================================
+
+def _detail_text(zero, duvet_key, d_stock, r, d_pool, a_duvet, sheet_type, sheet_size, s_stock, s_pool,
+                 a_sheet, pillow, sufficient, total, p_ratio, theo, safety_factor, final) -> str:
+    if zero:
+        return '比例为0'
+    return (
+        f"被套{duvet_key}:{d_stock}*{r:.4f}/{d_pool:.4f}={a_duvet:.1f}, "
+        f"{sheet_type}{sheet_size}:{s_stock}*{r:.4f}/{s_pool:.4f}={a_sheet:.1f}, "
+        + (f"枕套充足({pillow}套), " if sufficient else
+           f"枕套不足({pillow}套<{total:.0f}套需求,缩减{p_ratio:.2%}), ")
+        + f"短板:{theo:.1f}*{safety_factor}={final}"
+    )
+
+
+def format_detail(row) -> str:
+    """单行结果的计算明细文本（row 为结果表的一行）"""
+    return _detail_text(
+        row['比例'] == 0,
+        *(row[column] for column in TRACE_COLUMNS),
+        row['安全系数'],
+        row['可售库存'],
+    )
+
+
+def render_detail(results: pd.DataFrame) -> pd.Series:
+    """为整张结果表渲染计算明细文本，与参考实现的计算明细逐字一致"""
+    detail = [
+        _detail_text(*values)
+        for values in zip(
+            (results['比例'] == 0).tolist(),
+            *(results[column].tolist() for column in TRACE_COLUMNS),
+            results['安全系数'].tolist(),
+            results['可售库存'].tolist(),
+        )
+    ]
+    return pd.Series(detail, index=results.index, name='计算明细')
+
+
+def with_detail(results: pd.DataFrame) -> pd.DataFrame:
+    """详细版结果：SKU_ID、套件描述、颜色、可售库存、计算明细
+
+    category 列（如 load_sku_mapping 读入的套件描述、颜色）还原为原取值类型，与参考实现的输出类型一致。
+    """
+    if results.empty:
+        return pd.DataFrame(columns=DETAIL_COLUMNS)
+    detail = results.assign(计算明细=render_detail(results))[DETAIL_COLUMNS]
+    for column in DETAIL_COLUMNS:
+        values = detail[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            detail[column] = values.astype(values.cat.categories.dtype)
+    return detail
+
+
+def calculate_sku_inventory_vectorized(
+    sku_mapping: pd.DataFrame,
+    sales_ratio: Dict[str, float],
+    component_inventory: pd.Series,
+    active_colors: list,
+    safety_factor: float = 0.3,
+    bom: Optional[BOMCatalog] = None
+) -> pd.DataFrame:
+    """核心算法（向量化版）：一次性计算所有颜色的SKU可售库存
+
+    返回含计算过程数值列的结果表；with_detail(结果) 与 calculate_sku_inventory
+    （保留作为参考实现）的输出完全一致，包括行序、可售库存和计算明细。
+    """
+    theoretical = calculate_theoretical_inventory(
+        sku_mapping, sales_ratio, component_inventory, active_colors, bom
+    )
+    return apply_safety_factor(theoretical, safety_factor)
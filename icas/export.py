@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+结果导出：Excel（流式写出）、CSV、Parquet
+"""
+
+import importlib.util
+import os
+import tempfile
+from io import BytesIO
+from typing import Iterator, List
+
+import pandas as pd
+
+from . import diagnostics
+
+
+# =============================================================================
+# 导出格式
+# =============================================================================
+
+EXPORT_FORMATS = {
+    'xlsx': {
+        'label': 'Excel',
+        'suffix': '.xlsx',
+        'mime': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    },
+    'csv': {'label': 'CSV', 'suffix': '.csv', 'mime': 'text/csv'},
+    'parquet': {'label': 'Parquet', 'suffix': '.parquet', 'mime': 'application/vnd.apache.parquet'},
+}
+
+# 简版结果的列
+SIMPLE_COLUMNS = ['SKU_ID', '套件描述', '颜色', '可售库存']
+
+# 安装了 xlsxwriter 时用其 constant_memory 模式写 Excel，否则用 openpyxl 的 write_only 模式；
+# 两者都按行流式写出，内存占用与结果行数无关
+HAS_XLSXWRITER = importlib.util.find_spec('xlsxwriter') is not None
+
+EXCEL_CHUNK_ROWS = 10000
+
+
+def _iter_rows(df: pd.DataFrame) -> Iterator[List]:
+    """分块逐行产出单元格值，缺失值转为 None（空单元格）"""
+    for start in range(0, len(df), EXCEL_CHUNK_ROWS):
+        chunk = df.iloc[start:start + EXCEL_CHUNK_ROWS].astype(object)
+        chunk = chunk.where(chunk.notna(), None)
+        yield from chunk.itertuples(index=False, name=None)
+
+
+def _write_xlsxwriter(df: pd.DataFrame) -> bytes:
+    import xlsxwriter
+
+    # constant_memory 模式不能直接写入内存缓冲区，先写临时文件
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+    try:
+        workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+        worksheet = workbook.add_worksheet()
+        worksheet.write_row(0, 0, [str(c) for c in df.columns])
+        for i, row in enumerate(_iter_rows(df), start=1):
+            worksheet.write_row(i, 0, row)
+        workbook.close()
+        with open(path, 'rb') as f:
+            return f.read()
+    finally:
+        os.remove(path)
+
+
+def _write_openpyxl(df: pd.DataFrame) -> bytes:
+    import openpyxl
+
+    workbook = openpyxl.Workbook(write_only=True)
+    worksheet = workbook.create_sheet()
+    worksheet.append([str(c) for c in df.columns])
+    for row in _iter_rows(df):
+        worksheet.append(row)
+    output = BytesIO()
+    workbook.save(output)
+    return output.getvalue()
+
+
+# =============================================================================
+# 结果导出
+# =============================================================================
+
+def to_excel_bytes(df: pd.DataFrame) -> bytes:
+    """将DataFrame转换为Excel字节流（流式写出）"""
+    if HAS_XLSXWRITER:
+        return _write_xlsxwriter(df)
+    return _write_openpyxl(df)
+
+
+def to_csv_bytes(df: pd.DataFrame) -> bytes:
+    """将DataFrame转换为CSV字节流（带 BOM 的 UTF-8，Excel 可直接打开）"""
+    return df.to_csv(index=False).encode('utf-8-sig')
+
+
+def to_parquet_bytes(df: pd.DataFrame) -> bytes:
+    """将DataFrame转换为Parquet字节流"""
+    output = BytesIO()
+    df.to_parquet(output, index=False)
+    return output.getvalue()
+
+
+@diagnostics.timed('export')
+def export_bytes(df: pd.DataFrame, fmt: str) -> bytes:
+    """按格式（xlsx / csv / parquet）导出"""
+    if fmt == 'csv':
+        return to_csv_bytes(df)
+    if fmt == 'parquet':
+        return to_parquet_bytes(df)
+    if fmt == 'xlsx':
+        return to_excel_bytes(df)
+    raise ValueError(f"不支持的导出格式: {fmt}")
@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+"""
+历史快照：把每次计算的SKU可售库存和零部件库存追加到本地 SQLite 库，按需比较任意两次或查看单个SKU的历史
+
+    store = SnapshotStore('history.sqlite')
+    run_id = store.record(results, component_inventory, label='早班')
+    store.diff(old_run, run_id)          # 两次之间可售库存有变化的SKU
+    store.sku_history('SKU001')          # 单个SKU各次的可售库存
+
+SKU 和零部件各存一份字典表，快照表只存 (批次, 键, 库存) 三个整数，主键为 (批次, 键)，
+另有 (键, 批次) 索引：比较两次只需按主键读取两个批次，单个SKU的历史只需按索引读取该SKU的各行，
+耗时与累计批次数基本无关。
+"""
+
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing, contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+import pandas as pd
+
+from .aggregation import COMPONENT_INDEX
+
+DEFAULT_HISTORY_PATH = Path.home() / '.cache' / 'icas' / 'history.sqlite'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id        INTEGER PRIMARY KEY,
+    created_at    REAL NOT NULL,
+    label         TEXT,
+    source        TEXT,
+    safety_factor REAL,
+    colors        TEXT,
+    skus          INTEGER,
+    in_stock      INTEGER,
+    total_stock   INTEGER
+);
+CREATE INDEX IF NOT EXISTS runs_created_at ON runs (created_at);
+
+CREATE TABLE IF NOT EXISTS skus (
+    sku_key     INTEGER PRIMARY KEY,
+    sku_id      TEXT NOT NULL,
+    description TEXT,
+    color       TEXT,
+    UNIQUE (sku_id, description, color)
+);
+CREATE INDEX IF NOT EXISTS skus_color ON skus (color);
+
+CREATE TABLE IF NOT EXISTS sku_stock (
+    run_id  INTEGER NOT NULL,
+    sku_key INTEGER NOT NULL,
+    stock   INTEGER NOT NULL,
+    PRIMARY KEY (run_id, sku_key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS sku_stock_history ON sku_stock (sku_key, run_id);
+
+CREATE TABLE IF NOT EXISTS components (
+    comp_key INTEGER PRIMARY KEY,
+    type     TEXT NOT NULL,
+    color    TEXT NOT NULL,
+    size     TEXT NOT NULL,
+    UNIQUE (type, color, size)
+);
+
+CREATE TABLE IF NOT EXISTS component_stock (
+    run_id   INTEGER NOT NULL,
+    comp_key INTEGER NOT NULL,
+    stock    INTEGER NOT NULL,
+    PRIMARY KEY (run_id, comp_key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS component_stock_history ON component_stock (comp_key, run_id);
+"""
+
+RUN_COLUMNS = ['批次', '时间', '标签', '来源', '安全系数', '在售颜色数', 'SKU数', '有库存SKU', '总可售套数']
+DIFF_COLUMNS = ['SKU_ID', '套件描述', '颜色', '旧可售库存', '新可售库存', '变化']
+
+
+def _local_time(timestamps) -> pd.Series:
+    return pd.Series([datetime.fromtimestamp(t) for t in timestamps], dtype='datetime64[ns]')
+
+
+# =============================================================================
+# 快照库
+# =============================================================================
+
+class SnapshotStore:
+    """本地 SQLite 快照库；每次操作单独连接，可在多个线程、进程间共享同一个文件"""
+
+    def __init__(self, path=DEFAULT_HISTORY_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(_SCHEMA)
+
+    @classmethod
+    def from_env(cls) -> 'SnapshotStore':
+        """从环境变量 ICAS_HISTORY_PATH 创建，默认 ~/.cache/icas/history.sqlite"""
+        return cls(os.environ.get('ICAS_HISTORY_PATH', DEFAULT_HISTORY_PATH))
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        with closing(sqlite3.connect(self.path, timeout=30)) as conn:
+            conn.execute('PRAGMA synchronous=NORMAL')
+            with conn:
+                yield conn
+
+    # -------------------------------------------------------------------------
+    # 写入
+    # -------------------------------------------------------------------------
+
+    def record(
+        self,
+        results: pd.DataFrame,
+        component_inventory: Optional[pd.Series] = None,
+        label: str = '',
+        source: Optional[str] = None,
+        created_at: Optional[float] = None,
+    ) -> int:
+        """追加一次计算结果（calculate_sku_inventory* 的输出）及其零部件库存，返回批次编号"""
+        stock = results['可售库存'].astype('int64')
+        safety_factor = float(results['安全系数'].iloc[0]) if '安全系数' in results and len(results) else None
+        colors = [str(c) for c in pd.unique(results['颜色'])] if len(results) else []
+        skus = pd.DataFrame({
+            'sku_id': results['SKU_ID'].astype(str).to_numpy(),
+            'description': results['套件描述'].astype(str).to_numpy(),
+            'color': results['颜色'].astype(str).to_numpy(),
+        })
+
+        with self._connect() as conn:
+            cursor = conn.execute(
+                'INSERT INTO runs (created_at, label, source, safety_factor, colors, skus, in_stock, total_stock)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (
+                    time.time() if created_at is None else created_at, label, source, safety_factor,
+                    json.dumps(colors, ensure_ascii=False), len(results), int((stock > 0).sum()), int(stock.sum()),
+                ),
+            )
+            run_id = cursor.lastrowid
+            sku_keys = self._intern(
+                conn, 'skus', 'sku_key', ['sku_id', 'description', 'color'], skus
+            )
+            conn.executemany(
+                'INSERT OR REPLACE INTO sku_stock (run_id, sku_key, stock) VALUES (?, ?, ?)',
+                zip([run_id] * len(skus), sku_keys.tolist(), stock.tolist()),
+            )
+
+            if component_inventory is not None and len(component_inventory):
+                index = component_inventory.index
+                components = pd.DataFrame({
+                    'type': index.get_level_values('类型').astype(str),
+                    'color': index.get_level_values('颜色').astype(str),
+                    'size': index.get_level_values('尺寸').astype(str),
+                })
+                comp_keys = self._intern(conn, 'components', 'comp_key', ['type', 'color', 'size'], components)
+                conn.executemany(
+                    'INSERT OR REPLACE INTO component_stock (run_id, comp_key, stock) VALUES (?, ?, ?)',
+                    zip([run_id] * len(components), comp_keys.tolist(),
+                        component_inventory.astype('int64').tolist()),
+                )
+        return run_id
+
+    @staticmethod
+    def _intern(conn: sqlite3.Connection, table: str, key: str, columns: List[str], rows: pd.DataFrame) -> pd.Series:
+        """字典表中查找（不存在时插入）每一行的键，按 rows 的行序返回"""
+        unique = rows.drop_duplicates()
+        placeholders = ', '.join('?' * len(columns))
+        conn.executemany(
+            f'INSERT OR IGNORE INTO {table} ({", ".join(columns)}) VALUES ({placeholders})',
+            unique.itertuples(index=False, name=None),
+        )
+        known = pd.read_sql_query(f'SELECT {key}, {", ".join(columns)} FROM {table}', conn)
+        return rows.merge(known, on=columns, how='left')[key].astype('int64')
+
+    def prune(self, before: float) -> int:
+        """删除 before（时间戳）之前的批次，返回删除的批次数"""
+        with self._connect() as conn:
+            run_ids = [row[0] for row in conn.execute('SELECT run_id FROM runs WHERE created_at < ?', (before,))]
+            for table in ('sku_stock', 'component_stock', 'runs'):
+                conn.executemany(f'DELETE FROM {table} WHERE run_id = ?', [(r,) for r in run_ids])
+        return len(run_ids)
+
+    # -------------------------------------------------------------------------
+    # 查询
+    # -------------------------------------------------------------------------
+
+    def runs(self, limit: Optional[int] = 50, since: Optional[float] = None) -> pd.DataFrame:
+        """最近的批次（新的在前）"""
+        query = 'SELECT * FROM runs'
+        params: list = []
+        if since is not None:
+            query += ' WHERE created_at >= ?'
+            params.append(since)
+        query += ' ORDER BY created_at DESC, run_id DESC'
+        if limit is not None:
+            query += ' LIMIT ?'
+            params.append(limit)
+        with self._connect() as conn:
+            rows = pd.read_sql_query(query, conn, params=params)
+        return pd.DataFrame({
+            '批次': rows['run_id'],
+            '时间': _local_time(rows['created_at']),
+            '标签': rows['label'],
+            '来源': rows['source'],
+            '安全系数': rows['safety_factor'],
+            '在售颜色数': [len(json.loads(c)) if c else 0 for c in rows['colors']],
+            'SKU数': rows['skus'],
+            '有库存SKU': rows['in_stock'],
+            '总可售套数': rows['total_stock'],
+        }, columns=RUN_COLUMNS)
+
+    def load(self, run_id: int) -> pd.DataFrame:
+        """某一批次的结果：SKU_ID、套件描述、颜色、可售库存（按SKU首次入库的顺序）"""
+        with self._connect() as conn:
+            rows = pd.read_sql_query(
+                'SELECT k.sku_id AS SKU_ID, k.description AS 套件描述, k.color AS 颜色, s.stock AS 可售库存'
+                ' FROM sku_stock s JOIN skus k ON k.sku_key = s.sku_key WHERE s.run_id = ? ORDER BY s.sku_key',
+                conn, params=(run_id,),
+            )
+        return rows
+
+    def diff(self, old_run: int, new_run: int, color: Optional[str] = None, changed_only: bool = True) -> pd.DataFrame:
+        """两个批次之间各SKU可售库存的变化（只在一个批次中出现的SKU，另一侧为空、按0计算变化）
+
+        按变化从小到大排列，降幅最大的在前；color 指定时只比较该颜色。
+        """
+        color_filter = ' AND k.color = ?' if color is not None else ''
+        changed = ' AND (b.stock IS NULL OR a.stock != b.stock)' if changed_only else ''
+        query = (
+            # 两个批次都有的SKU，以及只在旧批次中的SKU
+            'SELECT k.sku_id, k.description, k.color, a.stock AS old, b.stock AS new'
+            ' FROM sku_stock a JOIN skus k ON k.sku_key = a.sku_key'
+            ' LEFT JOIN sku_stock b ON b.run_id = ? AND b.sku_key = a.sku_key'
+            f' WHERE a.run_id = ?{changed}{color_filter}'
+            ' UNION ALL '
+            # 只在新批次中的SKU
+            'SELECT k.sku_id, k.description, k.color, NULL, b.stock'
+            ' FROM sku_stock b JOIN skus k ON k.sku_key = b.sku_key'
+            ' WHERE b.run_id = ? AND NOT EXISTS'
+            ' (SELECT 1 FROM sku_stock a WHERE a.run_id = ? AND a.sku_key = b.sku_key)'
+            f'{color_filter}'
+        )
+        params: list = [new_run, old_run]
+        if color is not None:
+            params.append(color)
+        params += [new_run, old_run]
+        if color is not None:
+            params.append(color)
+        with self._connect() as conn:
+            rows = pd.read_sql_query(query, conn, params=params)
+
+        table = pd.DataFrame({
+            'SKU_ID': rows['sku_id'],
+            '套件描述': rows['description'],
+            '颜色': rows['color'],
+            '旧可售库存': rows['old'].astype('Int64'),
+            '新可售库存': rows['new'].astype('Int64'),
+        })
+        table['变化'] = (table['新可售库存'].fillna(0) - table['旧可售库存'].fillna(0)).astype('int64')
+        return table.sort_values(['变化', 'SKU_ID'], kind='stable').reset_index(drop=True)[DIFF_COLUMNS]
+
+    def sku_history(self, sku_id: str, since: Optional[float] = None) -> pd.DataFrame:
+        """单个SKU在各批次中的可售库存（按时间顺序）"""
+        since_filter = ' AND r.created_at >= ?' if since is not None else ''
+        with self._connect() as conn:
+            rows = pd.read_sql_query(
+                'SELECT r.run_id, r.created_at, r.label, k.description, k.color, s.stock'
+                ' FROM skus k JOIN sku_stock s ON s.sku_key = k.sku_key JOIN runs r ON r.run_id = s.run_id'
+                f' WHERE k.sku_id = ?{since_filter} ORDER BY r.created_at, r.run_id',
+                conn, params=[str(sku_id)] + ([since] if since is not None else []),
+            )
+        return pd.DataFrame({
+            '批次': rows['run_id'],
+            '时间': _local_time(rows['created_at']),
+            '标签': rows['label'],
+            '套件描述': rows['description'],
+            '颜色': rows['color'],
+            '可售库存': rows['stock'],
+        })
+
+    def component_history(self, comp_type: str, color: str, size: str, since: Optional[float] = None) -> pd.DataFrame:
+        """单个零部件在各批次中的库存（按时间顺序）"""
+        since_filter = ' AND r.created_at >= ?' if since is not None else ''
+        with self._connect() as conn:
+            rows = pd.read_sql_query(
+                'SELECT r.run_id, r.created_at, r.label, s.stock'
+                ' FROM components c JOIN component_stock s ON s.comp_key = c.comp_key'
+                ' JOIN runs r ON r.run_id = s.run_id'
+                f' WHERE c.type = ? AND c.color = ? AND c.size = ?{since_filter} ORDER BY r.created_at, r.run_id',
+                conn, params=[comp_type, color, size] + ([since] if since is not None else []),
+            )
+        return pd.DataFrame({
+            '批次': rows['run_id'],
+            '时间': _local_time(rows['created_at']),
+            '标签': rows['label'],
+            '库存': rows['stock'],
+        })
+
+    def load_components(self, run_id: int) -> pd.Series:
+        """某一批次的零部件库存，格式与 aggregate_component_inventory 的结果相同"""
+        with self._connect() as conn:
+            rows = pd.read_sql_query(
+                'SELECT c.type, c.color, c.size, s.stock FROM component_stock s'
+                ' JOIN components c ON c.comp_key = s.comp_key WHERE s.run_id = ? ORDER BY s.comp_key',
+                conn, params=(run_id,),
+            )
+        index = pd.MultiIndex.from_frame(rows[['type', 'color', 'size']], names=COMPONENT_INDEX)
+        return pd.Series(rows['stock'].to_numpy(), index=index, name='库存')
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+增量计算：按颜色缓存理论可售数，参数变化时只做必要的重算
+"""
+
+import copy
+import threading
+from typing import Callable, Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from .bom import DEFAULT_BOM, BOMCatalog
+from .engine import THEORETICAL_COLUMNS, apply_safety_factor, calculate_theoretical_inventory
+from .parallel import shard_colors
+
+# 报告进度时把待算颜色分成的批数
+PROGRESS_BATCHES = 20
+
+Progress = Callable[[int, int], None]
+
+
+# =============================================================================
+# 增量计算
+# =============================================================================
+
+class IncrementalCalculator:
+    """绑定一组输入，按颜色缓存理论可售数
+
+    - 安全系数变化：只对已缓存的理论值重新乘系数
+    - 在售颜色增加：只计算新增的颜色；减少：直接从缓存中筛选
+    - 库存变动：只重算库存发生变化的颜色（见 update_component_inventory）
+    结果与对同样参数调用 calculate_sku_inventory_vectorized 完全一致。
+    """
+
+    def __init__(
+        self,
+        sku_mapping: pd.DataFrame,
+        sales_ratio: Dict[str, float],
+        component_inventory: pd.Series,
+        bom: Optional[BOMCatalog] = None,
+    ):
+        self.sku_mapping = sku_mapping
+        self.sales_ratio = sales_ratio
+        self.component_inventory = component_inventory
+        self.bom = bom if bom is not None else DEFAULT_BOM
+        # 颜色在映射表中首次出现的顺序，用于拼接各颜色结果
+        self._color_order = {
+            color: i for i, color in enumerate(pd.unique(sku_mapping['颜色']))
+        }
+        self._computed_colors = set()
+        self._theoretical = pd.DataFrame(columns=THEORETICAL_COLUMNS)
+        # 同一个计算器可能被多个会话共享（见 ResultStore），补算颜色时加锁
+        self._lock = threading.RLock()
+
+    def copy(self) -> 'IncrementalCalculator':
+        """独立副本：共享输入和已算结果（均不会被原地修改），之后的库存变动互不影响"""
+        with self._lock:
+            other = copy.copy(self)
+            other._computed_colors = set(self._computed_colors)
+        other._lock = threading.RLock()
+        return other
+
+    @property
+    def computed_colors(self) -> List[str]:
+        return sorted(self._computed_colors, key=lambda c: self._color_order.get(c, len(self._color_order)))
+
+    def _ensure_colors(self, colors: Iterable[str], progress: Optional[Progress] = None) -> None:
+        missing = [c for c in dict.fromkeys(colors) if c not in self._computed_colors]
+        if not missing:
+            return
+
+        # 需要报告进度时按颜色分批计算，每批之后回调 progress(已完成颜色数, 总颜色数)
+        if progress is None:
+            batches = [missing]
+        else:
+            batches = shard_colors(missing, 1, -(-len(missing) // PROGRESS_BATCHES))
+        parts = []
+        done = 0
+        for batch in batches:
+            parts.append(calculate_theoretical_inventory(
+                self.sku_mapping, self.sales_ratio, self.component_inventory, batch, self.bom
+            ))
+            done += len(batch)
+            if progress is not None:
+                progress(done, len(missing))
+
+        self._computed_colors.update(missing)
+        frames = [part for part in [self._theoretical, *parts] if not part.empty]
+        if not frames:
+            return
+        combined = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        order = combined['颜色'].map(self._color_order).astype('int64')
+        self._theoretical = combined.iloc[order.argsort(kind='stable')].reset_index(drop=True)
+
+    def update_component_inventory(self, component_inventory: pd.Series, colors: Iterable[str]) -> None:
+        """换用新的零部件库存，colors 为库存发生变化的颜色，只有这些颜色需要重算
+
+        变化颜色的缓存结果被丢弃，下次取结果时按需重新计算；其他颜色的缓存保持不变。
+        """
+        with self._lock:
+            self.component_inventory = component_inventory
+            colors = set(colors)
+            self._computed_colors -= colors
+            if not self._theoretical.empty:
+                keep = ~self._theoretical['颜色'].isin(colors)
+                self._theoretical = self._theoretical[keep].reset_index(drop=True)
+
+    def theoretical(self, active_colors: Iterable[str], progress: Optional[Progress] = None) -> pd.DataFrame:
+        """在售颜色的理论可售数（乘安全系数之前）
+
+        progress(已完成颜色数, 总颜色数) 在每批颜色算完后调用，可在其中抛出异常中止计算。
+        """
+        active_colors = list(active_colors)
+        with self._lock:
+            self._ensure_colors(active_colors, progress)
+            theoretical = self._theoretical
+        selected = theoretical[theoretical['颜色'].isin(active_colors)]
+        return selected.reset_index(drop=True)
+
+    def results(self, active_colors: Iterable[str], safety_factor: float) -> pd.DataFrame:
+        """在售颜色按安全系数计算的最终结果"""
+        return apply_safety_factor(self.theoretical(active_colors), safety_factor)
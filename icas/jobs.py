@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+后台任务：在工作线程中运行计算，分阶段报告进度，支持取消
+
+任务函数的第一个参数是 Job 本身，在各阶段之间调用 job.report(阶段, 已完成, 总数)；
+取消是协作式的：cancel() 之后，下一次 report() 抛出 JobCancelled，任务随之结束。
+任务结果保存在 JobRegistry 中，按任务编号取回，与发起任务的页面会话无关。
+
+    registry = JobRegistry()
+    job = registry.submit(run, inventory_file, ...)
+    registry.get(job.id).progress      # 当前阶段与进度
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+
+# =============================================================================
+# 任务
+# =============================================================================
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """任务已被取消（由 Job.report 抛出）"""
+
+
+@dataclass(frozen=True)
+class JobProgress:
+    """最近一次报告的进度"""
+    stage: str
+    done: int = 0
+    total: int = 0
+
+    @property
+    def fraction(self) -> float:
+        return min(self.done / self.total, 1.0) if self.total else 0.0
+
+
+class Job:
+    """一个后台任务及其状态、进度和结果"""
+
+    def __init__(self, func: Callable[..., Any], *args, **kwargs):
+        self.id = uuid.uuid4().hex[:12]
+        self.status = PENDING
+        self.progress = JobProgress('pending')
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._func = func
+        self._args = args
+        self._kwargs = kwargs
+        self._cancel = threading.Event()
+        self._finished = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel.is_set()
+
+    def report(self, stage: str, done: int = 0, total: int = 0) -> None:
+        """报告进度；已请求取消时抛出 JobCancelled"""
+        if self._cancel.is_set():
+            raise JobCancelled(self.id)
+        self.progress = JobProgress(stage, done, total)
+
+    def cancel(self) -> None:
+        """请求取消，任务在下一次报告进度时结束"""
+        self._cancel.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待任务结束，返回是否已结束"""
+        return self._finished.wait(timeout)
+
+    def run(self) -> None:
+        self.status = RUNNING
+        try:
+            self.result = self._func(self, *self._args, **self._kwargs)
+            self.status = DONE
+        except JobCancelled:
+            self.status = CANCELLED
+        except Exception as e:
+            self.error = e
+            self.status = FAILED
+        finally:
+            # 释放输入，结束后只保留结果
+            self._args = self._kwargs = None
+            self.finished_at = time.time()
+            self._finished.set()
+
+
+# =============================================================================
+# 任务登记
+# =============================================================================
+
+class JobRegistry:
+    """进程内的任务表：启动任务，并按编号保留最近结束的任务供取回
+
+    结束的任务超过 max_finished 个时，最早结束的被丢弃；运行中的任务不受影响。
+    结束的任务连同其结果一直保留到被丢弃，大的结果应放在 ResultStore 中，任务只返回缓存键。
+    """
+
+    def __init__(self, max_finished: int = 16):
+        self.max_finished = max_finished
+        self._jobs: 'OrderedDict[str, Job]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, func: Callable[..., Any], *args, **kwargs) -> Job:
+        """在新的后台线程中运行 func(job, *args, **kwargs)"""
+        job = Job(func, *args, **kwargs)
+        with self._lock:
+            self._evict()
+            self._jobs[job.id] = job
+        threading.Thread(target=job.run, name=f'icas-job-{job.id}', daemon=True).start()
+        return job
+
+    def get(self, job_id: Optional[str]) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id) if job_id else None
+
+    def _evict(self) -> None:
+        finished = sorted(
+            (job for job in self._jobs.values() if job.finished),
+            key=lambda job: job.finished_at,
+        )
+        for job in finished[:max(0, len(finished) - self.max_finished + 1)]:
+            del self._jobs[job.id]
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+数据加载：库存源文件、销售比例表与SKU映射表
+"""
+
+import importlib.util
+from os import PathLike
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from . import diagnostics
+from .parsing import as_category, normalize_sku_name, parse_ratio
+
+
+# =============================================================================
+# 表格读取
+# =============================================================================
+
+TABLE_FORMATS = {
+    '.xlsx': 'excel',
+    '.xlsm': 'excel',
+    '.xls': 'excel',
+    '.csv': 'csv',
+    '.parquet': 'parquet',
+    '.pq': 'parquet',
+    '.feather': 'feather',
+    '.arrow': 'feather',
+}
+
+# 安装了 python-calamine 且 pandas 支持时用 calamine 读 Excel，速度约为 openpyxl 的数倍；
+# 否则交给 pandas 默认引擎（xlsx 为只读流式打开的 openpyxl）
+_PANDAS_VERSION = tuple(int(part) for part in pd.__version__.split('.')[:2])
+EXCEL_ENGINE: Optional[str] = (
+    'calamine'
+    if _PANDAS_VERSION >= (2, 2) and importlib.util.find_spec('python_calamine') is not None
+    else None
+)
+
+CSV_ENCODINGS = ['utf-8-sig', 'gb18030']
+
+
+def detect_format(file) -> str:
+    """按文件名后缀判断格式；无法判断时按 Excel 处理"""
+    if isinstance(file, (str, PathLike)):
+        name = str(file)
+    else:
+        name = getattr(file, 'name', '') or ''
+    return TABLE_FORMATS.get(Path(name).suffix.lower(), 'excel')
+
+
+def _rewind(file) -> None:
+    if hasattr(file, 'seek'):
+        file.seek(0)
+
+
+def _read_csv(file, **kwargs) -> pd.DataFrame:
+    # ERP 导出的 CSV 可能是带 BOM 的 UTF-8，也可能是 GBK
+    for encoding in CSV_ENCODINGS[:-1]:
+        try:
+            return pd.read_csv(file, encoding=encoding, **kwargs)
+        except UnicodeDecodeError:
+            _rewind(file)
+    return pd.read_csv(file, encoding=CSV_ENCODINGS[-1], **kwargs)
+
+
+def _arrow_column_names(file, fmt: str) -> List[str]:
+    import pyarrow.ipc
+    import pyarrow.parquet
+
+    if fmt == 'parquet':
+        names = pyarrow.parquet.ParquetFile(file).schema_arrow.names
+    else:
+        names = pyarrow.ipc.open_file(file).schema.names
+    _rewind(file)
+    return names
+
+
+def read_table(
+    file,
+    columns: Optional[List[str]] = None,
+    n_columns: Optional[int] = None,
+    header: bool = True,
+) -> pd.DataFrame:
+    """按格式读取表格（Excel / CSV / Parquet / Feather），只读取需要的列
+
+    columns 按列名选取，文件中不存在的列直接忽略，由调用方校验；
+    n_columns 按位置选取前 n 列，列数不足时抛出 ValueError。
+    header=False 表示文件没有表头，列名为 0, 1, 2...
+    """
+    fmt = detect_format(file)
+
+    if fmt in ('parquet', 'feather'):
+        names = _arrow_column_names(file, fmt)
+        if columns is not None:
+            selected = [c for c in names if c in columns]
+        elif n_columns is not None:
+            if len(names) < n_columns:
+                raise ValueError(f"文件列数不足: 需要至少 {n_columns} 列")
+            selected = names[:n_columns]
+        else:
+            selected = None
+        reader = pd.read_parquet if fmt == 'parquet' else pd.read_feather
+        df = reader(file, columns=selected)
+        if not header:
+            df.columns = range(len(df.columns))
+        return df
+
+    kwargs = {'header': 0 if header else None}
+    if columns is not None:
+        kwargs['usecols'] = lambda c: c in columns
+    elif n_columns is not None:
+        kwargs['usecols'] = list(range(n_columns))
+
+    try:
+        if fmt == 'csv':
+            return _read_csv(file, **kwargs)
+        return pd.read_excel(file, engine=EXCEL_ENGINE, **kwargs)
+    except ValueError as e:
+        # Excel 引擎报 out-of-bounds（ParserError），CSV 报 Usecols do not match
+        if n_columns is not None and ('out-of-bounds' in str(e) or 'Usecols do not match' in str(e)):
+            raise ValueError(f"文件列数不足: 需要至少 {n_columns} 列") from e
+        raise
+
+
+# =============================================================================
+# 数据加载
+# =============================================================================
+
+@diagnostics.timed('load_inventory')
+def load_inventory(file) -> pd.DataFrame:
+    """加载库存源文件（只读取商品名称、可用数两列）"""
+    required_cols = ['商品名称', '可用数']
+    df = read_table(file, columns=required_cols)
+    for col in required_cols:
+        if col not in df.columns:
+            raise ValueError(f"库存文件缺少必需列: {col}")
+    diagnostics.count('rows_read', len(df))
+    df_grouped = df.groupby('商品名称')['可用数'].sum().reset_index()
+    df_grouped.columns = ['商品名称', '库存']
+    return df_grouped
+
+
+# 库存变动文件中变动数量所在的列，按顺序取第一个存在的
+DELTA_QUANTITY_COLUMNS = ['变动数', '变动数量', '数量']
+
+
+@diagnostics.timed('load_inventory_delta')
+def load_inventory_delta(file) -> pd.DataFrame:
+    """加载库存变动文件（商品名称、变动数，正数入库、负数出库），同名商品合并"""
+    df = read_table(file, columns=['商品名称'] + DELTA_QUANTITY_COLUMNS)
+    if '商品名称' not in df.columns:
+        raise ValueError("库存变动文件缺少必需列: 商品名称")
+    quantity = next((c for c in DELTA_QUANTITY_COLUMNS if c in df.columns), None)
+    if quantity is None:
+        raise ValueError(f"库存变动文件缺少变动数量列: {' / '.join(DELTA_QUANTITY_COLUMNS)}")
+    diagnostics.count('delta_rows_read', len(df))
+    df_grouped = df.groupby('商品名称', sort=False)[quantity].sum().reset_index()
+    df_grouped.columns = ['商品名称', '库存']
+    return df_grouped
+
+
+@diagnostics.timed('load_sales_ratio')
+def load_sales_ratio(file) -> Dict[str, float]:
+    """加载销售比例表（无表头，前两列为套件名称、比例）"""
+    df = read_table(file, n_columns=2, header=False)
+    return {
+        normalize_sku_name(sku_name): parse_ratio(ratio)
+        for sku_name, ratio in zip(df[0], df[1])
+    }
+
+
+@diagnostics.timed('load_sku_mapping')
+def load_sku_mapping(file) -> pd.DataFrame:
+    """加载SKU映射表（前三列依次为 SKU_ID、套件描述、颜色）"""
+    df = read_table(file, n_columns=3)
+    df.columns = ['SKU_ID', '套件描述', '颜色']
+    # 套件描述和颜色在大量SKU间重复，编码为 category，后续筛选、分组和关联都按整数编码进行
+    df['套件描述'] = as_category(df['套件描述'].apply(normalize_sku_name))
+    df['颜色'] = as_category(df['颜色'])
+    return df
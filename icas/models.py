@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+"""
+数据结构定义：零部件规格与套件BOM
+"""
+
+from dataclasses import dataclass
+
+
+# =============================================================================
+# 数据结构定义
+# =============================================================================
+
+@dataclass
+class ComponentSpec:
+    """零部件规格"""
+    type: str
+    size: str
+    color: str
+
+
+@dataclass
+class BOMItem:
+    """套件BOM"""
+    sheet_type: str
+    sheet_size: str
+    duvet_size: str
+    pillow_count: int
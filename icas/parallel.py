@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+并行计算：按颜色分片，在进程池或线程池中计算后按颜色顺序合并
+
+每种颜色的被套/床单池和枕套总数都只属于该颜色，各颜色互不影响；
+分片内保持映射表的原始行序，合并后与串行计算的结果完全一致。
+"""
+
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from . import diagnostics
+from .bom import DEFAULT_BOM, BOMCatalog
+from .engine import THEORETICAL_COLUMNS, apply_safety_factor, calculate_theoretical_inventory
+
+
+# =============================================================================
+# 配置
+# =============================================================================
+
+EXECUTORS = ('auto', 'process', 'thread', 'serial')
+
+# auto 模式下，在售SKU行数达到该值才使用进程池（进程启动与数据序列化有固定开销）
+PROCESS_MIN_ROWS = 200_000
+
+# 默认每个工作进程平均分到的分片数，分片过大时负载不均，过小时调度开销大
+CHUNKS_PER_WORKER = 4
+
+
+def default_workers() -> int:
+    return os.cpu_count() or 1
+
+
+def shard_colors(colors: List[str], workers: int, chunk_size: Optional[int] = None) -> List[List[str]]:
+    """把颜色按顺序切成连续的分片"""
+    if not colors:
+        return []
+    if chunk_size is None:
+        chunk_size = -(-len(colors) // (workers * CHUNKS_PER_WORKER))
+    chunk_size = max(1, chunk_size)
+    return [colors[i:i + chunk_size] for i in range(0, len(colors), chunk_size)]
+
+
+# =============================================================================
+# 分片计算
+# =============================================================================
+
+def _calculate_shard(
+    sku_mapping: pd.DataFrame,
+    sales_ratio: Dict[str, float],
+    component_inventory: pd.Series,
+    colors: List[str],
+    bom: BOMCatalog,
+) -> pd.DataFrame:
+    return calculate_theoretical_inventory(sku_mapping, sales_ratio, component_inventory, colors, bom)
+
+
+def _shard_inputs(sku_mapping: pd.DataFrame, component_inventory: pd.Series, colors: List[str]):
+    """只把分片用到的映射行和零部件库存交给工作进程，减少序列化量"""
+    mapping = sku_mapping[sku_mapping['颜色'].isin(colors)]
+    inventory_colors = component_inventory.index.get_level_values('颜色')
+    inventory = component_inventory[inventory_colors.isin(colors)]
+    return mapping, inventory
+
+
+def _make_executor(kind: str, workers: int) -> Executor:
+    if kind == 'process':
+        return ProcessPoolExecutor(max_workers=workers)
+    return ThreadPoolExecutor(max_workers=workers)
+
+
+def calculate_theoretical_parallel(
+    sku_mapping: pd.DataFrame,
+    sales_ratio: Dict[str, float],
+    component_inventory: pd.Series,
+    active_colors: list,
+    workers: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    executor: str = 'auto',
+    bom: Optional[BOMCatalog] = None,
+) -> pd.DataFrame:
+    """按颜色分片并行计算理论可售数，结果与 calculate_theoretical_inventory 一致
+
+    - workers: 并行数，默认为CPU核数
+    - chunk_size: 每个分片的颜色数，默认按并行数自动划分
+    - executor: 'process' 进程池，'thread' 线程池，'serial' 串行，
+      'auto' 按在售SKU行数在进程池和线程池之间选择
+    - bom: BOM目录，默认为内置的 BOM_CONFIG
+    """
+    if executor not in EXECUTORS:
+        raise ValueError(f"不支持的并行方式: {executor}，可选 {', '.join(EXECUTORS)}")
+    bom = bom if bom is not None else DEFAULT_BOM
+    workers = workers or default_workers()
+    if workers < 1:
+        raise ValueError("并行数必须大于0")
+
+    # 分片按颜色在映射表中首次出现的顺序切分，合并时即为串行计算的颜色顺序
+    active = set(active_colors)
+    colors = [c for c in pd.unique(sku_mapping['颜色']) if c in active]
+    shards = shard_colors(colors, workers, chunk_size)
+
+    if executor == 'auto':
+        active_rows = int(sku_mapping['颜色'].isin(active).sum())
+        executor = 'process' if active_rows >= PROCESS_MIN_ROWS else 'thread'
+    if executor == 'serial' or workers == 1 or len(shards) <= 1:
+        return calculate_theoretical_inventory(sku_mapping, sales_ratio, component_inventory, colors, bom)
+
+    # 工作进程/线程不继承诊断上下文，计时和计数在这里统一记录
+    if diagnostics.enabled():
+        active_skus = sku_mapping.loc[sku_mapping['颜色'].isin(active), '套件描述']
+        diagnostics.count('skus_missing_bom', int((~active_skus.isin(bom.items)).sum()))
+
+    inputs = [_shard_inputs(sku_mapping, component_inventory, shard) for shard in shards]
+    with diagnostics.stage('calculate'), _make_executor(executor, min(workers, len(shards))) as pool:
+        parts = list(pool.map(
+            _calculate_shard,
+            [mapping for mapping, _ in inputs],
+            [sales_ratio] * len(shards),
+            [inventory for _, inventory in inputs],
+            shards,
+            [bom] * len(shards),
+        ))
+
+    parts = [part for part in parts if not part.empty]
+    if not parts:
+        return pd.DataFrame(columns=THEORETICAL_COLUMNS)
+    return pd.concat(parts, ignore_index=True)
+
+
+def calculate_sku_inventory_parallel(
+    sku_mapping: pd.DataFrame,
+    sales_ratio: Dict[str, float],
+    component_inventory: pd.Series,
+    active_colors: list,
+    safety_factor: float = 0.3,
+    workers: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    executor: str = 'auto',
+    bom: Optional[BOMCatalog] = None,
+) -> pd.DataFrame:
+    """并行版 calculate_sku_inventory_vectorized，结果与串行计算完全一致"""
+    theoretical = calculate_theoretical_parallel(
+        sku_mapping, sales_ratio, component_inventory, active_colors,
+        workers=workers, chunk_size=chunk_size, executor=executor, bom=bom,
+    )
+    return apply_safety_factor(theoretical, safety_factor)
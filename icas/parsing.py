@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+"""
+解析函数：商品名称、SKU名称与销售比例
+"""
+
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from . import diagnostics
+from .models import ComponentSpec
+
+
+# =============================================================================
+# 解析函数
+# =============================================================================
+
+EXCLUDE_KEYWORDS = ['浴巾', '蚕丝被', '洗衣液', '马克杯', '样布', '包装', '毛巾']
+
+EXCLUDE_PATTERN = re.compile('|'.join(map(re.escape, EXCLUDE_KEYWORDS)))
+
+# 排除关键词、枕套判断、类型前缀和各类型正则合成一条正则，每个名称只做一次匹配。
+# 各分支的顺序和语义与逐条判断完全一致：
+#   含排除关键词 → 不匹配；含"枕套" → 只尝试枕套格式；
+#   否则按开头的 床笠 / 床单 / 被套 在名称中查找该类型的格式（床笠先 "-" 格式、再 "；" 格式）
+# 每个分支的最后一个命名组互不相同，匹配后按 lastgroup 区分类型
+_SEARCH = r'[\s\S]*?'
+CLASSIFIER_PATTERN = re.compile(
+    rf'(?![\s\S]*(?:{EXCLUDE_PATTERN.pattern}))'
+    r'(?:'
+    rf'(?=[\s\S]*枕套){_SEARCH}枕套（[^）]+）-(?P<pillow_color>.+)$'
+    r'|(?![\s\S]*枕套)(?:'
+    rf'(?=床笠)(?:{_SEARCH}床笠(?P<fitted_w>\d+)\*(?P<fitted_l>\d+)\*\d+[cm]*[-－](?P<fitted_color>.+)$'
+    rf'|{_SEARCH}床笠(?P<alt_w>\d+)\*(?P<alt_l>\d+)\*\d+cm；(?P<alt_color>[^；]+)；(?P<alt_style>[^；]+))'
+    rf'|(?=床单){_SEARCH}床单(?P<flat_w>\d+)\*(?P<flat_l>\d+)[cm]*[-－](?P<flat_color>.+)$'
+    rf'|(?=被套){_SEARCH}被套(?P<duvet_w>\d+)\*(?P<duvet_l>\d+)[-－](?P<duvet_color>.+)$'
+    r'))'
+)
+
+# 解析结果：(类型, 尺寸, 颜色)；按关键词排除的名称记为 EXCLUDED，其余无法解析的为 None
+ParseResult = Optional[Tuple[str, str, str]]
+EXCLUDED = ('', '', '')
+
+
+_BUILDERS = {
+    'pillow_color': lambda m: ('枕套', '标准', m['pillow_color']),
+    'fitted_color': lambda m: ('床笠', f"{int(m['fitted_w'])}*{int(m['fitted_l'])}", m['fitted_color']),
+    'alt_style': lambda m: ('床笠', f"{int(m['alt_w'])}*{int(m['alt_l'])}", m['alt_color'] + m['alt_style']),
+    'flat_color': lambda m: ('床单', f"{int(m['flat_w'])}*{int(m['flat_l'])}", m['flat_color']),
+    'duvet_color': lambda m: ('被套', f"{int(m['duvet_w'])}*{int(m['duvet_l'])}", m['duvet_color']),
+}
+
+
+def classify_product_name(name) -> ParseResult:
+    """一次匹配完成 排除判断 → 类型分派 → 提取尺寸和颜色"""
+    if not isinstance(name, str):
+        return None
+    name = name.strip()
+    match = CLASSIFIER_PATTERN.match(name)
+    if match is not None:
+        return _BUILDERS[match.lastgroup](match)
+    return EXCLUDED if EXCLUDE_PATTERN.search(name) else None
+
+
+def parse_product_name(name: str) -> Optional[ComponentSpec]:
+    """从商品名称解析零部件规格（结果缓存在 PARSE_CACHE 中）"""
+    if not isinstance(name, str):
+        return None
+    result = PARSE_CACHE.lookup([name])[0]
+    if result is None or result is EXCLUDED:
+        return None
+    comp_type, size, color = result
+    return ComponentSpec(type=comp_type, size=size, color=color)
+
+
+# =============================================================================
+# 解析缓存
+# =============================================================================
+
+DEFAULT_PARSE_CACHE_ENTRIES = 200_000
+
+UNPARSED_COLUMNS = ['商品名称', '出现次数']
+PARSE_CACHE_COLUMNS = ['商品名称', '类型', '尺寸', '颜色', '状态', '出现次数']
+
+_MISSING = object()
+
+
+class ParseCache:
+    """商品名称 → 解析结果的有界 LRU 缓存（线程安全）
+
+    每天的库存导出里商品名称基本不变，命中的名称不再做正则匹配。
+    同时累计每个无法解析（且未被关键词排除）的名称出现的次数，见 unparsed_report()：
+    每次批量解析按该名称所在的行数累加，load_inventory 已按商品名称合并，即每份库存文件计一次。
+    save() / load() 把缓存写到文件或从文件合并，供多个进程共享（见 InputCache.restore_parse_cache）。
+    缓存的键为原始商品名称，值为 classify_product_name 的结果。
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_PARSE_CACHE_ENTRIES):
+        if max_entries < 1:
+            raise ValueError("解析缓存容量必须大于0")
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, ParseResult]' = OrderedDict()
+        self._unparsed: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls) -> 'ParseCache':
+        """从环境变量 ICAS_PARSE_CACHE_ENTRIES 创建"""
+        entries = os.environ.get('ICAS_PARSE_CACHE_ENTRIES')
+        return cls(int(entries) if entries else DEFAULT_PARSE_CACHE_ENTRIES)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, names: Sequence, rows: Optional[Sequence[int]] = None) -> List[ParseResult]:
+        """批量取出解析结果，未命中的名称解析后放入缓存；rows 为各名称在本批中的行数（用于无法解析统计）"""
+        results: List[ParseResult] = [None] * len(names)
+        rows = [1] * len(names) if rows is None else [int(n) for n in rows]
+        missing = []
+        skipped = 0
+        with self._lock:
+            entries, unparsed = self._entries, self._unparsed
+            for i, name in enumerate(names):
+                result = entries.get(name, _MISSING)
+                if result is _MISSING:
+                    if isinstance(name, str):
+                        missing.append(i)
+                    else:
+                        skipped += 1
+                    continue
+                entries.move_to_end(name)
+                results[i] = result
+                if result is None:
+                    unparsed[name] += rows[i]
+            hits = len(names) - len(missing) - skipped
+            self.hits += hits
+            self.misses += len(missing)
+        diagnostics.count('parse_cache_hits', hits)
+        diagnostics.count('parse_cache_misses', len(missing))
+
+        # 正则匹配在锁外进行，其他线程的查询不必等待
+        for i in missing:
+            results[i] = classify_product_name(names[i])
+
+        with self._lock:
+            for i in missing:
+                name = names[i]
+                entries[name] = results[i]
+                if results[i] is None:
+                    unparsed[name] = unparsed.get(name, 0) + rows[i]
+            self._evict()
+        return results
+
+    def _evict(self) -> None:
+        while len(self._entries) > self.max_entries:
+            name, _ = self._entries.popitem(last=False)
+            self._unparsed.pop(name, None)
+            self.evictions += 1
+
+    def unparsed_report(self) -> pd.DataFrame:
+        """无法解析（且未被关键词排除）的商品名称及累计出现次数，次数多的在前"""
+        with self._lock:
+            report = pd.DataFrame(list(self._unparsed.items()), columns=UNPARSED_COLUMNS)
+        report['出现次数'] = report['出现次数'].astype('int64')
+        return report.sort_values(['出现次数', '商品名称'], ascending=[False, True], kind='stable').reset_index(drop=True)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._unparsed.clear()
+
+    def stats(self) -> dict:
+        """条目数、命中/未命中/淘汰次数与命中率、无法解析的名称数"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'unparsed': len(self._unparsed),
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+            }
+
+    # -------------------------------------------------------------------------
+    # 持久化
+    # -------------------------------------------------------------------------
+
+    def to_frame(self) -> pd.DataFrame:
+        """全部条目（最近使用的在后）：商品名称、类型、尺寸、颜色、状态、出现次数（仅无法解析的名称）"""
+        with self._lock:
+            items = list(self._entries.items())
+            unparsed = dict(self._unparsed)
+        status = ['excluded' if r is EXCLUDED else 'unparsed' if r is None else 'parsed' for _, r in items]
+        parsed = [r if s == 'parsed' else (None, None, None) for (_, r), s in zip(items, status)]
+        return pd.DataFrame({
+            '商品名称': [name for name, _ in items],
+            '类型': [r[0] for r in parsed],
+            '尺寸': [r[1] for r in parsed],
+            '颜色': [r[2] for r in parsed],
+            '状态': status,
+            '出现次数': [unparsed.get(name, 0) for name, _ in items],
+        })
+
+    def update_from_frame(self, frame: pd.DataFrame) -> None:
+        """合并 to_frame() 的结果；已有的条目保留本进程的结果，出现次数取较大值"""
+        with self._lock:
+            for name, comp_type, size, color, status, count in frame.itertuples(index=False, name=None):
+                if name in self._entries:
+                    if name in self._unparsed:
+                        self._unparsed[name] = max(self._unparsed[name], int(count))
+                    continue
+                if status == 'parsed':
+                    self._entries[name] = (comp_type, size, color)
+                elif status == 'excluded':
+                    self._entries[name] = EXCLUDED
+                else:
+                    self._entries[name] = None
+                    self._unparsed[name] = int(count)
+                # 文件中的条目比本进程用过的更旧，排在前面先被淘汰
+                self._entries.move_to_end(name, last=False)
+            self._evict()
+
+    def save(self, path) -> None:
+        """写到 Parquet 文件（先写临时文件再替换，多个进程同时写入时不会读到半个文件）"""
+        path = Path(path)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        os.close(fd)
+        try:
+            self.to_frame().to_parquet(tmp)
+            os.replace(tmp, path)
+        finally:
+            Path(tmp).unlink(missing_ok=True)
+
+    def load(self, path) -> bool:
+        """从文件合并条目；文件不存在、无法读取或列不一致（旧版本的文件）时返回 False"""
+        try:
+            frame = pd.read_parquet(path)[PARSE_CACHE_COLUMNS]
+        except Exception:
+            return False
+        self.update_from_frame(frame)
+        return True
+
+
+# 进程内共享的解析缓存：Web 版各会话、查询服务和监视模式的每次计算共用
+PARSE_CACHE = ParseCache.from_env()
+
+
+def as_category(values: pd.Series) -> pd.Series:
+    """重复出现的文本标签（颜色、套件描述等）→ category，取值不变，类别按首次出现排列"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values
+    codes, uniques = pd.factorize(values)
+    return pd.Series(pd.Categorical.from_codes(codes, categories=uniques), index=values.index, name=values.name)
+
+
+def parse_product_names(names: pd.Series, cache: Optional[ParseCache] = PARSE_CACHE) -> pd.DataFrame:
+    """批量解析商品名称列
+
+    返回与输入同索引的 type/size/color 三列，逐行结果与 parse_product_name
+    完全一致；无法解析或被排除的名称三列均为缺失值。重复名称只解析一次，
+    解析过的名称从 cache 中取出（cache=None 时不使用缓存）。
+    三列均为 category 类型：每个取值只存一份字符串，各行只存整数编码。
+    """
+    names = pd.Series(names)
+    codes, uniques = pd.factorize(names)
+    uniques = list(np.asarray(uniques, dtype=object))
+    if cache is None:
+        results = [classify_product_name(name) for name in uniques]
+    else:
+        rows = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        results = cache.lookup(uniques, rows)
+
+    # 不同的解析结果通常只有几百种：先给每种结果编号，再按编号展开到各行
+    # （缺失值的编码 -1 保持为缺失），各列编码为 category，类别按首次出现排列
+    distinct: Dict[tuple, int] = {}
+    result_codes = np.array(
+        [-1 if r is None or r is EXCLUDED else distinct.setdefault(r, len(distinct)) for r in results] + [-1],
+        dtype=np.intp,
+    )
+    row_results = result_codes[codes]
+    columns = {}
+    for column, values in zip(['type', 'size', 'color'], zip(*distinct) if distinct else ([], [], [])):
+        value_codes, categories = pd.factorize(pd.Series(values, dtype=object))
+        row_codes = np.append(value_codes, -1)[row_results]
+        columns[column] = pd.Categorical.from_codes(row_codes, categories=categories)
+    return pd.DataFrame(columns, index=names.index)
+
+
+def parse_pillow_quantity(name: str) -> int:
+    """判断枕套数量"""
+    if '一对' in name:
+        return 2
+    elif '单只' in name:
+        return 1
+    return 1
+
+
+def normalize_sku_name(sku_name: str) -> str:
+    """标准化SKU名称"""
+    if not isinstance(sku_name, str):
+        return str(sku_name)
+    return sku_name.strip()
+
+
+def parse_ratio(value) -> float:
+    """解析销售比例"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        value = value.strip()
+        if value.endswith('%'):
+            return float(value[:-1]) / 100
+        return float(value)
+    return 0.0
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+补货计划：反推分配算法，求每个零部件至少需要补多少，才能让在售SKU达到目标可售数
+
+分配规则（见 calculate_sku_inventory）下，SKU i 的可售数为
+    int(min(被套库存 × r_i / 被套池比例, 床单库存 × r_i / 床单池比例) × 枕套缩减 × 安全系数)
+逐项反推：
+    - 被套 / 床单(笠)：池内每个有目标的SKU都要求 库存 ≥ 目标/安全系数 × 池比例 / r_i，取池内最大值
+    - 枕套：按补货后的被套、床单算出颜色理论总数，再求缩减之后仍能达标的最少套数
+所有颜色、所有共享池一次整列计算；最后按原算法正向验算，浮点误差导致差一件时逐件补足，
+多补的一件逐件回退，保证少补任何一件都会有SKU不达标。
+
+    plan = plan_purchases(sku_mapping, sales_ratio, component_inventory, active_colors, target=20)
+    plan[plan['需补货'] > 0]
+"""
+
+import copy
+from typing import Dict, Mapping, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from . import diagnostics
+from .aggregation import COMPONENT_INDEX
+from .bom import BOMCatalog
+from .engine import prepare_allocation
+
+# 正向验算后逐件补足的最多轮数（只用于吸收浮点误差，正常一轮即可达标）
+MAX_ADJUSTMENTS = 20
+
+PLAN_COLUMNS = ['类型', '颜色', '尺寸', '当前库存', '所需库存', '需补货']
+
+Target = Union[int, float, Mapping[str, float], pd.Series]
+
+
+# =============================================================================
+# 分组工具
+# =============================================================================
+
+def _group_max(values: np.ndarray, groups) -> np.ndarray:
+    """分组取最大值（values 非负）并广播回每一行"""
+    group_ids, _, ngroups = groups
+    out = np.zeros(ngroups)
+    np.maximum.at(out, group_ids, values)
+    return out[group_ids]
+
+
+def _group_any(flags: np.ndarray, groups) -> np.ndarray:
+    """组内任一行为 True 时，该组每一行记为1"""
+    group_ids, _, ngroups = groups
+    hit = np.bincount(group_ids[flags], minlength=ngroups) > 0
+    return hit[group_ids].astype('int64')
+
+
+def _sku_targets(sku_ids: pd.Series, target: Target) -> np.ndarray:
+    """每个SKU的目标可售数：统一目标，或 {SKU_ID: 目标}（未列出的SKU不设目标）"""
+    if isinstance(target, (Mapping, pd.Series)):
+        targets = pd.Series(target, dtype=float).reindex(sku_ids.to_numpy()).fillna(0).to_numpy()
+    else:
+        targets = np.full(len(sku_ids), float(target))
+    if (targets < 0).any() or not np.isfinite(targets).all():
+        raise ValueError("目标可售数需为非负数")
+    return targets
+
+
+# =============================================================================
+# 补货计划
+# =============================================================================
+
+@diagnostics.timed('plan_purchases')
+def plan_purchases(
+    sku_mapping: pd.DataFrame,
+    sales_ratio: Dict[str, float],
+    component_inventory: pd.Series,
+    active_colors: list,
+    target: Target,
+    safety_factor: float = 0.3,
+    bom: Optional[BOMCatalog] = None,
+) -> pd.DataFrame:
+    """让在售SKU的可售库存（乘安全系数后）都达到 target 所需的零部件补货量
+
+    target 为统一的目标可售数，或 {SKU_ID: 目标}。销售比例为0的SKU可售数恒为0，不参与计划。
+    返回在售颜色涉及的每个零部件一行：类型、颜色、尺寸、当前库存、所需库存、需补货（枕套为套数）。
+    被套和床单(笠)的所需库存是达标的下限；枕套为在此基础上的最少套数。
+    """
+    if not 0 < safety_factor <= 1:
+        raise ValueError("安全库存系数需在 (0, 1] 范围内")
+    allocation = prepare_allocation(sku_mapping, component_inventory, active_colors, bom)
+    if not len(allocation):
+        return pd.DataFrame(columns=PLAN_COLUMNS)
+
+    skus = allocation.skus
+    ratios = allocation.ratios(sales_ratio)
+    targets = _sku_targets(skus['SKU_ID'], target)
+    constrained = (ratios > 0) & (targets > 0)
+    need = np.where(constrained, targets / safety_factor, 0.0)
+    if diagnostics.enabled():
+        diagnostics.count('plan_unreachable_skus', int(((ratios == 0) & (targets > 0)).sum()))
+
+    # 被套 / 床单(笠)：库存 × r_i / 池比例 ≥ need_i（池比例与分配时的累加顺序一致）
+    current = allocation.allocate(ratios)
+    planned = copy.copy(allocation)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for stock, pools, pool_ratio in (
+            ('duvet_stock', allocation.duvet_pools, current['被套池比例']),
+            ('sheet_stock', allocation.sheet_pools, current['床单/笠池比例']),
+        ):
+            required = np.where(constrained, need * pool_ratio / ratios, 0.0)
+            setattr(planned, stock, np.maximum(
+                getattr(allocation, stock), np.ceil(_group_max(required, pools))
+            ).astype('int64'))
+
+        # 枕套：不足时整色按 枕套/理论总数 缩减，缩减后每个SKU仍需 ≥ need_i
+        allocated = planned.allocate(ratios)
+        shortest = np.minimum(allocated['被套分配'], allocated['床单/笠分配'])
+        share = np.where(constrained, need / shortest, 0.0)
+        required = allocated['颜色理论总数'] * _group_max(share, allocation.color_groups)
+    planned.pillow_total = np.maximum(allocation.pillow_total, np.ceil(required)).astype('int64')
+
+    # 正向验算：按原算法重新分配，仍差一件的池逐件补足
+    for _ in range(MAX_ADJUSTMENTS):
+        allocated = planned.allocate(ratios)
+        short = _short(allocated, constrained, targets, safety_factor)
+        if not short.any():
+            break
+        duvet_short = short & (np.trunc(allocated['被套分配'] * safety_factor) < targets)
+        sheet_short = short & (np.trunc(allocated['床单/笠分配'] * safety_factor) < targets)
+        pillow_short = short & ~duvet_short & ~sheet_short
+        planned.duvet_stock = planned.duvet_stock + _group_any(duvet_short, allocation.duvet_pools)
+        planned.sheet_stock = planned.sheet_stock + _group_any(sheet_short, allocation.sheet_pools)
+        planned.pillow_total = planned.pillow_total + _group_any(pillow_short, allocation.color_groups)
+    else:
+        raise ValueError("补货计划未能收敛，请检查销售比例与目标设置")
+
+    # 逐件回退：向上取整会把浮点误差（如 360.00000000000006）放大成多补一件，
+    # 被套的多余一件又会抬高枕套需求；每个池试着少补一件，正向验算仍全部达标才保留。
+    # 同色零部件经颜色理论总数相互影响，反复回退直到一整轮都减不下去
+    parts = (
+        ('duvet_stock', allocation.duvet_pools),
+        ('sheet_stock', allocation.sheet_pools),
+        ('pillow_total', allocation.color_groups),
+    )
+    while any([
+        _step_down(allocation, planned, stock, pools, ratios, constrained, targets, safety_factor)
+        for stock, pools in parts
+    ]):
+        pass
+
+    return _plan_table(allocation, planned)
+
+
+def _short(allocated: Dict[str, np.ndarray], constrained, targets, safety_factor) -> np.ndarray:
+    """有目标的SKU中，可售数（乘安全系数并取整后）未达目标的行"""
+    return constrained & (np.trunc(allocated['理论可售'] * safety_factor) < targets)
+
+
+def _step_down(allocation, planned, stock: str, pools, ratios, constrained, targets, safety_factor) -> bool:
+    """在不低于当前库存、且所有目标仍达标的前提下，逐件减少 planned 中某类零部件的所需库存
+
+    先让所有可减的池同时各减一件，池内SKU仍全部达标的池记为可减；
+    颜色理论总数把同色的池联系在一起，整体验算不通过时再逐个池尝试。
+    有任何一件减下来时返回 True。
+    """
+    group_ids = pools[0]
+    changed = False
+    while True:
+        reducible = getattr(planned, stock) > getattr(allocation, stock)
+        if not reducible.any():
+            return changed
+        trial = copy.copy(planned)
+        setattr(trial, stock, getattr(planned, stock) - reducible)
+        short = _short(trial.allocate(ratios), constrained, targets, safety_factor)
+        safe = reducible & (_group_any(short, pools) == 0)
+        if not safe.any():
+            return changed
+        setattr(trial, stock, getattr(planned, stock) - safe)
+        if not _short(trial.allocate(ratios), constrained, targets, safety_factor).any():
+            setattr(planned, stock, getattr(trial, stock))
+            changed = True
+            continue
+        reduced = False
+        for pool in np.unique(group_ids[safe]):
+            setattr(trial, stock, getattr(planned, stock) - (group_ids == pool))
+            if not _short(trial.allocate(ratios), constrained, targets, safety_factor).any():
+                setattr(planned, stock, getattr(trial, stock))
+                reduced = changed = True
+        if not reduced:
+            return changed
+
+
+def _plan_table(allocation, planned) -> pd.DataFrame:
+    """每个共享池（即每个零部件）取首行，按颜色顺序排列：被套、床单(笠)、枕套"""
+    skus = allocation.skus
+    n = len(skus)
+    parts = [
+        (allocation.duvet_pools, np.full(n, '被套', dtype=object), skus['duvet_size'], 'duvet_stock'),
+        (allocation.sheet_pools, skus['sheet_type'], skus['sheet_size'], 'sheet_stock'),
+        (allocation.color_groups, np.full(n, '枕套', dtype=object), np.full(n, '标准', dtype=object), 'pillow_total'),
+    ]
+    frames = []
+    for (_, positions, _), types, sizes, stock in parts:
+        first = positions == 0
+        frames.append(pd.DataFrame({
+            '类型': np.asarray(types, dtype=object)[first],
+            '颜色': np.asarray(skus['颜色'], dtype=object)[first],
+            '尺寸': np.asarray(sizes, dtype=object)[first],
+            '当前库存': getattr(allocation, stock)[first],
+            '所需库存': getattr(planned, stock)[first],
+            '_color_order': pd.factorize(skus['颜色'])[0][first],
+        }))
+    plan = pd.concat(frames, ignore_index=True)
+    plan = plan.sort_values('_color_order', kind='stable').drop(columns='_color_order').reset_index(drop=True)
+    plan['需补货'] = plan['所需库存'] - plan['当前库存']
+    return plan[PLAN_COLUMNS]
+
+
+def apply_purchase_plan(component_inventory: pd.Series, plan: pd.DataFrame) -> pd.Series:
+    """补货后的零部件库存：当前库存加上计划的补货量（原本没有的零部件追加在末尾）"""
+    purchases = plan[plan['需补货'] > 0].set_index(COMPONENT_INDEX)['需补货']
+    if purchases.empty:
+        return component_inventory
+    combined = pd.concat([component_inventory.astype('int64'), purchases.astype('int64')])
+    return combined.groupby(level=COMPONENT_INDEX, sort=False).sum().rename(component_inventory.name)
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+情景模拟：一次计算多组安全系数与销售比例调整下的SKU可售库存
+
+零部件库存、BOM关联和共享池分组只准备一次；各情景的销售比例并成一个
+行 × 情景 的矩阵，一次完成分配和枕套缩减，安全系数再按列相乘。
+每个情景的结果与用调整后的销售比例单独调用 calculate_sku_inventory 完全一致。
+
+    scenarios = scenario_grid([0.2, 0.3, 0.5], {'1.8米+10%': {'1.8米': 1.1}})
+    matrix = run_scenarios(sku_mapping, sales_ratio, component_inventory, active_colors, scenarios)
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Mapping, Optional
+
+import numpy as np
+import pandas as pd
+
+from . import diagnostics
+from .bom import BOMCatalog
+from .engine import prepare_allocation
+
+
+# =============================================================================
+# 情景定义
+# =============================================================================
+
+BASELINE_NAME = '基准'
+
+# 矩阵列标签
+SKU_COLUMNS = ['SKU_ID', '套件描述', '颜色']
+
+
+@dataclass
+class Scenario:
+    """一个假设情景
+
+    ratio_scale 为 {关键词: 倍数}：套件描述包含该关键词的SKU，销售比例乘以该倍数；
+    一个套件命中多个关键词时按顺序依次相乘。
+    """
+    name: str
+    safety_factor: float = 0.3
+    ratio_scale: Dict[str, float] = field(default_factory=dict)
+
+
+def scenario_grid(
+    safety_factors: Iterable[float],
+    ratio_adjustments: Optional[Mapping[str, Mapping[str, float]]] = None,
+) -> List[Scenario]:
+    """安全系数 × 比例调整 的全部组合
+
+    ratio_adjustments 为 {调整名称: {关键词: 倍数}}，总是包含不做调整的"基准"。
+    """
+    adjustments = {BASELINE_NAME: {}}
+    adjustments.update(ratio_adjustments or {})
+    return [
+        Scenario(f"{name} / 安全系数{safety_factor:g}", float(safety_factor), dict(scale))
+        for name, scale in adjustments.items()
+        for safety_factor in safety_factors
+    ]
+
+
+def _validate(scenarios: List[Scenario], descriptions: pd.Series) -> None:
+    errors = []
+    names = [s.name for s in scenarios]
+    duplicated = sorted({n for n in names if names.count(n) > 1})
+    if duplicated:
+        errors.append(f"情景名称重复: {', '.join(duplicated)}")
+    unique_descriptions = pd.Series(pd.unique(descriptions), dtype=object)
+    checked = set()
+    for s in scenarios:
+        if not 0 < s.safety_factor <= 1:
+            errors.append(f"{s.name}: 安全库存系数需在 (0, 1] 范围内")
+        for keyword, multiplier in s.ratio_scale.items():
+            if multiplier < 0:
+                errors.append(f"{s.name}: {keyword} 的倍数不能为负数")
+            if keyword not in checked:
+                checked.add(keyword)
+                if not unique_descriptions.str.contains(keyword, regex=False).any():
+                    errors.append(f"关键词 {keyword!r} 未匹配任何在售套件")
+    if errors:
+        raise ValueError("情景设置有误:\n" + '\n'.join(errors))
+
+
+def _scaled_ratios(descriptions: pd.Series, base: np.ndarray, ratio_scale: Mapping[str, float]) -> np.ndarray:
+    ratios = base.copy()
+    for keyword, multiplier in ratio_scale.items():
+        ratios[descriptions.str.contains(keyword, regex=False).to_numpy()] *= multiplier
+    return ratios
+
+
+# =============================================================================
+# 批量计算
+# =============================================================================
+
+@diagnostics.timed('scenarios')
+def run_scenarios(
+    sku_mapping: pd.DataFrame,
+    sales_ratio: Dict[str, float],
+    component_inventory: pd.Series,
+    active_colors: list,
+    scenarios: List[Scenario],
+    bom: Optional[BOMCatalog] = None,
+) -> pd.DataFrame:
+    """情景 × SKU 的可售库存矩阵
+
+    行为情景（按传入顺序），列为 (SKU_ID, 套件描述, 颜色)，顺序与
+    calculate_sku_inventory_vectorized 的行序一致；matrix['SKU_ID'] 即可取单个SKU。
+    销售比例调整相同的情景共用一次分配计算。
+    """
+    allocation = prepare_allocation(sku_mapping, component_inventory, active_colors, bom)
+    skus = allocation.skus
+    index = pd.Index([s.name for s in scenarios], name='情景')
+    columns = pd.MultiIndex.from_frame(skus[SKU_COLUMNS])
+    if not len(allocation) or not scenarios:
+        return pd.DataFrame(index=index, columns=columns, dtype='int64')
+
+    descriptions = skus['套件描述'].astype(str)
+    _validate(scenarios, descriptions)
+
+    # 每种不同的比例调整一列
+    ratio_keys = {}
+    for s in scenarios:
+        ratio_keys.setdefault(tuple(s.ratio_scale.items()), len(ratio_keys))
+    base = allocation.ratios(sales_ratio)
+    ratios = np.column_stack([_scaled_ratios(descriptions, base, dict(key)) for key in ratio_keys])
+    theoretical = allocation.allocate(ratios)['理论可售']
+    diagnostics.count('scenario_ratio_sets', len(ratio_keys))
+
+    ratio_columns = [ratio_keys[tuple(s.ratio_scale.items())] for s in scenarios]
+    safety_factors = np.array([s.safety_factor for s in scenarios], dtype=float)
+    final = np.trunc(theoretical[:, ratio_columns] * safety_factors).astype('int64')
+    final[ratios[:, ratio_columns] == 0] = 0
+
+    return pd.DataFrame(final.T, index=index, columns=columns)
+
+
+def summarize_scenarios(matrix: pd.DataFrame, baseline: Optional[str] = None) -> pd.DataFrame:
+    """各情景的可售总数、有货SKU数，以及相对基准情景（默认第一行）的变化"""
+    baseline = baseline if baseline is not None else (matrix.index[0] if len(matrix) else None)
+    summary = pd.DataFrame({
+        '可售总数': matrix.sum(axis=1).astype('int64'),
+        '有货SKU数': (matrix > 0).sum(axis=1).astype('int64'),
+    })
+    if baseline is not None:
+        values = matrix.to_numpy()
+        reference = values[matrix.index.get_loc(baseline)]
+        summary['较基准变化'] = summary['可售总数'] - int(reference.sum())
+        summary['变化SKU数'] = (values != reference).sum(axis=1)
+    return summary.reset_index()
+
+
+def compare_skus(matrix: pd.DataFrame, scenarios: Optional[List[str]] = None, changed_only: bool = False) -> pd.DataFrame:
+    """SKU × 情景 的对比表（SKU_ID、套件描述、颜色 + 各情景可售库存）
+
+    changed_only 时只保留各情景之间可售库存不全相同的SKU。
+    """
+    table = (matrix if scenarios is None else matrix.loc[list(scenarios)]).T
+    if changed_only and len(table.columns) > 1:
+        values = table.to_numpy()
+        table = table[(values != values[:, :1]).any(axis=1)]
+    table.columns = list(table.columns)
+    return table.reset_index()
@@ -0,0 +1,381 @@
+# -*- coding: utf-8 -*-
+"""
+本地 HTTP/JSON 查询服务：常驻内存的零部件库存与各颜色计算结果，供定时同步任务批量查询
+
+    python -m icas.server -i 库存.xlsx -r 销售比例.xlsx -m SKU映射.xlsx --port 8765
+
+接口：
+    GET  /health                      服务状态与数据版本
+    GET  /sku/<SKU_ID>                单个SKU
+    GET  /skus?ids=A,B,C              批量查询
+    POST /skus      {"sku_ids": [...]}
+    POST /delta     {"changes": [{"商品名称": ..., "变动数": ...}]} 或 {"path": 变动文件}
+    POST /settings  {"safety_factor": 0.3, "colors": [...]}
+    POST /reload    {"inventory": ..., "ratio": ..., "mapping": ..., "bom": ...}（均可省略，省略时重读原文件）
+
+查询只读取当前快照的引用，不加锁；更新在写锁内构建新快照后整体替换，
+不会阻塞查询，查询也不会看到更新到一半的数据。
+"""
+
+import argparse
+import json
+import logging
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import parse_qs, unquote, urlparse
+
+import pandas as pd
+
+from .bom import load_bom
+from .cache import InputCache
+from .cli import expand_input_paths
+from .config import DEFAULT_ACTIVE_COLORS
+from .delta import LiveInventory
+from .export import SIMPLE_COLUMNS
+from .incremental import IncrementalCalculator
+from .loaders import load_inventory, load_inventory_delta, load_sales_ratio, load_sku_mapping
+from .warehouses import load_warehouse_inventories
+
+logger = logging.getLogger('icas.server')
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# 单次批量查询的SKU数上限
+MAX_BATCH = 100_000
+
+
+# =============================================================================
+# 服务状态
+# =============================================================================
+
+@dataclass(frozen=True)
+class Snapshot:
+    """某一时刻的全部查询结果，创建后不再修改"""
+    version: int
+    records: Dict[str, dict]
+    safety_factor: float
+    active_colors: tuple
+    updated_at: float = field(default_factory=time.time)
+
+
+def _records(results: pd.DataFrame) -> Dict[str, dict]:
+    """结果表 → {SKU_ID: 记录}；SKU_ID 统一为字符串"""
+    simple = results[SIMPLE_COLUMNS]
+    return {
+        str(sku_id): {'SKU_ID': str(sku_id), '套件描述': desc, '颜色': color, '可售库存': int(stock)}
+        for sku_id, desc, color, stock in zip(*(simple[c].tolist() for c in SIMPLE_COLUMNS))
+    }
+
+
+class InventoryService:
+    """持有输入文件路径、增量计算器和当前快照"""
+
+    def __init__(
+        self,
+        inventory,
+        ratio,
+        mapping,
+        bom=None,
+        safety_factor: float = 0.3,
+        active_colors: Optional[Iterable[str]] = None,
+        cache: Optional[InputCache] = None,
+    ):
+        self.paths = {'inventory': inventory, 'ratio': ratio, 'mapping': mapping, 'bom': bom}
+        self.cache = cache
+        if cache is not None:
+            cache.restore_parse_cache()
+        self._write_lock = threading.Lock()
+        self._snapshot: Optional[Snapshot] = None
+        self._load(safety_factor, list(active_colors or DEFAULT_ACTIVE_COLORS))
+
+    # -------------------------------------------------------------------------
+    # 读取（不加锁）
+    # -------------------------------------------------------------------------
+
+    @property
+    def snapshot(self) -> Snapshot:
+        return self._snapshot
+
+    def lookup(self, sku_ids: Iterable) -> dict:
+        """批量查询；不存在的SKU返回 null"""
+        snapshot = self._snapshot
+        records = snapshot.records
+        return {
+            'version': snapshot.version,
+            'results': {str(sku_id): records.get(str(sku_id)) for sku_id in sku_ids},
+        }
+
+    def status(self) -> dict:
+        snapshot = self._snapshot
+        return {
+            'status': 'ok',
+            'version': snapshot.version,
+            'skus': len(snapshot.records),
+            'safety_factor': snapshot.safety_factor,
+            'active_colors': list(snapshot.active_colors),
+            'updated_at': snapshot.updated_at,
+        }
+
+    # -------------------------------------------------------------------------
+    # 更新（写锁内构建新快照，最后整体替换）
+    # -------------------------------------------------------------------------
+
+    def _read_inputs(self):
+        """按 CLI 相同的规则读取输入（文件或目录），返回商品级库存和增量计算器"""
+        cache = self.cache
+        read_inventory = cache.load_inventory if cache else load_inventory
+        read_sales_ratio = cache.load_sales_ratio if cache else load_sales_ratio
+        read_sku_mapping = cache.load_sku_mapping if cache else load_sku_mapping
+
+        inventory_files = expand_input_paths(self.paths['inventory'])
+        component_inventory = None
+        if cache and len(inventory_files) == 1:
+            component_inventory = cache.load_component_inventory(inventory_files[0])
+        df_inventory = load_warehouse_inventories(inventory_files, read_inventory).inventory
+        live = LiveInventory(df_inventory, component_inventory)
+
+        sales_ratio = {}
+        for f in expand_input_paths(self.paths['ratio']):
+            sales_ratio.update(read_sales_ratio(f))
+        sku_mapping = pd.concat(
+            [read_sku_mapping(f) for f in expand_input_paths(self.paths['mapping'])], ignore_index=True
+        )
+        bom_file = self.paths['bom']
+        bom = load_bom(bom_file) if bom_file else None
+        calculator = IncrementalCalculator(sku_mapping, sales_ratio, live.component_inventory, bom)
+        if cache:
+            cache.persist_parse_cache()
+        return live, calculator
+
+    def _publish(self, safety_factor: float, active_colors: List[str]) -> Snapshot:
+        results = self._calculator.results(active_colors, safety_factor)
+        version = self._snapshot.version + 1 if self._snapshot else 1
+        self._snapshot = Snapshot(version, _records(results), safety_factor, tuple(active_colors))
+        return self._snapshot
+
+    def _load(self, safety_factor: float, active_colors: List[str]) -> Snapshot:
+        with self._write_lock:
+            self._live, self._calculator = self._read_inputs()
+            return self._publish(safety_factor, active_colors)
+
+    def reload(self, **paths) -> Snapshot:
+        """重新读取输入文件（可替换其中任意几个），保持当前安全系数和在售颜色"""
+        with self._write_lock:
+            previous = dict(self.paths)
+            self.paths.update({k: v for k, v in paths.items() if v is not None})
+            try:
+                live, calculator = self._read_inputs()
+            except Exception:
+                self.paths = previous
+                raise
+            self._live, self._calculator = live, calculator
+            snapshot = self._snapshot
+            return self._publish(snapshot.safety_factor, list(snapshot.active_colors))
+
+    def apply_delta(self, delta: pd.DataFrame) -> List[str]:
+        """应用库存变动，只重算涉及的颜色；返回这些颜色"""
+        with self._write_lock:
+            touched = self._live.apply_delta(delta)
+            if touched:
+                self._calculator.update_component_inventory(self._live.component_inventory, touched)
+                snapshot = self._snapshot
+                self._publish(snapshot.safety_factor, list(snapshot.active_colors))
+            return touched
+
+    def update_settings(
+        self,
+        safety_factor: Optional[float] = None,
+        active_colors: Optional[Iterable[str]] = None,
+    ) -> Snapshot:
+        """调整安全系数或在售颜色（增量计算，不重读文件）"""
+        if safety_factor is not None:
+            if not isinstance(safety_factor, (int, float)) or isinstance(safety_factor, bool):
+                raise ValueError("安全库存系数需为数字")
+            if not 0 < safety_factor <= 1:
+                raise ValueError("安全库存系数需在 (0, 1] 范围内")
+        if active_colors is not None:
+            if isinstance(active_colors, str):
+                raise ValueError("在售颜色需为颜色名称列表")
+            active_colors = list(active_colors)
+            if not all(isinstance(c, str) for c in active_colors):
+                raise ValueError("在售颜色需为颜色名称列表")
+        with self._write_lock:
+            snapshot = self._snapshot
+            return self._publish(
+                snapshot.safety_factor if safety_factor is None else float(safety_factor),
+                list(snapshot.active_colors if active_colors is None else active_colors),
+            )
+
+
+# =============================================================================
+# HTTP 接口
+# =============================================================================
+
+def _settings(body: dict) -> dict:
+    """POST /settings 的参数；省略的字段保持原值，给出但为 null 视为请求有误"""
+    for name in ('safety_factor', 'colors'):
+        if name in body and body[name] is None:
+            raise ValueError(f"{name} 不能为 null")
+    colors = body.get('colors')
+    if colors is not None and not isinstance(colors, list):
+        raise ValueError("colors 需为颜色名称列表")
+    return {'safety_factor': body.get('safety_factor'), 'active_colors': colors}
+
+
+def _delta_frame(body: dict) -> pd.DataFrame:
+    if 'path' in body:
+        return load_inventory_delta(body['path'])
+    changes = body.get('changes')
+    if not isinstance(changes, list):
+        raise ValueError("请求需要 changes 列表或 path")
+    df = pd.DataFrame(changes)
+    quantity = next((c for c in ('变动数', '变动数量', '数量') if c in df.columns), None)
+    if df.empty:
+        return pd.DataFrame(columns=['商品名称', '库存'])
+    if '商品名称' not in df.columns or quantity is None:
+        raise ValueError("changes 每项需要 商品名称 和 变动数")
+    return df[['商品名称', quantity]].rename(columns={quantity: '库存'})
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    service: InventoryService = None
+    protocol_version = 'HTTP/1.1'
+    # 保持连接时响应头和正文分两次写出，关闭 Nagle 避免与延迟确认叠加出约 40ms 的等待
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def _send(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self) -> dict:
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        body = json.loads(self.rfile.read(length))
+        if not isinstance(body, dict):
+            raise ValueError("请求体应为 JSON 对象")
+        return body
+
+    def _handle(self, route) -> None:
+        try:
+            status, payload = route()
+        except (ValueError, KeyError, json.JSONDecodeError) as e:
+            status, payload = 400, {'error': str(e)}
+        except Exception as e:
+            logger.exception("请求处理失败")
+            status, payload = 500, {'error': str(e)}
+        self._send(status, payload)
+
+    def _lookup(self, sku_ids: list):
+        if len(sku_ids) > MAX_BATCH:
+            raise ValueError(f"单次最多查询 {MAX_BATCH} 个SKU")
+        return 200, self.service.lookup(sku_ids)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+
+        def route():
+            if url.path == '/health':
+                return 200, self.service.status()
+            if url.path.startswith('/sku/'):
+                sku_id = unquote(url.path[len('/sku/'):])
+                record = self.service.lookup([sku_id])['results'][sku_id]
+                return (200, record) if record else (404, {'error': f"SKU不存在: {sku_id}"})
+            if url.path == '/skus':
+                ids = [i for value in parse_qs(url.query).get('ids', []) for i in value.split(',') if i]
+                return self._lookup(ids)
+            return 404, {'error': f"未知路径: {url.path}"}
+
+        self._handle(route)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+
+        def route():
+            body = self._body()
+            if url.path == '/skus':
+                sku_ids = body.get('sku_ids')
+                if not isinstance(sku_ids, list):
+                    raise ValueError("请求需要 sku_ids 列表")
+                return self._lookup(sku_ids)
+            if url.path == '/delta':
+                touched = self.service.apply_delta(_delta_frame(body))
+                return 200, {'touched_colors': touched, 'version': self.service.snapshot.version}
+            if url.path == '/settings':
+                snapshot = self.service.update_settings(**_settings(body))
+                return 200, {'version': snapshot.version}
+            if url.path == '/reload':
+                snapshot = self.service.reload(**{k: body.get(k) for k in ('inventory', 'ratio', 'mapping', 'bom')})
+                return 200, {'version': snapshot.version, 'skus': len(snapshot.records)}
+            return 404, {'error': f"未知路径: {url.path}"}
+
+        self._handle(route)
+
+
+def make_server(service: InventoryService, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> ThreadingHTTPServer:
+    handler = type('BoundQueryHandler', (QueryHandler,), {'service': service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+# =============================================================================
+# 命令行入口
+# =============================================================================
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python -m icas.server', description='套件库存查询服务')
+    parser.add_argument('-i', '--inventory', required=True, help='库存源文件或目录')
+    parser.add_argument('-r', '--ratio', required=True, help='销售比例表文件或目录')
+    parser.add_argument('-m', '--mapping', required=True, help='SKU映射表文件或目录')
+    parser.add_argument('-b', '--bom', default=None, help='BOM配置文件，默认使用内置BOM')
+    parser.add_argument('--safety-factor', type=float, default=0.3, help='安全库存系数（默认: %(default)s）')
+    parser.add_argument('--colors', nargs='+', default=None, help='在售颜色，默认使用内置在售颜色列表')
+    parser.add_argument('--cache-dir', default=None, help='输入缓存目录')
+    parser.add_argument('--host', default=DEFAULT_HOST, help='监听地址（默认: %(default)s）')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='监听端口（默认: %(default)s）')
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if not 0 < args.safety_factor <= 1:
+        print("安全库存系数需在 (0, 1] 范围内", file=sys.stderr)
+        return 2
+
+    try:
+        service = InventoryService(
+            args.inventory, args.ratio, args.mapping, args.bom,
+            safety_factor=args.safety_factor,
+            active_colors=args.colors,
+            cache=InputCache(args.cache_dir) if args.cache_dir else None,
+        )
+    except (ValueError, OSError) as e:
+        print(f"加载出错: {e}", file=sys.stderr)
+        return 1
+
+    server = make_server(service, args.host, args.port)
+    print(f"已加载 {len(service.snapshot.records)} 个SKU，监听 http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+结果缓存：进程内共享的计算结果，相同输入（文件内容哈希 + 参数）只计算一次
+
+多个会话同时提交相同输入时，后来者等待正在进行的计算并直接使用其结果。
+缓存有内存上限（按最久未使用淘汰）和存活时间，命中、未命中、淘汰次数可供监控。
+
+    store = ResultStore.from_env()
+    value = store.get_or_compute(key, compute)
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import pandas as pd
+
+from . import diagnostics
+
+
+# =============================================================================
+# 缓存配置
+# =============================================================================
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+DEFAULT_TTL_SECONDS = 4 * 3600
+
+
+def estimate_nbytes(value: Any, _seen: Optional[set] = None) -> int:
+    """粗略估算对象占用的内存：累加其中 DataFrame / Series 的大小，递归进入容器和对象属性"""
+    seen = _seen if _seen is not None else set()
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum() if isinstance(usage, pd.Series) else usage)
+    if isinstance(value, dict):
+        return sum(estimate_nbytes(v, seen) for v in value.values())
+    if isinstance(value, (list, tuple, set)):
+        return sum(estimate_nbytes(v, seen) for v in value)
+    if hasattr(value, '__dict__') and not isinstance(value, type):
+        return sum(estimate_nbytes(v, seen) for v in vars(value).values())
+    return 0
+
+
+@dataclass
+class _Entry:
+    value: Any
+    nbytes: int
+    created_at: float
+
+
+# =============================================================================
+# 结果缓存
+# =============================================================================
+
+class ResultStore:
+    """线程安全的 LRU + TTL 内存缓存
+
+    - max_bytes：缓存值的总大小上限（放入时和 resize 时按 estimate_nbytes 估算）
+    - ttl：条目自放入起的存活秒数，过期后视为未命中
+    缓存值在会话间共享，取出后不应原地修改（需要修改时先复制）。
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, ttl: Optional[float] = DEFAULT_TTL_SECONDS):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: 'OrderedDict[Hashable, _Entry]' = OrderedDict()
+        self._pending: Dict[Hashable, threading.Event] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @classmethod
+    def from_env(cls) -> 'ResultStore':
+        """从环境变量 ICAS_RESULT_CACHE_MB / ICAS_RESULT_CACHE_TTL（秒，0 为不过期）创建"""
+        max_mb = os.environ.get('ICAS_RESULT_CACHE_MB')
+        ttl = os.environ.get('ICAS_RESULT_CACHE_TTL')
+        return cls(
+            int(float(max_mb) * 1024 * 1024) if max_mb else DEFAULT_MAX_BYTES,
+            (float(ttl) or None) if ttl else DEFAULT_TTL_SECONDS,
+        )
+
+    def _lookup(self, key: Hashable) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self.ttl is not None and time.time() - entry.created_at > self.ttl:
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def __contains__(self, key: Hashable) -> bool:
+        """键是否在缓存中且未过期（不计入命中统计，也不改变淘汰顺序）"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and (self.ttl is None or time.time() - entry.created_at <= self.ttl)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return entry.value
+
+    def put(self, key: Hashable, value: Any, nbytes: Optional[int] = None) -> None:
+        nbytes = estimate_nbytes(value) if nbytes is None else nbytes
+        with self._lock:
+            self._entries.pop(key, None)
+            if nbytes > self.max_bytes:
+                return
+            self._entries[key] = _Entry(value, nbytes, time.time())
+            self._evict()
+
+    def resize(self, key: Hashable) -> None:
+        """缓存值原地增长后（如共享的计算器补算了颜色）重新估算大小，超出上限时淘汰"""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return
+        nbytes = estimate_nbytes(entry.value)
+        with self._lock:
+            if self._entries.get(key) is entry:
+                entry.nbytes = nbytes
+                self._evict()
+
+    def _evict(self) -> None:
+        total = sum(entry.nbytes for entry in self._entries.values())
+        while total > self.max_bytes and self._entries:
+            _, entry = self._entries.popitem(last=False)
+            total -= entry.nbytes
+            self.evictions += 1
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """命中时直接返回；否则计算并放入缓存。同一个键同时只计算一次，其他调用者等待结果"""
+        while True:
+            with self._lock:
+                entry = self._lookup(key)
+                if entry is not None:
+                    self.hits += 1
+                    diagnostics.count('result_cache_hits')
+                    return entry.value
+                pending = self._pending.get(key)
+                if pending is None:
+                    self.misses += 1
+                    diagnostics.count('result_cache_misses')
+                    pending = self._pending[key] = threading.Event()
+                    break
+            # 另一个会话正在计算同样的输入：等它结束后重新查找（它失败时由本调用重新计算）
+            pending.wait()
+
+        try:
+            value = compute()
+            self.put(key, value)
+            return value
+        finally:
+            with self._lock:
+                del self._pending[key]
+            pending.set()
+
+    def discard(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """条目数、占用、命中/未命中/淘汰/过期次数与命中率"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'nbytes': sum(entry.nbytes for entry in self._entries.values()),
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+            }
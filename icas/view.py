@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+结果浏览：结果表的只读索引，供界面筛选和分页
+
+构建时一次求出各颜色的行位置、有货标记和汇总统计；之后的筛选只在行位置数组上进行，
+分页时只取出当前页的行，与结果表的大小无关。
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# =============================================================================
+# 结果索引
+# =============================================================================
+
+class ResultView:
+    """一份结果表（calculate_sku_inventory_vectorized / IncrementalCalculator.results 的输出）的索引
+
+    结果表本身不被复制或修改；同一份结果多次筛选时，筛选出的行位置会被缓存。
+    """
+
+    def __init__(self, results: pd.DataFrame):
+        self.results = results
+        stock = results['可售库存'].to_numpy(dtype='int64')
+        self._in_stock = stock > 0
+
+        # 颜色按在结果中首次出现的顺序排列（即映射表中的颜色顺序）
+        codes, colors = pd.factorize(results['颜色'])
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(len(colors) + 1))
+        self.colors: List[str] = list(colors)
+        self._color_rows: Dict[str, np.ndarray] = {
+            color: order[bounds[i]:bounds[i + 1]] for i, color in enumerate(self.colors)
+        }
+        self._rows_cache: Dict[Tuple[Optional[str], bool], np.ndarray] = {}
+
+        in_stock = int(self._in_stock.sum())
+        self.metrics = {
+            'skus': len(results),
+            'in_stock': in_stock,
+            'out_of_stock': len(results) - in_stock,
+            'total_stock': int(stock.sum()),
+        }
+        valid = codes >= 0
+        self.color_stats = pd.DataFrame({
+            '颜色': self.colors,
+            'SKU数': np.bincount(codes[valid], minlength=len(colors)),
+            '可售套数': np.bincount(codes[valid], weights=stock[valid], minlength=len(colors)).astype('int64'),
+        })
+
+    def __len__(self) -> int:
+        return len(self.results)
+
+    def rows(self, color: Optional[str] = None, in_stock_only: bool = False) -> np.ndarray:
+        """符合筛选条件的行位置（按结果表原有顺序）；color 为 None 表示全部颜色"""
+        key = (color, in_stock_only)
+        rows = self._rows_cache.get(key)
+        if rows is None:
+            if color is None:
+                rows = np.arange(len(self.results))
+            else:
+                rows = self._color_rows.get(color, np.empty(0, dtype=np.intp))
+            if in_stock_only:
+                rows = rows[self._in_stock[rows]]
+            self._rows_cache[key] = rows
+        return rows
+
+    @staticmethod
+    def page_count(n_rows: int, page_size: int) -> int:
+        return max(1, -(-n_rows // page_size))
+
+    def page(self, rows: np.ndarray, page: int, page_size: int, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """取出第 page 页（从1开始）的行，只复制这一页"""
+        start = (page - 1) * page_size
+        selected = rows[start:start + page_size]
+        if columns is None:
+            return self.results.iloc[selected]
+        return self.results.iloc[selected, self.results.columns.get_indexer(columns)]
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+多仓库库存：并行读取各仓库导出的库存文件，合并为一份商品库存，并保留各仓库明细
+
+每个文件在工作线程/进程中读取并按商品名称汇总（即 load_inventory），
+主进程只把各仓库的汇总结果相加，读取总耗时取决于最大的文件而不是文件总数。
+
+    warehouses = load_warehouse_inventories(files, workers=8)
+    warehouses.inventory            # 合并后的 商品名称、库存，与单个 load_inventory 的输出同形
+    warehouses.totals()             # 各仓库商品数与库存合计
+    warehouses.product_breakdown()  # 商品 × 仓库 库存
+"""
+
+from dataclasses import dataclass
+from os import PathLike
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence
+
+import pandas as pd
+
+from . import diagnostics
+from .aggregation import COMPONENT_INDEX, aggregate_component_inventory
+from .loaders import detect_format, load_inventory
+from .parallel import EXECUTORS, _make_executor, default_workers
+
+
+# =============================================================================
+# 仓库名称
+# =============================================================================
+
+WAREHOUSE_COLUMNS = ['仓库', '商品名称', '库存']
+
+
+def warehouse_name(file) -> str:
+    """仓库名称取文件名（不含后缀），如 "华东仓.xlsx" → "华东仓" """
+    if isinstance(file, (str, PathLike)):
+        name = str(file)
+    else:
+        name = getattr(file, 'name', '') or ''
+    return Path(name).stem or '仓库'
+
+
+def _unique_names(names: List[str]) -> List[str]:
+    """同名文件（如不同目录下的 库存.xlsx）依次加上 (2)、(3)… 区分"""
+    seen = {}
+    unique = []
+    for name in names:
+        seen[name] = seen.get(name, 0) + 1
+        unique.append(name if seen[name] == 1 else f"{name} ({seen[name]})")
+    return unique
+
+
+# =============================================================================
+# 多仓库库存
+# =============================================================================
+
+@dataclass
+class WarehouseInventory:
+    """合并后的商品库存及各仓库明细
+
+    - inventory：商品名称、库存（各仓库相加），可直接交给 aggregate_component_inventory / LiveInventory
+    - by_warehouse：仓库、商品名称、库存，每个仓库内商品名称已合并
+    """
+    inventory: pd.DataFrame
+    by_warehouse: pd.DataFrame
+
+    @property
+    def warehouses(self) -> List[str]:
+        return list(self.by_warehouse['仓库'].cat.categories)
+
+    def totals(self) -> pd.DataFrame:
+        """各仓库的商品数与库存合计（按读取顺序）"""
+        grouped = self.by_warehouse.groupby('仓库', observed=False)['库存']
+        return pd.DataFrame({
+            '商品数': grouped.size(),
+            '库存合计': grouped.sum().astype('int64'),
+        }).reset_index()
+
+    def product_breakdown(self, names: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """商品 × 仓库 的库存表，末列为合计；names 指定时只取这些商品"""
+        rows = self.by_warehouse
+        if names is not None:
+            rows = rows[rows['商品名称'].isin(list(names))]
+        table = rows.pivot_table(
+            index='商品名称', columns='仓库', values='库存', aggfunc='sum', fill_value=0, observed=False
+        ).astype('int64')
+        table.columns = list(table.columns)
+        table['合计'] = table.sum(axis=1)
+        return table
+
+    def component_breakdown(self) -> pd.DataFrame:
+        """(类型, 颜色, 尺寸) × 仓库 的零部件库存，末列为全部仓库合并后的库存
+
+        单只枕套按仓库分别折算为套数，各仓库之和可能小于合并后的套数（跨仓库的单只可以配对）。
+        """
+        per_warehouse = {
+            warehouse: aggregate_component_inventory(rows)
+            for warehouse, rows in self.by_warehouse.groupby('仓库', observed=False, sort=False)
+        }
+        per_warehouse['合计'] = aggregate_component_inventory(self.inventory)
+        table = pd.concat(per_warehouse, axis=1).fillna(0).astype('int64')
+        table.index.names = COMPONENT_INDEX
+        return table
+
+
+# =============================================================================
+# 并行读取
+# =============================================================================
+
+# auto 模式：Excel 解析主要是持有 GIL 的 Python 代码，多个 Excel 文件用进程池；
+# CSV / Parquet / Feather 的解析在 C 代码中释放 GIL，线程池即可
+_PROCESS_FORMATS = ('excel',)
+
+
+@diagnostics.timed('load_warehouses')
+def load_warehouse_inventories(
+    files: Sequence,
+    read: Callable[..., pd.DataFrame] = load_inventory,
+    workers: Optional[int] = None,
+    executor: str = 'auto',
+    names: Optional[Sequence[str]] = None,
+) -> WarehouseInventory:
+    """并行读取多个仓库的库存文件并合并
+
+    - read：单个文件的读取函数，默认 load_inventory，也可以是 InputCache.load_inventory；
+      用进程池时须可被 pickle
+    - workers：并行数，默认为 CPU 核数（不超过文件数）
+    - executor：'process' / 'thread' / 'serial'，'auto' 按文件格式选择
+    - names：各文件对应的仓库名称，默认取文件名
+    """
+    if executor not in EXECUTORS:
+        raise ValueError(f"不支持的并行方式: {executor}，可选 {', '.join(EXECUTORS)}")
+    files = list(files)
+    if not files:
+        raise ValueError("没有库存文件")
+    names = _unique_names(list(names) if names is not None else [warehouse_name(f) for f in files])
+    if len(names) != len(files):
+        raise ValueError("仓库名称数量与库存文件数量不一致")
+    workers = min(workers or default_workers(), len(files))
+    if workers < 1:
+        raise ValueError("并行数必须大于0")
+
+    if executor == 'auto':
+        executor = 'process' if any(detect_format(f) in _PROCESS_FORMATS for f in files) else 'thread'
+    if executor == 'serial' or workers == 1:
+        parts = [read(f) for f in files]
+    else:
+        # 工作进程/线程不继承诊断上下文，读取阶段的计时记在本函数上
+        with _make_executor(executor, workers) as pool:
+            parts = list(pool.map(read, files))
+
+    by_warehouse = pd.concat(
+        [part.assign(仓库=name) for name, part in zip(names, parts)], ignore_index=True
+    )[WAREHOUSE_COLUMNS]
+    by_warehouse['仓库'] = pd.Categorical(by_warehouse['仓库'], categories=names)
+
+    # 归并：各仓库已按商品名称汇总，这里只把同名商品的库存相加；
+    # 商品按首次出现的顺序排列（不重新排序），第一个文件的商品顺序与单独读取时相同
+    if len(parts) == 1:
+        inventory = parts[0]
+    else:
+        inventory = by_warehouse.groupby('商品名称', sort=False)['库存'].sum().reset_index()
+    diagnostics.count('warehouses_read', len(files))
+    return WarehouseInventory(inventory, by_warehouse)
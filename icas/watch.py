@@ -0,0 +1,390 @@
+# -*- coding: utf-8 -*-
+"""
+监视目录：ERP 导出的库存文件落到共享目录后自动重算，把可售库存写到输出目录
+
+    python -m icas.watch -w 库存导出目录/ -r 销售比例.xlsx -m SKU映射.xlsx -o 结果目录/
+
+- 防抖：文件大小和修改时间连续 settle 秒不变（且没有 Excel 的 ~$ 锁文件）才视为写完
+- 去重：内容哈希与上一个成功写出结果的文件相同时跳过（重启后按输出目录中的 status.json 继续判断），
+  处理失败的文件原样重新放入时会再算一次；
+  同一轮轮询中有多个新文件时只算最新的一个（每份导出都是完整快照）
+- 流水线：读取 → 聚合 → 分配与写出 三个阶段各一个线程，阶段之间的队列只容纳一项，
+  下一个文件的读取与上一个文件的分配同时进行
+- 分配沿用同一个增量计算器，只重算零部件库存有变化的颜色
+- 输出先写临时文件再原子替换，读取方不会看到写到一半的结果
+- 指定 --history 时每次结果另追加到历史快照库（见 icas.history）
+
+销售比例表、SKU映射表和BOM在启动时读取一次，修改后需重启。
+"""
+
+import argparse
+import json
+import logging
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from .aggregation import aggregate_component_inventory
+from .bom import BOMCatalog, load_bom
+from .cache import InputCache, file_digest
+from .cli import expand_input_paths
+from .config import DEFAULT_ACTIVE_COLORS
+from .engine import with_detail
+from .export import EXPORT_FORMATS, SIMPLE_COLUMNS, export_bytes
+from .history import SnapshotStore
+from .incremental import IncrementalCalculator
+from .loaders import TABLE_FORMATS, load_inventory, load_sales_ratio, load_sku_mapping
+
+logger = logging.getLogger('icas.watch')
+
+DEFAULT_SETTLE_SECONDS = 2.0
+DEFAULT_POLL_SECONDS = 0.5
+
+LATEST_STEM = '最新可售库存'
+STATUS_FILE = 'status.json'
+
+_STOP = object()
+
+
+# =============================================================================
+# 目录轮询与防抖
+# =============================================================================
+
+def _is_candidate(path: Path) -> bool:
+    name = path.name
+    return (
+        path.suffix.lower() in TABLE_FORMATS
+        and not name.startswith(('~$', '.'))
+        and not (path.parent / f'~${name}').exists()
+    )
+
+
+class FolderWatcher:
+    """轮询目录，返回已经写完（大小与修改时间在 settle 秒内未变）且尚未返回过的文件
+
+    同一个文件被覆盖写入后，新内容稳定下来时会再次返回。
+    """
+
+    def __init__(self, directory, settle: float = DEFAULT_SETTLE_SECONDS):
+        self.directory = Path(directory)
+        self.settle = settle
+        # 路径 → (大小, 修改时间, 首次看到该状态的时间)
+        self._pending: Dict[Path, Tuple[int, int, float]] = {}
+        self._emitted: Dict[Path, Tuple[int, int]] = {}
+
+    def poll(self, now: Optional[float] = None) -> List[Tuple[Path, float]]:
+        """返回 [(文件, 首次看到其最终状态的时间)]，按修改时间排序"""
+        now = time.monotonic() if now is None else now
+        ready = []
+        seen = set()
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return []
+        for entry in entries:
+            path = Path(entry.path)
+            if not entry.is_file() or not _is_candidate(path):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            seen.add(path)
+            signature = (stat.st_size, stat.st_mtime_ns)
+            pending = self._pending.get(path)
+            if pending is None or pending[:2] != signature:
+                self._pending[path] = (*signature, now)
+                continue
+            if stat.st_size and now - pending[2] >= self.settle and self._emitted.get(path) != signature:
+                self._emitted[path] = signature
+                ready.append((stat.st_mtime_ns, path, pending[2]))
+        # 已删除的文件不再跟踪
+        for path in set(self._pending) - seen:
+            del self._pending[path]
+            self._emitted.pop(path, None)
+        return [(path, first_seen) for _, path, first_seen in sorted(ready)]
+
+
+# =============================================================================
+# 流水线
+# =============================================================================
+
+@dataclass
+class _Item:
+    """流水线中的一个输入文件及其各阶段产物"""
+    path: Path
+    digest: str
+    landed_at: float
+    data: object = None
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix='.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def _changed_colors(old: pd.Series, new: pd.Series) -> List[str]:
+    """两份零部件库存之间有任何差异的颜色"""
+    both = pd.concat([old.astype('int64'), new.astype('int64')], axis=1, keys=['old', 'new']).fillna(0)
+    changed = (both['old'] != both['new']).to_numpy()
+    return list(pd.unique(both.index.get_level_values('颜色')[changed]))
+
+
+class WatchPipeline:
+    """监视目录并自动重算的常驻流水线
+
+    run() 阻塞运行到 stop() 被调用（或 Ctrl+C）；on_result(状态字典) 在每个结果写出后调用。
+    """
+
+    def __init__(
+        self,
+        directory,
+        output_dir,
+        sku_mapping: pd.DataFrame,
+        sales_ratio: Dict[str, float],
+        active_colors: Optional[List[str]] = None,
+        safety_factor: float = 0.3,
+        bom: Optional[BOMCatalog] = None,
+        fmt: str = 'xlsx',
+        detail: bool = False,
+        settle: float = DEFAULT_SETTLE_SECONDS,
+        poll_interval: float = DEFAULT_POLL_SECONDS,
+        cache: Optional[InputCache] = None,
+        history: Optional[SnapshotStore] = None,
+        on_result: Optional[Callable[[dict], None]] = None,
+    ):
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"不支持的导出格式: {fmt}")
+        if not 0 < safety_factor <= 1:
+            raise ValueError("安全库存系数需在 (0, 1] 范围内")
+        self.watcher = FolderWatcher(directory, settle)
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.sku_mapping = sku_mapping
+        self.sales_ratio = sales_ratio
+        self.active_colors = list(active_colors or DEFAULT_ACTIVE_COLORS)
+        self.safety_factor = safety_factor
+        self.bom = bom
+        self.fmt = fmt
+        self.detail = detail
+        self.poll_interval = poll_interval
+        self.cache = cache
+        if cache is not None:
+            cache.restore_parse_cache()
+        self.history = history
+        self.on_result = on_result
+
+        self._calculator: Optional[IncrementalCalculator] = None
+        self._last_digest = self._read_status().get('digest')
+        self._stop = threading.Event()
+
+    # -------------------------------------------------------------------------
+    # 状态
+    # -------------------------------------------------------------------------
+
+    def _read_status(self) -> dict:
+        try:
+            return json.loads((self.output_dir / STATUS_FILE).read_text(encoding='utf-8'))
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    # -------------------------------------------------------------------------
+    # 各阶段
+    # -------------------------------------------------------------------------
+
+    def _ingest(self, item: _Item) -> _Item:
+        if self.cache is not None:
+            item.data = self.cache.load_inventory(item.path, item.digest)
+        else:
+            item.data = load_inventory(item.path)
+        return item
+
+    def _aggregate(self, item: _Item) -> _Item:
+        item.data = aggregate_component_inventory(item.data)
+        return item
+
+    def _allocate(self, item: _Item) -> None:
+        component_inventory = item.data
+        if self._calculator is None:
+            self._calculator = IncrementalCalculator(self.sku_mapping, self.sales_ratio, component_inventory, self.bom)
+            recomputed = len(self.active_colors)
+        else:
+            changed = _changed_colors(self._calculator.component_inventory, component_inventory)
+            self._calculator.update_component_inventory(component_inventory, changed)
+            recomputed = len(set(changed) & set(self.active_colors))
+        results = self._calculator.results(self.active_colors, self.safety_factor)
+
+        table = with_detail(results) if self.detail else results[SIMPLE_COLUMNS]
+        data = export_bytes(table, self.fmt)
+        suffix = EXPORT_FORMATS[self.fmt]['suffix']
+        output = self.output_dir / f'{item.path.stem}_可售库存{suffix}'
+        _atomic_write(output, data)
+        _atomic_write(self.output_dir / f'{LATEST_STEM}{suffix}', data)
+
+        status = {
+            'source': str(item.path),
+            'digest': item.digest,
+            'output': str(output),
+            'skus': len(results),
+            'in_stock': int((results['可售库存'] > 0).sum()),
+            'total_stock': int(results['可售库存'].sum()),
+            'recomputed_colors': recomputed,
+            'finished_at': time.time(),
+            'latency_seconds': round(time.monotonic() - item.landed_at, 3),
+        }
+        if self.history is not None:
+            status['run_id'] = self.history.record(
+                results, component_inventory, label=item.path.name, source=item.digest
+            )
+        _atomic_write(self.output_dir / STATUS_FILE, json.dumps(status, ensure_ascii=False, indent=2).encode('utf-8'))
+        # 结果和状态都写出后才记为已处理：中途失败的文件重新放入（或重启后）仍会重算
+        self._last_digest = item.digest
+        logger.info("%s → %s（%d 个SKU，重算 %d 种颜色，落地到写出 %.2f 秒）",
+                    item.path.name, output.name, status['skus'], recomputed, status['latency_seconds'])
+        if self.on_result is not None:
+            self.on_result(status)
+
+    def _stage(self, name: str, func: Callable[[_Item], object], inbox: queue.Queue,
+               outbox: Optional[queue.Queue]) -> None:
+        while True:
+            item = inbox.get()
+            if item is _STOP:
+                if outbox is not None:
+                    outbox.put(_STOP)
+                return
+            try:
+                result = func(item)
+            except Exception:
+                # 单个文件出错（格式不对、缺列等）只跳过该文件，流水线继续运行
+                logger.exception("%s 处理失败（%s）", item.path.name, name)
+                continue
+            if outbox is not None:
+                outbox.put(result)
+
+    # -------------------------------------------------------------------------
+    # 运行
+    # -------------------------------------------------------------------------
+
+    def run(self) -> None:
+        """轮询目录并把新文件送入流水线，直到 stop()；退出前处理完已送入的文件"""
+        # 队列只容纳一项：读取最多领先分配一个文件，内存中最多同时有三份库存
+        to_aggregate: queue.Queue = queue.Queue(maxsize=1)
+        to_allocate: queue.Queue = queue.Queue(maxsize=1)
+        to_ingest: queue.Queue = queue.Queue(maxsize=1)
+        threads = [
+            threading.Thread(target=self._stage, args=(name, func, inbox, outbox), name=f'icas-watch-{name}', daemon=True)
+            for name, func, inbox, outbox in (
+                ('ingest', self._ingest, to_ingest, to_aggregate),
+                ('aggregate', self._aggregate, to_aggregate, to_allocate),
+                ('allocate', self._allocate, to_allocate, None),
+            )
+        ]
+        for thread in threads:
+            thread.start()
+
+        logger.info("监视 %s，结果写到 %s", self.watcher.directory, self.output_dir)
+        try:
+            while not self._stop.is_set():
+                ready = self.watcher.poll()
+                # 每份导出都是完整快照：同一轮有多个新文件（如启动时目录中已有旧文件）时只算最新的
+                for path, _ in ready[:-1]:
+                    logger.info("%s 已被更新的文件取代，跳过", path.name)
+                for path, landed_at in ready[-1:]:
+                    try:
+                        digest = file_digest(path)
+                    except OSError:
+                        logger.exception("%s 读取失败", path.name)
+                        continue
+                    if digest == self._last_digest:
+                        logger.info("%s 内容未变化，跳过", path.name)
+                        continue
+                    to_ingest.put(_Item(path, digest, landed_at))
+                self._stop.wait(self.poll_interval)
+        finally:
+            to_ingest.put(_STOP)
+            for thread in threads:
+                thread.join()
+            if self.cache is not None:
+                self.cache.persist_parse_cache()
+
+
+# =============================================================================
+# 命令行入口
+# =============================================================================
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python -m icas.watch', description='监视库存导出目录并自动重算')
+    parser.add_argument('-w', '--watch', required=True, help='ERP 导出库存文件的目录')
+    parser.add_argument('-r', '--ratio', required=True, help='销售比例表文件或目录')
+    parser.add_argument('-m', '--mapping', required=True, help='SKU映射表文件或目录')
+    parser.add_argument('-b', '--bom', default=None, help='BOM配置文件，默认使用内置BOM')
+    parser.add_argument('-o', '--output-dir', required=True, help='结果输出目录')
+    parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='xlsx', help='结果文件格式（默认: %(default)s）')
+    parser.add_argument('--detail', action='store_true', help='输出计算明细列')
+    parser.add_argument('--safety-factor', type=float, default=0.3, help='安全库存系数（默认: %(default)s）')
+    parser.add_argument('--colors', nargs='+', default=None, help='在售颜色，默认使用内置在售颜色列表')
+    parser.add_argument('--settle', type=float, default=DEFAULT_SETTLE_SECONDS,
+                        help='文件大小和修改时间保持不变多少秒后视为写完（默认: %(default)s）')
+    parser.add_argument('--interval', type=float, default=DEFAULT_POLL_SECONDS,
+                        help='轮询间隔秒数（默认: %(default)s）')
+    parser.add_argument('--cache-dir', default=None, help='输入缓存目录')
+    parser.add_argument('--history', default=None, help='把每次结果追加到历史快照库（SQLite 文件）')
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    if not os.path.isdir(args.watch):
+        print(f"目录不存在: {args.watch}", file=sys.stderr)
+        return 2
+
+    try:
+        sales_ratio = {}
+        for f in expand_input_paths(args.ratio):
+            sales_ratio.update(load_sales_ratio(f))
+        sku_mapping = pd.concat([load_sku_mapping(f) for f in expand_input_paths(args.mapping)], ignore_index=True)
+        pipeline = WatchPipeline(
+            args.watch, args.output_dir, sku_mapping, sales_ratio,
+            active_colors=args.colors,
+            safety_factor=args.safety_factor,
+            bom=load_bom(args.bom) if args.bom else None,
+            fmt=args.format,
+            detail=args.detail,
+            settle=args.settle,
+            poll_interval=args.interval,
+            cache=InputCache(args.cache_dir) if args.cache_dir else None,
+            history=SnapshotStore(args.history) if args.history else None,
+        )
+    except (ValueError, OSError) as e:
+        print(f"加载出错: {e}", file=sys.stderr)
+        return 1
+
+    try:
+        pipeline.run()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
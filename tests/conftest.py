@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+测试公共数据：按随机种子生成小规模的零部件库存、销售比例与SKU映射
+
+比例取随机的小数位数（含0和未配置的套件），库存含缺失、为0以及远小于需求的枕套，
+尽量覆盖共享池比例求和、枕套缩减等容易出现末位误差的路径。
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from icas.aggregation import COMPONENT_INDEX
+from icas.config import BOM_CONFIG
+
+COLORS = ['木青绿四季款', '米白四季款', '丁香紫四季款', '雨雾蓝四季款', '繁星黄加暖款', '暮光褐加暖款']
+UNKNOWN_KIT = '【床单款】2.0米床套件，搭配240x260cm被套'
+
+
+@dataclass
+class Inputs:
+    sku_mapping: pd.DataFrame
+    sales_ratio: Dict[str, float]
+    component_inventory: pd.Series
+    active_colors: List[str]
+
+
+def random_inputs(seed: int, skus_per_color: int = 12) -> Inputs:
+    """同一种子总是生成相同的数据；比例为 Python float，与 load_sales_ratio 的输出一致"""
+    rng = np.random.default_rng(seed)
+    kits = list(BOM_CONFIG)
+    colors = COLORS[:rng.integers(2, len(COLORS) + 1)]
+
+    rows = []
+    for color in colors:
+        for kit in rng.choice(kits + [UNKNOWN_KIT], size=skus_per_color):
+            rows.append({'SKU_ID': f'SKU{len(rows)}', '套件描述': str(kit), '颜色': color})
+    sku_mapping = pd.DataFrame(rows)
+
+    sales_ratio = {}
+    for kit in kits:
+        draw = rng.random()
+        if draw < 0.1:
+            continue                      # 未配置比例
+        elif draw < 0.2:
+            sales_ratio[kit] = 0.0
+        else:
+            sales_ratio[kit] = round(float(rng.random()), int(rng.integers(1, 5)))
+
+    components = {}
+    for color in colors:
+        for item in BOM_CONFIG.values():
+            for key in (('被套', color, item.duvet_size), (item.sheet_type, color, item.sheet_size)):
+                if rng.random() > 0.1:
+                    components[key] = int(rng.integers(0, 400))
+        if rng.random() > 0.1:
+            components[('枕套', color, '标准')] = int(rng.integers(0, 300))
+    index = pd.MultiIndex.from_tuples(list(components), names=COMPONENT_INDEX)
+    component_inventory = pd.Series(list(components.values()), index=index, dtype='int64', name='库存')
+
+    active_colors = [c for c in colors if rng.random() > 0.15] or colors[:1]
+    return Inputs(sku_mapping, sales_ratio, component_inventory, active_colors)
+
+
+def product_rows(inputs: Inputs, seed: int) -> pd.DataFrame:
+    """把零部件库存拆回商品级库存表（商品名称, 库存），与 load_inventory 的返回格式相同
+
+    同一零部件混用几种名称写法（枕套含单只），另加被排除和无法解析的商品。
+    """
+    rng = np.random.default_rng(seed)
+    rows = []
+    for (comp_type, color, size), stock in inputs.component_inventory.items():
+        if comp_type == '枕套':
+            rows.append((f"枕套（一对）-{color}", stock // 2))
+            rows.append((f"枕套（单只）-{color}", (stock - stock // 2) * 2 + int(rng.integers(0, 2))))
+        elif comp_type == '被套':
+            rows.append((f"被套{size}-{color}", stock))
+        elif comp_type == '床单':
+            rows.append((f"床单{size}{'cm' if rng.random() < 0.5 else ''}-{color}", stock))
+        else:
+            rows.append((f"床笠{size}*35-{color}", stock))
+    for color in inputs.active_colors:
+        rows.append((f"浴巾-{color}", int(rng.integers(1, 50))))
+        rows.append((f"抱枕45*45-{color}", int(rng.integers(1, 50))))
+    order = rng.permutation(len(rows))
+    return pd.DataFrame({
+        '商品名称': [rows[i][0] for i in order],
+        '库存': np.array([rows[i][1] for i in order], dtype='int64'),
+    })
+
+
+@pytest.fixture
+def make_inputs():
+    return random_inputs
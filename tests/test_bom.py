@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+BOM目录：表格与 YAML 加载结果一致，缺少列或行内容不合法时报出全部错误
+"""
+
+import io
+
+import pandas as pd
+import pytest
+
+from icas import DEFAULT_BOM, BOMCatalog, load_bom
+from icas.bom import BOM_COLUMNS, DESCRIPTION_COLUMN
+from icas.config import BOM_CONFIG
+
+
+def write_yaml(data, path) -> None:
+    """写出 YAML（PyYAML 是可选依赖，未安装时跳过相关测试）"""
+    yaml = pytest.importorskip('yaml')
+    path.write_text(yaml.safe_dump(data, allow_unicode=True), encoding='utf-8')
+
+
+def test_table_round_trip(tmp_path):
+    DEFAULT_BOM.to_frame().to_csv(tmp_path / 'bom.csv', index=False)
+    catalog = load_bom(tmp_path / 'bom.csv')
+    assert catalog.items == BOM_CONFIG
+
+
+def test_yaml_mapping_and_list_forms(tmp_path):
+    # 映射写法用字段名，列表写法用表格列名
+    write_yaml({d: vars(item) for d, item in BOM_CONFIG.items()}, tmp_path / 'mapping.yaml')
+    write_yaml(DEFAULT_BOM.to_frame().to_dict('records'), tmp_path / 'list.yml')
+    assert load_bom(tmp_path / 'mapping.yaml').items == BOM_CONFIG
+    assert load_bom(tmp_path / 'list.yml').items == BOM_CONFIG
+
+    # 上传的文件对象按文件名识别 YAML
+    upload = io.BytesIO((tmp_path / 'list.yml').read_bytes())
+    upload.name = 'bom.yml'
+    assert load_bom(upload).items == BOM_CONFIG
+
+
+def test_yaml_values_are_normalized(tmp_path):
+    write_yaml({' 自定义套件\n': {'床单类型': '床笠 ', '床单尺寸': '150*200', '被套尺寸': '200*230', '枕套数量': '2'}},
+               tmp_path / 'bom.yaml')
+    catalog = load_bom(tmp_path / 'bom.yaml')
+    item = catalog.get('自定义套件')
+    assert (item.sheet_type, item.sheet_size, item.duvet_size, item.pillow_count) == ('床笠', '150*200', '200*230', 2)
+    assert catalog.skus_using('床笠', '150*200') == ('自定义套件',)
+
+
+def test_yaml_with_wrong_shape(tmp_path):
+    write_yaml(['不是映射'], tmp_path / 'bom.yaml')
+    with pytest.raises(ValueError, match='YAML 格式的BOM'):
+        load_bom(tmp_path / 'bom.yaml')
+
+
+@pytest.mark.parametrize('missing', [DESCRIPTION_COLUMN, '枕套数量'])
+def test_table_missing_column(tmp_path, missing):
+    DEFAULT_BOM.to_frame().drop(columns=missing).to_csv(tmp_path / 'bom.csv', index=False)
+    with pytest.raises(ValueError, match=f'BOM文件缺少必需列: {missing}'):
+        load_bom(tmp_path / 'bom.csv')
+
+
+def test_row_errors_are_reported_together(tmp_path):
+    rows = pd.DataFrame([
+        ['床单款', '毛毯', '240*250', '200*230', 2],
+        ['尺寸写错', '床单', '240x250', '200*230', 2],
+        ['枕套为负', '床笠', '150*200', '200*230', -1],
+        ['缺少被套', '床单', '240*250', None, 2],
+        [None, '床单', '240*250', '200*230', 2],
+        ['重复定义', '床单', '240*250', '200*230', 2],
+        ['重复定义', '床单', '240*250', '220*240', 2],
+    ], columns=[DESCRIPTION_COLUMN, *BOM_COLUMNS])
+    rows.to_csv(tmp_path / 'bom.csv', index=False)
+
+    with pytest.raises(ValueError) as excinfo:
+        load_bom(tmp_path / 'bom.csv')
+    lines = str(excinfo.value).splitlines()
+    assert lines[0] == 'BOM配置有误:'
+    assert lines[1:] == [
+        "床单款: 床单类型应为 床单/床笠，实际为 '毛毯'",
+        "尺寸写错: 床单尺寸应为 宽*长 格式（如 220*240），实际为 '240x250'",
+        '枕套为负: 枕套数量应为非负整数，实际为 -1',
+        '缺少被套: 缺少被套尺寸',
+        '存在套件描述为空的行',
+        '重复定义: 重复定义且内容不一致',
+    ]
+
+
+def test_empty_file(tmp_path):
+    pd.DataFrame(columns=[DESCRIPTION_COLUMN, *BOM_COLUMNS]).to_csv(tmp_path / 'bom.csv', index=False)
+    with pytest.raises(ValueError, match='BOM配置为空'):
+        load_bom(tmp_path / 'bom.csv')
+
+
+def test_reverse_index_matches_forward():
+    catalog = BOMCatalog(BOM_CONFIG)
+    for key in catalog.component_keys():
+        users = catalog.skus_using(*key)
+        assert users == tuple(d for d in BOM_CONFIG if key in catalog.components(d))
+    assert catalog.skus_using('被套', '1*1') == ()
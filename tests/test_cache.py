@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+输入缓存 InputCache：按内容哈希读写、相同内容的上传命中缓存、超过上限时淘汰最久未使用的文件
+"""
+
+import io
+import os
+
+import pandas as pd
+
+from conftest import product_rows, random_inputs
+from icas import cache as cache_module
+from icas.cache import InputCache, file_digest
+
+
+def inventory_csv(seed: int) -> bytes:
+    rows = product_rows(random_inputs(seed), seed).rename(columns={'库存': '可用数'})
+    return rows.to_csv(index=False).encode('utf-8')
+
+
+def upload(content: bytes) -> io.BytesIO:
+    """与 Streamlit 上传的文件一样带文件名，按后缀识别格式"""
+    file = io.BytesIO(content)
+    file.name = '库存.csv'
+    return file
+
+
+def counting_loader(monkeypatch) -> list:
+    """把缓存未命中时调用的 load_inventory 换成计数版本，返回调用记录"""
+    calls = []
+    original = cache_module.load_inventory
+
+    def load_inventory(file):
+        calls.append(file)
+        return original(file)
+
+    monkeypatch.setattr(cache_module, 'load_inventory', load_inventory)
+    return calls
+
+
+def test_file_digest_depends_only_on_content(tmp_path):
+    content = inventory_csv(0)
+    (tmp_path / '库存.csv').write_bytes(content)
+    digest = file_digest(content)
+    assert file_digest(tmp_path / '库存.csv') == file_digest(upload(content)) == digest
+    assert file_digest(inventory_csv(1)) != digest
+
+
+def test_round_trip_across_instances(tmp_path, monkeypatch):
+    content = inventory_csv(0)
+    (tmp_path / '库存.csv').write_bytes(content)
+    first = InputCache(tmp_path / 'cache').load_inventory(tmp_path / '库存.csv')
+
+    calls = counting_loader(monkeypatch)
+    # 新实例（相当于进程重启）从磁盘读取，不再解析原文件
+    restored = InputCache(tmp_path / 'cache').load_inventory(upload(content))
+    assert calls == []
+    pd.testing.assert_frame_equal(restored, first)
+    assert (tmp_path / 'cache' / f'inventory-{file_digest(content)}.parquet').exists()
+
+
+def test_identical_upload_hits_cache(tmp_path, monkeypatch):
+    calls = counting_loader(monkeypatch)
+    cache = InputCache(tmp_path)
+    content = inventory_csv(2)
+    results = [cache.load_inventory(upload(content)) for _ in range(3)]
+    assert len(calls) == 1
+    for df in results[1:]:
+        pd.testing.assert_frame_equal(df, results[0])
+
+    cache.load_inventory(upload(inventory_csv(3)))
+    assert len(calls) == 2
+
+
+def test_evicts_least_recently_used_over_cap(tmp_path):
+    cache = InputCache(tmp_path)
+    contents = [inventory_csv(seed) for seed in range(3)]
+    paths = []
+    for age, content in enumerate(contents):
+        cache.load_inventory(upload(content))
+        paths.append(tmp_path / f'inventory-{file_digest(content)}.parquet')
+        os.utime(paths[-1], (1000 + age, 1000 + age))
+
+    # 命中刷新修改时间：第一个文件变成最近使用
+    cache.load_inventory(upload(contents[0]))
+    sizes = [p.stat().st_size for p in paths]
+    cache.max_bytes = sizes[0] + sizes[2]
+    cache.evict()
+    assert [p.exists() for p in paths] == [True, False, True]
+
+    cache.max_bytes = 0
+    cache.evict()
+    assert not any(p.exists() for p in paths)
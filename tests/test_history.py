@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+历史快照 SnapshotStore：写入后读回一致，两次比较和单个SKU的历史与直接用 pandas 计算的结果一致
+"""
+
+import pandas as pd
+import pytest
+
+from icas import SnapshotStore, calculate_sku_inventory_vectorized
+from icas.history import DIFF_COLUMNS
+
+KEY = ['SKU_ID', '套件描述', '颜色']
+
+
+def calculate(inputs, inventory, safety_factor):
+    return calculate_sku_inventory_vectorized(
+        inputs.sku_mapping, inputs.sales_ratio, inventory, inputs.active_colors, safety_factor
+    )
+
+
+def expected_diff(old: pd.DataFrame, new: pd.DataFrame, changed_only: bool = True) -> pd.DataFrame:
+    merged = old[KEY + ['可售库存']].merge(new[KEY + ['可售库存']], on=KEY, how='outer', suffixes=('_旧', '_新'))
+    table = pd.DataFrame({
+        **{k: merged[k] for k in KEY},
+        '旧可售库存': merged['可售库存_旧'].astype('Int64'),
+        '新可售库存': merged['可售库存_新'].astype('Int64'),
+    })
+    table['变化'] = (table['新可售库存'].fillna(0) - table['旧可售库存'].fillna(0)).astype('int64')
+    if changed_only:
+        table = table[table['旧可售库存'].isna() | table['新可售库存'].isna() | (table['变化'] != 0)]
+    return table.sort_values(['变化', 'SKU_ID'], kind='stable').reset_index(drop=True)[DIFF_COLUMNS]
+
+
+@pytest.fixture
+def two_runs(tmp_path, make_inputs):
+    inputs = make_inputs(3)
+    old = calculate(inputs, inputs.component_inventory, 0.55)
+    restocked = inputs.component_inventory * 2
+    new = calculate(inputs, restocked, 0.3)
+    # 旧批次少最后两个SKU、新批次少前两个SKU，覆盖只在一侧出现的SKU
+    old, new = old.iloc[:-2], new.iloc[2:]
+    store = SnapshotStore(tmp_path / 'history.sqlite')
+    old_run = store.record(old, inputs.component_inventory, label='早班', created_at=1000.0)
+    new_run = store.record(new, restocked, label='晚班', created_at=2000.0)
+    return store, old, new, old_run, new_run, inputs
+
+
+def test_record_and_load_round_trip(two_runs):
+    store, old, new, old_run, new_run, inputs = two_runs
+    for run_id, results in ((old_run, old), (new_run, new)):
+        loaded = store.load(run_id)
+        pd.testing.assert_frame_equal(
+            loaded.sort_values('SKU_ID').reset_index(drop=True),
+            results[KEY + ['可售库存']].sort_values('SKU_ID').reset_index(drop=True),
+            check_dtype=False,
+        )
+    pd.testing.assert_series_equal(
+        store.load_components(old_run).sort_index(), inputs.component_inventory.sort_index(),
+        check_dtype=False, check_index_type=False,
+    )
+
+    runs = store.runs()
+    assert list(runs['批次']) == [new_run, old_run] and list(runs['标签']) == ['晚班', '早班']
+    assert list(runs['安全系数']) == [0.3, 0.55]
+    assert list(runs['SKU数']) == [len(new), len(old)]
+    assert list(runs['总可售套数']) == [new['可售库存'].sum(), old['可售库存'].sum()]
+
+
+@pytest.mark.parametrize('changed_only', [True, False])
+def test_diff_matches_pandas(two_runs, changed_only):
+    store, old, new, old_run, new_run, _ = two_runs
+    diff = store.diff(old_run, new_run, changed_only=changed_only)
+    pd.testing.assert_frame_equal(diff, expected_diff(old, new, changed_only), check_dtype=False)
+    assert diff['旧可售库存'].isna().sum() == 2 and diff['新可售库存'].isna().sum() == 2
+
+    color = new['颜色'].iloc[0]
+    by_color = store.diff(old_run, new_run, color=color, changed_only=changed_only)
+    expected = expected_diff(old[old['颜色'] == color], new[new['颜色'] == color], changed_only)
+    pd.testing.assert_frame_equal(by_color, expected, check_dtype=False)
+
+
+def test_sku_history(two_runs):
+    store, old, new, old_run, new_run, _ = two_runs
+    both = new['SKU_ID'].iloc[0]
+    history = store.sku_history(both)
+    assert list(history['批次']) == [old_run, new_run] and list(history['标签']) == ['早班', '晚班']
+    assert list(history['可售库存']) == [
+        old.loc[old['SKU_ID'] == both, '可售库存'].item(), new.loc[new['SKU_ID'] == both, '可售库存'].item(),
+    ]
+    assert list(store.sku_history(both, since=1500.0)['批次']) == [new_run]
+    assert list(store.sku_history(old['SKU_ID'].iloc[0])['批次']) == [old_run]
+    assert store.sku_history('不存在的SKU').empty
+
+
+def test_prune_and_reopen(two_runs, tmp_path):
+    store, _, new, old_run, new_run, _ = two_runs
+    assert store.prune(before=1500.0) == 1
+    reopened = SnapshotStore(tmp_path / 'history.sqlite')
+    assert list(reopened.runs()['批次']) == [new_run]
+    assert reopened.load(old_run).empty
+    assert list(reopened.sku_history(new['SKU_ID'].iloc[0])['批次']) == [new_run]
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+后台任务：进度报告、协作式取消、按编号取回结束的任务及其结果
+"""
+
+import threading
+
+import pytest
+
+from icas import jobs
+
+TIMEOUT = 5
+
+
+def stepped(job, steps, gate: threading.Event, reached: threading.Event):
+    """报告第一步后等待放行，再逐步报告进度"""
+    job.report('calculate', 1, steps)
+    reached.set()
+    assert gate.wait(TIMEOUT)
+    for done in range(2, steps + 1):
+        job.report('calculate', done, steps)
+    return {'steps': steps}
+
+
+def test_progress_and_result_by_id():
+    registry = jobs.JobRegistry()
+    gate, reached = threading.Event(), threading.Event()
+    job = registry.submit(stepped, 4, gate, reached)
+    assert reached.wait(TIMEOUT)
+
+    running = registry.get(job.id)
+    assert running is job and running.status == jobs.RUNNING and not running.finished
+    assert running.progress == jobs.JobProgress('calculate', 1, 4)
+    assert running.progress.fraction == 0.25
+
+    gate.set()
+    assert job.wait(TIMEOUT)
+    finished = registry.get(job.id)
+    assert finished.status == jobs.DONE and finished.result == {'steps': 4}
+    assert finished.progress.fraction == 1.0 and finished.finished_at >= finished.created_at
+    assert registry.get('unknown') is None and registry.get(None) is None
+
+
+def test_cancel_takes_effect_at_next_report():
+    registry = jobs.JobRegistry()
+    gate, reached = threading.Event(), threading.Event()
+    job = registry.submit(stepped, 4, gate, reached)
+    assert reached.wait(TIMEOUT)
+
+    job.cancel()
+    # 取消是协作式的：在任务下一次报告进度之前仍在运行
+    assert job.cancel_requested and job.status == jobs.RUNNING
+    gate.set()
+    assert job.wait(TIMEOUT)
+    assert job.status == jobs.CANCELLED and job.result is None and job.error is None
+    assert job.progress == jobs.JobProgress('calculate', 1, 4)
+
+
+def test_failure_keeps_error():
+    def fail(job):
+        job.report('load_inventory')
+        raise ValueError("库存文件缺少必需列: 可用数")
+
+    job = jobs.JobRegistry().submit(fail)
+    assert job.wait(TIMEOUT)
+    assert job.status == jobs.FAILED and job.progress.stage == 'load_inventory'
+    with pytest.raises(ValueError, match='缺少必需列'):
+        raise job.error
+
+
+def test_registry_drops_oldest_finished_jobs():
+    registry = jobs.JobRegistry(max_finished=2)
+    gate, reached = threading.Event(), threading.Event()
+    running = registry.submit(stepped, 2, gate, reached)
+    assert reached.wait(TIMEOUT)
+
+    finished = []
+    for i in range(4):
+        finished.append(registry.submit(lambda job, i=i: i))
+        assert finished[-1].wait(TIMEOUT)
+    # 提交新任务时淘汰，最多保留 max_finished 个结束的任务；运行中的任务不受影响
+    assert [registry.get(job.id) for job in finished] == [None, None, finished[2], finished[3]]
+    assert registry.get(running.id) is running
+
+    gate.set()
+    assert running.wait(TIMEOUT) and running.result == {'steps': 2}
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+数据加载：CSV / Parquet / Feather 读出相同的结果，缺少必需列或列数不足时报错
+"""
+
+import io
+
+import pandas as pd
+import pytest
+
+from conftest import product_rows, random_inputs
+from icas import load_inventory, load_sku_mapping
+from icas.loaders import read_table
+
+FORMATS = ['.csv', '.parquet', '.feather']
+
+
+def write_table(df: pd.DataFrame, path) -> None:
+    """按后缀写出表格"""
+    if path.suffix == '.csv':
+        df.to_csv(path, index=False)
+    elif path.suffix == '.parquet':
+        df.to_parquet(path, index=False)
+    else:
+        df.reset_index(drop=True).to_feather(path)
+
+
+def inventory_frame(seed: int) -> pd.DataFrame:
+    """ERP 导出的库存表：同名商品分多行，另带计算用不到的列"""
+    rows = product_rows(random_inputs(seed), seed).rename(columns={'库存': '可用数'})
+    rows = pd.concat([rows, rows.head(3)], ignore_index=True)
+    return rows.assign(仓库='主仓', 锁定数=0)[['仓库', '商品名称', '锁定数', '可用数']]
+
+
+@pytest.mark.parametrize('suffix', FORMATS)
+def test_read_table_selects_columns(tmp_path, suffix):
+    df = inventory_frame(0)
+    path = tmp_path / f'库存{suffix}'
+    write_table(df, path)
+
+    selected = read_table(path, columns=['商品名称', '可用数', '不存在的列'])
+    assert list(selected.columns) == ['商品名称', '可用数']
+    assert list(selected['商品名称']) == list(df['商品名称'])
+    assert list(selected['可用数']) == list(df['可用数'])
+
+    first = read_table(path, n_columns=2)
+    assert list(first.columns) == ['仓库', '商品名称']
+    with pytest.raises(ValueError, match='文件列数不足'):
+        read_table(path, n_columns=5)
+
+
+@pytest.mark.parametrize('suffix', FORMATS)
+def test_load_inventory_matches_across_formats(tmp_path, suffix):
+    df = inventory_frame(1)
+    write_table(df, tmp_path / '库存.csv')
+    write_table(df, tmp_path / f'库存{suffix}')
+    expected = load_inventory(tmp_path / '库存.csv')
+    assert list(expected.columns) == ['商品名称', '库存']
+    assert expected['库存'].sum() == df['可用数'].sum()
+
+    loaded = load_inventory(tmp_path / f'库存{suffix}')
+    pd.testing.assert_frame_equal(loaded, expected, check_dtype=False)
+
+    # 上传的文件对象按文件名识别格式
+    upload = io.BytesIO((tmp_path / f'库存{suffix}').read_bytes())
+    upload.name = f'库存{suffix}'
+    pd.testing.assert_frame_equal(load_inventory(upload), expected, check_dtype=False)
+
+
+def test_load_inventory_reads_gbk_csv(tmp_path):
+    df = inventory_frame(2)
+    df.to_csv(tmp_path / 'utf8.csv', index=False)
+    df.to_csv(tmp_path / 'gbk.csv', index=False, encoding='gbk')
+    pd.testing.assert_frame_equal(load_inventory(tmp_path / 'gbk.csv'), load_inventory(tmp_path / 'utf8.csv'))
+
+
+@pytest.mark.parametrize('suffix', FORMATS)
+@pytest.mark.parametrize('missing', ['商品名称', '可用数'])
+def test_load_inventory_missing_column(tmp_path, suffix, missing):
+    path = tmp_path / f'库存{suffix}'
+    write_table(inventory_frame(3).drop(columns=missing), path)
+    with pytest.raises(ValueError, match=f'库存文件缺少必需列: {missing}'):
+        load_inventory(path)
+
+
+@pytest.mark.parametrize('suffix', FORMATS)
+def test_load_sku_mapping_matches_across_formats(tmp_path, suffix):
+    mapping = random_inputs(4).sku_mapping.assign(备注='')
+    # 套件描述前后的空白和换行在加载时去掉
+    mapping.loc[0, '套件描述'] = f"  {mapping.loc[0, '套件描述']}\n"
+    write_table(mapping, tmp_path / '映射.csv')
+    write_table(mapping, tmp_path / f'映射{suffix}')
+    expected = load_sku_mapping(tmp_path / '映射.csv')
+    assert list(expected.columns) == ['SKU_ID', '套件描述', '颜色']
+    assert expected.loc[0, '套件描述'] == mapping.loc[0, '套件描述'].strip()
+
+    loaded = load_sku_mapping(tmp_path / f'映射{suffix}')
+    pd.testing.assert_frame_equal(loaded, expected, check_dtype=False, check_categorical=False)
+
+
+@pytest.mark.parametrize('suffix', FORMATS)
+def test_load_sku_mapping_needs_three_columns(tmp_path, suffix):
+    path = tmp_path / f'映射{suffix}'
+    write_table(random_inputs(5).sku_mapping[['SKU_ID', '套件描述']], path)
+    with pytest.raises(ValueError, match='文件列数不足'):
+        load_sku_mapping(path)
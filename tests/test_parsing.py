@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+批量解析 parse_product_names 与逐个解析 parse_product_name 的一致性
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from icas import ParseCache, load_inventory, parse_product_name, parse_product_names
+from icas.parsing import EXCLUDE_KEYWORDS
+
+PREFIXES = ['', '', '', '', ' ', '【新款】', '床单', '枕套', '被套']
+BODIES = [
+    '床笠{w}*{l}*35-{color}', '床笠{w}*{l}*35cm-{color}', '床笠{w}*{l}*35－{color}',
+    '床笠{w}*{l}*35cm；{color}；四季款', '床笠{w}*{l}*35；{color}；四季款',
+    '床单{w}*{l}-{color}', '床单{w}*{l}cm－{color}', '床单{w}x{l}-{color}',
+    '被套{w}*{l}-{color}', '被套{w}*{l}cm-{color}', '被套{w}*{l}{color}',
+    '枕套（一对）-{color}', '枕套（单只）-{color}', '枕套(一对)-{color}', '床笠枕套（一对）-{color}',
+    '抱枕{w}*{l}-{color}',
+]
+SUFFIXES = ['', '', '', ' ', '\n', '-', '-加长', '；']
+COLORS = ['米白四季款', '雾霾蓝加暖款', '奶咖', '']
+
+
+def random_names(seed: int, n: int = 400) -> list:
+    """按库存表的各种写法随机拼出商品名称，含排除关键词、无法解析的名称和非文本值"""
+    rng = np.random.default_rng(seed)
+    names = []
+    for _ in range(n):
+        body = rng.choice(BODIES).format(
+            w=int(rng.choice([150, 180, 200, 220, 240, 270, 48])),
+            l=int(rng.choice([200, 230, 240, 250, 74, 1])),
+            color=rng.choice(COLORS),
+        )
+        name = str(rng.choice(PREFIXES)) + body + str(rng.choice(SUFFIXES))
+        if rng.random() < 0.1:
+            keyword = str(rng.choice(EXCLUDE_KEYWORDS))
+            position = int(rng.integers(0, len(name) + 1))
+            name = name[:position] + keyword + name[position:]
+        names.append(name)
+    names += [None, np.nan, 42, '', '   ']
+    # 重复名称：批量解析只解析一次，逐行结果仍应相同
+    names += [names[i] for i in rng.integers(0, len(names), n // 4)]
+    return names
+
+
+def as_records(parsed: pd.DataFrame) -> list:
+    """逐行 (type, size, color)，缺失值统一为 None"""
+    values = parsed[['type', 'size', 'color']].astype(object)
+    return list(values.where(values.notna(), None).itertuples(index=False, name=None))
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_batch_matches_per_name(seed):
+    names = random_names(seed)
+    specs = [parse_product_name(name) for name in names]
+    expected = [(s.type, s.size, s.color) if s else (None, None, None) for s in specs]
+    cache = ParseCache()
+    for parsed in (
+        parse_product_names(pd.Series(names, dtype=object), cache=None),
+        parse_product_names(pd.Series(names, dtype=object), cache=cache),
+        parse_product_names(pd.Series(names, dtype=object), cache=cache),   # 全部命中缓存
+    ):
+        assert as_records(parsed) == expected
+
+
+def test_batch_keeps_index():
+    names = pd.Series(['被套200*230-米白四季款', '浴巾-米白四季款'], index=[7, 3])
+    parsed = parse_product_names(names, cache=None)
+    assert list(parsed.index) == [7, 3]
+    assert parsed.loc[7, 'type'] == '被套' and pd.isna(parsed.loc[3, 'type'])
+
+
+def test_unparsed_report_counts_occurrences_per_file(tmp_path):
+    cache = ParseCache()
+    for day, names in enumerate([['抱枕45*45-米白', '抱枕45*45-米白', '浴巾-米白'], ['抱枕45*45-米白', '靠垫-米白']]):
+        path = tmp_path / f'库存{day}.csv'
+        pd.DataFrame({'商品名称': names, '可用数': 1}).to_csv(path, index=False)
+        parse_product_names(load_inventory(path)['商品名称'], cache=cache)
+    report = cache.unparsed_report()
+    assert list(report.columns) == ['商品名称', '出现次数']
+    assert dict(zip(report['商品名称'], report['出现次数'])) == {'抱枕45*45-米白': 2, '靠垫-米白': 1}
+
+
+def test_parse_cache_round_trip_and_old_files(tmp_path):
+    cache = ParseCache()
+    parse_product_names(pd.Series(random_names(0)), cache=cache)
+    cache.save(tmp_path / 'names.parquet')
+    restored = ParseCache()
+    assert restored.load(tmp_path / 'names.parquet')
+    pd.testing.assert_frame_equal(restored.unparsed_report(), cache.unparsed_report())
+
+    # 列名不一致的旧文件视为无法读取
+    cache.to_frame().rename(columns={'出现次数': '累计行数'}).to_parquet(tmp_path / 'old.parquet')
+    assert not ParseCache().load(tmp_path / 'old.parquet')
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+补货计划：按计划补货后所有目标达标，且少补任何一件都会有SKU不达标
+"""
+
+import pandas as pd
+import pytest
+
+from icas import apply_purchase_plan, calculate_sku_inventory_vectorized, plan_purchases
+from icas.aggregation import COMPONENT_INDEX
+
+SEEDS = range(30)
+
+
+def _short_skus(inputs, inventory, target, safety_factor) -> pd.DataFrame:
+    """销售比例大于0、可售库存未达目标的SKU"""
+    results = calculate_sku_inventory_vectorized(
+        inputs.sku_mapping, inputs.sales_ratio, inventory, inputs.active_colors, safety_factor
+    )
+    ratios = results['套件描述'].map(inputs.sales_ratio).fillna(0)
+    return results[(ratios > 0) & (results['可售库存'] < target)]
+
+
+def _plan(inputs, target, safety_factor):
+    plan = plan_purchases(
+        inputs.sku_mapping, inputs.sales_ratio, inputs.component_inventory,
+        inputs.active_colors, target, safety_factor
+    )
+    return plan, apply_purchase_plan(inputs.component_inventory, plan)
+
+
+@pytest.mark.parametrize('target, safety_factor', [(20, 0.3), (7, 1.0), (45, 0.55)])
+def test_plan_meets_targets(make_inputs, target, safety_factor):
+    for seed in SEEDS:
+        inputs = make_inputs(seed)
+        _, inventory = _plan(inputs, target, safety_factor)
+        assert _short_skus(inputs, inventory, target, safety_factor).empty, seed
+
+
+@pytest.mark.parametrize('target, safety_factor', [(20, 0.3), (7, 1.0)])
+def test_plan_is_minimal(make_inputs, target, safety_factor):
+    for seed in SEEDS:
+        inputs = make_inputs(seed)
+        plan, inventory = _plan(inputs, target, safety_factor)
+        for key in plan.loc[plan['需补货'] > 0, COMPONENT_INDEX].itertuples(index=False):
+            fewer = inventory.copy()
+            fewer[tuple(key)] -= 1
+            assert not _short_skus(inputs, fewer, target, safety_factor).empty, (seed, tuple(key))
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+情景批量计算 run_scenarios 与逐个情景单独计算的一致性
+"""
+
+import numpy as np
+import pytest
+
+from icas import calculate_sku_inventory_vectorized, run_scenarios, scenario_grid
+
+ADJUSTMENTS = {
+    '床笠款加量': {'床笠款': 1.5},
+    '大被套减量': {'220x240': 0.6},
+    '叠加调整': {'床单款': 1.3, '200x230': 0.0},
+}
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_scenarios_match_single_runs(make_inputs, seed):
+    inputs = make_inputs(seed)
+    active = inputs.sku_mapping[inputs.sku_mapping['颜色'].isin(inputs.active_colors)]
+    descriptions = set(active['套件描述'])
+    # 只保留能匹配到在售套件的调整（未匹配的关键词会被 run_scenarios 拒绝）
+    adjustments = {
+        name: scale for name, scale in ADJUSTMENTS.items()
+        if all(any(keyword in d for d in descriptions) for keyword in scale)
+    }
+    scenarios = scenario_grid([0.3, 0.55, 1.0], adjustments)
+    matrix = run_scenarios(
+        inputs.sku_mapping, inputs.sales_ratio, inputs.component_inventory, inputs.active_colors, scenarios
+    )
+
+    for scenario in scenarios:
+        sales_ratio = {}
+        for kit, ratio in inputs.sales_ratio.items():
+            for keyword, multiplier in scenario.ratio_scale.items():
+                if keyword in kit:
+                    ratio *= multiplier
+            sales_ratio[kit] = ratio
+        results = calculate_sku_inventory_vectorized(
+            inputs.sku_mapping, sales_ratio, inputs.component_inventory,
+            inputs.active_colors, scenario.safety_factor
+        )
+        assert list(matrix.columns.get_level_values('SKU_ID')) == list(results['SKU_ID'])
+        np.testing.assert_array_equal(matrix.loc[scenario.name].to_numpy(), results['可售库存'].to_numpy())
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+查询服务：POST /settings 的参数校验，格式不对时返回 400 且不改变当前快照
+"""
+
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pandas as pd
+import pytest
+
+from conftest import product_rows, random_inputs
+from icas.server import InventoryService, make_server
+
+
+@pytest.fixture
+def server_url(tmp_path):
+    inputs = random_inputs(5)
+    product_rows(inputs, 5).rename(columns={'库存': '可用数'}).to_csv(tmp_path / '库存.csv', index=False)
+    pd.DataFrame(list(inputs.sales_ratio.items())).to_csv(tmp_path / '比例.csv', index=False, header=False)
+    inputs.sku_mapping.to_csv(tmp_path / '映射.csv', index=False)
+    service = InventoryService(
+        tmp_path / '库存.csv', tmp_path / '比例.csv', tmp_path / '映射.csv', active_colors=inputs.active_colors
+    )
+    server = make_server(service, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def _request(url: str, body=None):
+    data = None if body is None else json.dumps(body).encode('utf-8')
+    request = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+@pytest.mark.parametrize('body', [
+    {'safety_factor': 'abc'},
+    {'safety_factor': None},
+    {'safety_factor': True},
+    {'safety_factor': [0.5]},
+    {'safety_factor': 1.5},
+    {'colors': None},
+    {'colors': '米白四季款'},
+    {'colors': [1, 2]},
+])
+def test_invalid_settings_return_400(server_url, body):
+    before = _request(f"{server_url}/health")[1]
+    status, payload = _request(f"{server_url}/settings", body)
+    assert status == 400 and payload['error']
+    after = _request(f"{server_url}/health")[1]
+    assert after['version'] == before['version'] and after['safety_factor'] == before['safety_factor']
+
+
+def test_valid_settings_publish_new_version(server_url):
+    status, payload = _request(f"{server_url}/settings", {'safety_factor': 1})
+    assert status == 200
+    health = _request(f"{server_url}/health")[1]
+    assert health['version'] == payload['version'] == 2 and health['safety_factor'] == 1.0
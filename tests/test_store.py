@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+结果缓存：按键共享、内存上限淘汰、存活时间过期
+"""
+
+import threading
+
+import pandas as pd
+
+from icas.store import ResultStore
+
+
+def test_contains_does_not_count_or_touch():
+    store = ResultStore(max_bytes=10_000, ttl=None)
+    store.put('a', 1, nbytes=10)
+    store.put('b', 2, nbytes=10)
+    assert 'a' in store and 'missing' not in store
+    assert store.stats()['hits'] == store.stats()['misses'] == 0
+    # 'in' 不改变淘汰顺序：再放入一个大条目时最早放入的 'a' 先被淘汰
+    store.put('c', 3, nbytes=9_985)
+    assert 'a' not in store and 'b' in store
+
+
+def test_oversized_value_is_not_kept():
+    store = ResultStore(max_bytes=100, ttl=None)
+    store.put('big', pd.DataFrame({'x': range(1000)}))
+    assert 'big' not in store and store.get('big') is None
+
+
+def test_expired_entry_is_not_contained(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('icas.store.time.time', lambda: now[0])
+    store = ResultStore(ttl=60)
+    store.put('a', 1, nbytes=1)
+    assert 'a' in store
+    now[0] += 61
+    assert 'a' not in store and store.get('a') is None
+
+
+def test_get_or_compute_runs_once_for_concurrent_callers():
+    store = ResultStore(ttl=None)
+    calls, started, release = [], threading.Event(), threading.Event()
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait()
+        return {'value': 42}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(store.get_or_compute('k', compute))) for _ in range(4)]
+    threads[0].start()
+    started.wait()
+    for thread in threads[1:]:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1 and all(r is results[0] for r in results)
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+结果浏览 ResultView：筛选、分页取出的行与直接在完整结果表上筛选一致
+"""
+
+import pandas as pd
+import pytest
+
+from icas import calculate_sku_inventory_vectorized
+from icas.view import ResultView
+
+COLUMNS = ['SKU_ID', '颜色', '可售库存']
+
+
+def filtered(results: pd.DataFrame, color, in_stock_only: bool) -> pd.DataFrame:
+    mask = pd.Series(True, index=results.index)
+    if color is not None:
+        mask &= results['颜色'] == color
+    if in_stock_only:
+        mask &= results['可售库存'] > 0
+    return results[mask]
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_filters_and_pages_match_full_frame(make_inputs, seed):
+    inputs = make_inputs(seed)
+    results = calculate_sku_inventory_vectorized(
+        inputs.sku_mapping, inputs.sales_ratio, inputs.component_inventory, inputs.active_colors
+    )
+    view = ResultView(results)
+    assert view.colors == list(pd.unique(results['颜色']))
+
+    for color in [None, *view.colors, '不存在的颜色']:
+        for in_stock_only in (False, True):
+            expected = filtered(results, color, in_stock_only)
+            rows = view.rows(color, in_stock_only)
+            assert view.rows(color, in_stock_only) is rows      # 同一筛选只计算一次
+            pd.testing.assert_frame_equal(results.iloc[rows], expected)
+
+            # 逐页取出后拼起来等于整个筛选结果，最后一页可以不满
+            page_size = 7
+            n_pages = view.page_count(len(rows), page_size)
+            pages = [view.page(rows, page, page_size, COLUMNS) for page in range(1, n_pages + 1)]
+            assert all(len(p) == page_size for p in pages[:-1]) and len(pages[-1]) <= page_size
+            pd.testing.assert_frame_equal(pd.concat(pages), expected[COLUMNS])
+            assert view.page(rows, n_pages + 1, page_size).empty
+
+
+def test_metrics_and_color_stats(make_inputs):
+    inputs = make_inputs(3)
+    results = calculate_sku_inventory_vectorized(
+        inputs.sku_mapping, inputs.sales_ratio, inputs.component_inventory, inputs.active_colors
+    )
+    view = ResultView(results)
+    stock = results['可售库存']
+    assert view.metrics == {
+        'skus': len(results),
+        'in_stock': int((stock > 0).sum()),
+        'out_of_stock': int((stock <= 0).sum()),
+        'total_stock': int(stock.sum()),
+    }
+    grouped = results.groupby('颜色', sort=False, observed=True)['可售库存']
+    assert list(view.color_stats['颜色']) == view.colors
+    assert list(view.color_stats['SKU数']) == list(grouped.size())
+    assert list(view.color_stats['可售套数']) == list(grouped.sum())
+
+
+def test_page_count():
+    assert [ResultView.page_count(n, 10) for n in (0, 1, 10, 11, 25)] == [1, 1, 1, 2, 3]
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+"""
+多仓库库存：并行读取后按商品名称合并，与逐个文件读取的顺序和数量一致
+"""
+
+import pandas as pd
+import pytest
+
+from icas import load_inventory, load_warehouse_inventories
+
+
+@pytest.mark.parametrize('executor', ['serial', 'thread'])
+def test_merge_keeps_first_seen_order(tmp_path, executor):
+    files = []
+    for i, names in enumerate([['被套200*230-米白', '床单240*250-米白'], ['枕套（一对）-米白', '被套200*230-米白']]):
+        files.append(tmp_path / f'仓{i}.csv')
+        pd.DataFrame({'商品名称': names, '可用数': [10 * (i + 1), 5]}).to_csv(files[-1], index=False)
+
+    merged = load_warehouse_inventories(files, executor=executor, workers=2).inventory
+    parts = [load_inventory(f) for f in files]
+    expected = pd.concat(parts).groupby('商品名称', sort=False)['库存'].sum()
+    assert list(merged['商品名称']) == list(pd.unique(pd.concat(parts)['商品名称']))
+    assert list(merged['商品名称'][:len(parts[0])]) == list(parts[0]['商品名称'])
+    assert list(merged['库存']) == list(expected)
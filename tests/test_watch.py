@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+监视目录：处理失败的文件原样重新放入时仍会重算，重启后同样如此
+"""
+
+import os
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from conftest import product_rows, random_inputs
+from icas.watch import STATUS_FILE, WatchPipeline
+
+
+def _wait_for(condition, timeout: float = 20.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("等待超时")
+        time.sleep(0.02)
+
+
+@pytest.fixture
+def watch_inputs(tmp_path):
+    inputs = random_inputs(3)
+    watch_dir = tmp_path / 'in'
+    watch_dir.mkdir()
+    inventory = product_rows(inputs, 3).rename(columns={'库存': '可用数'})
+    return inputs, watch_dir, tmp_path / 'out', inventory
+
+
+def _start(inputs, watch_dir, output_dir, results, attempts, fail_first=0):
+    """启动流水线；读取阶段记录每次尝试，前 fail_first 次读取失败"""
+    pipeline = WatchPipeline(
+        watch_dir, output_dir, inputs.sku_mapping, inputs.sales_ratio,
+        active_colors=inputs.active_colors, fmt='csv', settle=0.0, poll_interval=0.02,
+        on_result=results.append,
+    )
+    ingest = pipeline._ingest
+
+    def flaky_ingest(item):
+        attempts.append(item.digest)
+        if len(attempts) <= fail_first:
+            raise OSError("文件被占用")
+        return ingest(item)
+
+    pipeline._ingest = flaky_ingest
+    thread = threading.Thread(target=pipeline.run, daemon=True)
+    thread.start()
+    return pipeline, thread
+
+
+def _drop(path, inventory, mtime):
+    inventory.to_csv(path, index=False)
+    os.utime(path, ns=(mtime, mtime))
+
+
+def test_failed_file_is_retried_with_same_content(watch_inputs):
+    inputs, watch_dir, output_dir, inventory = watch_inputs
+    results, attempts = [], []
+    pipeline, thread = _start(inputs, watch_dir, output_dir, results, attempts, fail_first=1)
+    try:
+        path = watch_dir / '库存.csv'
+        _drop(path, inventory, 1_000_000_000)
+        _wait_for(lambda: attempts)
+        time.sleep(0.2)
+        assert not results and not (output_dir / STATUS_FILE).exists()
+
+        # 同样的内容重新放入（修改时间变化）：上次失败，这次应当重算
+        _drop(path, inventory, 2_000_000_000)
+        _wait_for(lambda: results)
+        assert attempts[0] == attempts[1] == results[0]['digest'] == pipeline._last_digest
+
+        # 成功之后再放入同样的内容则跳过
+        _drop(path, inventory, 3_000_000_000)
+        _wait_for(lambda: pipeline.watcher._emitted.get(path, (0, 0))[1] == 3_000_000_000)
+        time.sleep(0.2)
+        assert len(attempts) == 2 and len(results) == 1
+    finally:
+        pipeline.stop()
+        thread.join()
+
+
+def test_restart_retries_file_that_failed(watch_inputs):
+    inputs, watch_dir, output_dir, inventory = watch_inputs
+    _drop(watch_dir / '库存.csv', inventory, 1_000_000_000)
+
+    results, attempts = [], []
+    pipeline, thread = _start(inputs, watch_dir, output_dir, results, attempts, fail_first=1)
+    _wait_for(lambda: attempts)
+    pipeline.stop()
+    thread.join()
+    assert not results
+
+    pipeline, thread = _start(inputs, watch_dir, output_dir, results, attempts)
+    try:
+        _wait_for(lambda: results)
+        assert len(attempts) == 2
+        assert pd.read_csv(results[0]['output'])['SKU_ID'].notna().all()
+    finally:
+        pipeline.stop()
+        thread.join()